@@ -3,11 +3,16 @@ streamlit_app.py
 Interface utilisateur Fair Hire
 """
 
+import io
+import threading
 import streamlit as st
-import os
-import tempfile
 from src.agent import run_pipeline, tool_detect_bias
+from src.generator import warmup_ollama
 from src.ingestion import load_and_split
+from src.embeddings import warmup_embedding_model, loaded_models, new_session_id
+from src.retriever import precompute_query_embeddings
+from src.llm_cache import llm_cache_stats
+from src.rate_limiter import rate_limiter_stats
 
 # ---------------------------------------------------------------
 # Configuration de la page
@@ -19,6 +24,32 @@ st.set_page_config(
     layout="wide"
 )
 
+# ---------------------------------------------------------------
+# Modèles partagés (embedding, LLM local) chargés une fois par process
+# ---------------------------------------------------------------
+
+@st.cache_resource(show_spinner="Chargement du modèle d'embedding...")
+def load_embedding_model() -> bool:
+    # Ne garde pas de référence au modèle : le registre d'embeddings en est le seul
+    # propriétaire, sinon le déchargement après inactivité ne libère pas la mémoire
+    warmup_embedding_model()
+    precompute_query_embeddings()
+    return True
+
+
+load_embedding_model()
+
+
+@st.cache_resource
+def start_llm_warmup() -> threading.Thread:
+    # En tâche de fond : le chargement du modèle Ollama ne bloque pas l'interface
+    thread = threading.Thread(target=warmup_ollama, daemon=True)
+    thread.start()
+    return thread
+
+
+start_llm_warmup()
+
 # ---------------------------------------------------------------
 # CSS personnalisé
 # ---------------------------------------------------------------
@@ -223,37 +254,47 @@ with st.sidebar:
 
     """)
     st.divider()
+    for m in loaded_models():
+        st.caption(f"📦 {m['model_name']} ({m['device']}) — chargé en {m['load_seconds']}s")
+    llm_stats = llm_cache_stats()
+    if llm_stats:
+        st.caption(
+            f"💬 Cache LLM : {llm_stats['hit_rate']:.0%} de hits, "
+            f"{llm_stats['seconds_saved']}s économisées"
+        )
+    limiter_stats = rate_limiter_stats()
+    if limiter_stats["admitted"]:
+        st.caption(
+            f"🚦 API Mistral : {limiter_stats['in_flight']} en cours, "
+            f"{limiter_stats['queue_depth']} en attente, "
+            f"attente moyenne {limiter_stats['avg_wait_seconds']}s"
+        )
     st.markdown("Built with LangChain · ChromaDB · Mistral")
 
 # ---------------------------------------------------------------
 # Utilitaires
 # ---------------------------------------------------------------
 
-def save_temp_file(uploaded_file, suffix=".pdf"):
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    tmp.write(uploaded_file.read())
-    tmp.flush()
-    tmp.close()
-    return tmp.name
+# Identifiant propre à chaque navigateur : les collections ChromaDB
+# de deux recruteurs connectés en même temps ne se chevauchent pas
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = new_session_id()
 
 
-def save_temp_text(text, suffix=".txt"):
-    tmp = tempfile.NamedTemporaryFile(
-        delete=False, suffix=suffix, mode="w", encoding="utf-8"
-    )
-    tmp.write(text)
-    tmp.flush()
-    tmp.close()
-    return tmp.name
+def live_markdown():
+    """
+    Zone markdown mise à jour token par token pendant la génération.
+    Renvoie le placeholder (à vider à la fin) et le callback on_token.
+    """
+    placeholder = st.empty()
+    parts = []
+
+    def on_token(token: str) -> None:
+        parts.append(token)
+        placeholder.markdown("".join(parts) + " ▌")
 
+    return placeholder, on_token
 
-def cleanup(*paths):
-    for p in paths:
-        try:
-            if p and os.path.exists(p):
-                os.unlink(p)
-        except Exception:
-            pass
 
 # ---------------------------------------------------------------
 # Mode 1 : Analyse de biais
@@ -299,11 +340,9 @@ if "Analyse de biais" in mode:
         if can_analyze:
             if st.button("🚀 Analyser les biais", type="primary"):
                 with st.spinner("Analyse en cours..."):
-                    tmp_path = None
                     try:
                         if job_file:
-                            tmp_path = save_temp_file(job_file)
-                            chunks = load_and_split(tmp_path)
+                            chunks = load_and_split(job_file)
                             job_text = " ".join(chunks)
                         else:
                             job_text = job_text_input
@@ -314,8 +353,6 @@ if "Analyse de biais" in mode:
 
                     except Exception as e:
                         st.error(f"Erreur : {e}")
-                    finally:
-                        cleanup(tmp_path)
 
     with col2:
         st.subheader("📊 Résultats")
@@ -377,22 +414,29 @@ elif "Matching" in mode:
     )
 
     if has_cv and has_job:
+        # Rapport structuré : JSON compact, plus court à générer, mais sans affichage au fil de l'eau
+        structured = st.checkbox(
+            "Rapport structuré (score + points clés, plus rapide)",
+            key="match_structured"
+        )
         if st.button("🚀 Lancer le matching", type="primary"):
             with st.spinner("Analyse en cours..."):
-                cv_path = None
-                job_path = None
                 try:
-                    cv_path = save_temp_file(cv_file)
-
-                    if job_file:
-                        job_path = save_temp_file(job_file)
-                    else:
-                        job_path = save_temp_text(job_text_direct)
-
-                    result = run_pipeline(cv_path, job_path)
+                    job_source = job_file or io.StringIO(job_text_direct)
+                    live, on_token = (None, None) if structured else live_markdown()
+                    result = run_pipeline(
+                        cv_file, job_source,
+                        session_id=st.session_state["session_id"],
+                        on_token=on_token,
+                        structured=structured
+                    )
+                    if live is not None:
+                        live.empty()
 
                     if result.status == "success":
                         st.success("✅ Matching terminé !")
+                        if result.matching is not None:
+                            st.metric("🎯 Score de matching", f"{result.matching.score}/10")
                         st.divider()
                         st.markdown(result.matching_report)
                     else:
@@ -400,8 +444,6 @@ elif "Matching" in mode:
 
                 except Exception as e:
                     st.error(f"Erreur : {e}")
-                finally:
-                    cleanup(cv_path, job_path)
 
 # ---------------------------------------------------------------
 # Mode 3 : Pipeline complet
@@ -452,17 +494,15 @@ elif "Pipeline complet" in mode:
     if has_cv and has_job:
         if st.button("🚀 Lancer l'analyse complète", type="primary"):
             with st.spinner("Pipeline en cours... (~30 secondes)"):
-                cv_path = None
-                job_path = None
                 try:
-                    cv_path = save_temp_file(cv_file)
-
-                    if full_job_file:
-                        job_path = save_temp_file(full_job_file)
-                    else:
-                        job_path = save_temp_text(full_job_text)
-
-                    result = run_pipeline(cv_path, job_path)
+                    job_source = full_job_file or io.StringIO(full_job_text)
+                    live, on_token = live_markdown()
+                    result = run_pipeline(
+                        cv_file, job_source,
+                        session_id=st.session_state["session_id"],
+                        on_token=on_token
+                    )
+                    live.empty()
 
                     if result.status == "success":
                         st.success("✅ Pipeline terminé !")
@@ -486,6 +526,7 @@ elif "Pipeline complet" in mode:
 
                         with tab1:
                             st.markdown(result.matching_report)
+                            st.caption(f"🧮 Contexte envoyé au LLM : {result.context_tokens} tokens")
 
                         with tab2:
                             st.code(result.bias_report)
@@ -502,8 +543,6 @@ elif "Pipeline complet" in mode:
 
                 except Exception as e:
                     st.error(f"Erreur : {e}")
-                finally:
-                    cleanup(cv_path, job_path)
 
 # ---------------------------------------------------------------
 # Mode 4 : Optimiseur ATS
@@ -554,18 +593,14 @@ elif "Optimiseur ATS" in mode:
     if has_cv and has_job:
         if st.button("🚀 Analyser et optimiser", type="primary"):
             with st.spinner("Analyse ATS en cours..."):
-                cv_path = None
-                job_path = None
                 try:
-                    from src.ats_optimizer import analyze_ats, rewrite_cv_for_ats
+                    from src.ats_optimizer import analyze_ats, stream_rewrite_cv_for_ats
 
-                    cv_path = save_temp_file(cv_file)
-                    cv_chunks = load_and_split(cv_path)
+                    cv_chunks = load_and_split(cv_file)
                     cv_text = " ".join(cv_chunks)
 
                     if ats_job_file:
-                        job_path = save_temp_file(ats_job_file)
-                        job_chunks = load_and_split(job_path)
+                        job_chunks = load_and_split(ats_job_file)
                         job_text = " ".join(job_chunks)
                     else:
                         job_text = ats_job_text
@@ -621,15 +656,11 @@ elif "Optimiseur ATS" in mode:
                                 )
 
                     with tab3:
-                        with st.spinner("Réécriture du CV en cours..."):
-                            rewritten = rewrite_cv_for_ats(
-                                cv_text,
-                                report.missing_keywords,
-                                job_text
-                            )
-                            st.markdown(rewritten)
+                        st.write_stream(stream_rewrite_cv_for_ats(
+                            cv_text,
+                            report.missing_keywords,
+                            job_text
+                        ))
 
                 except Exception as e:
-                    st.error(f"Erreur : {e}")
-                finally:
-                    cleanup(cv_path, job_path)
\ No newline at end of file
+                    st.error(f"Erreur : {e}")
\ No newline at end of file
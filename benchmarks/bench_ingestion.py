@@ -0,0 +1,57 @@
+"""
+bench_ingestion.py
+Benchmark de l'extraction PDF parallèle : pages/seconde selon le nombre de workers
+
+Usage: PYTHONPATH=. python benchmarks/bench_ingestion.py [n_fichiers] [pages_par_fichier]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ingestion import load_pdfs_parallel
+
+LOREM = (
+    "Expérience de 5 ans en machine learning : Python, Docker, AWS, MLflow. "
+    "Mise en production de modèles NLP, pipelines CI/CD et monitoring. "
+)
+
+
+def make_pdf(path: str, n_pages: int) -> None:
+    """Génère un PDF synthétique de n_pages pages remplies de texte."""
+    doc = fitz.open()
+    for i in range(n_pages):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), f"Page {i + 1}\n" + LOREM * 25, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def run(n_files: int = 8, pages_per_file: int = 50) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"cv_{i}.pdf") for i in range(n_files)]
+        for path in paths:
+            make_pdf(path, pages_per_file)
+
+        total_pages = n_files * pages_per_file
+        cpu = os.cpu_count() or 1
+        workers = sorted({1, 2, 4, cpu, 2 * cpu} - {0})
+
+        print(f"\n📊 {n_files} PDFs × {pages_per_file} pages ({cpu} CPU)")
+        print(f"{'workers':>8} | {'secondes':>9} | {'pages/s':>9}")
+        for n_workers in workers:
+            start = time.perf_counter()
+            load_pdfs_parallel(paths, max_workers=n_workers)
+            elapsed = time.perf_counter() - start
+            print(f"{n_workers:>8} | {elapsed:>9.2f} | {total_pages / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    run(n_files, pages)
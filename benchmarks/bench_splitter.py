@@ -0,0 +1,69 @@
+"""
+bench_splitter.py
+Benchmark du découpage : splitter natif vs RecursiveCharacterTextSplitter de LangChain
+(temps d'import, puis Mo/s et chunks/s sur un texte synthétique)
+
+Usage: PYTHONPATH=. python benchmarks/bench_splitter.py [taille_en_ko] [répétitions]
+"""
+
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+LOREM = (
+    "Expérience de 5 ans en machine learning : Python, Docker, AWS, MLflow.\n"
+    "Mise en production de modèles NLP, pipelines CI/CD et monitoring. "
+    "Encadrement d'une équipe de 4 data scientists.\n\n"
+)
+
+
+def timed_import(statement: str) -> float:
+    start = time.perf_counter()
+    exec(statement, {})
+    return time.perf_counter() - start
+
+
+def throughput(split, text: str, repeats: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = split(text)
+    elapsed = (time.perf_counter() - start) / repeats
+    return elapsed, len(chunks)
+
+
+def run(size_kb: int = 512, repeats: int = 5) -> None:
+    # Le splitter LangChain loggue un warning par chunk trop long
+    logging.disable(logging.WARNING)
+
+    native_import = timed_import("from src.ingestion import _split")
+    langchain_import = timed_import("from langchain_text_splitters import RecursiveCharacterTextSplitter")
+
+    from src.ingestion import _split, SEPARATORS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    text = (LOREM * (size_kb * 1024 // len(LOREM) + 1))[:size_kb * 1024]
+    mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+    print(f"\n📊 Texte de {size_kb} Ko, moyenne sur {repeats} passes")
+    print(f"{'splitter':>10} | {'import (s)':>10} | {'secondes':>9} | {'Mo/s':>7} | {'chunks':>7}")
+    for chunk_size, chunk_overlap in [(512, 50), (256, 32)]:
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=SEPARATORS
+        )
+        candidates = [
+            ("natif", native_import, lambda t: _split(t, chunk_size, chunk_overlap)),
+            ("langchain", langchain_import, splitter.split_text),
+        ]
+        print(f"-- chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+        for name, import_time, split in candidates:
+            elapsed, n_chunks = throughput(split, text, repeats)
+            print(f"{name:>10} | {import_time:>10.2f} | {elapsed:>9.3f} | {mb / elapsed:>7.1f} | {n_chunks:>7}")
+
+
+if __name__ == "__main__":
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    run(size_kb, repeats)
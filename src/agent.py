@@ -5,12 +5,32 @@ Orchestration du pipeline RAG complet — cerveau du projet Fair Hire
 
 import os
 from dataclasses import dataclass, field
+from typing import Callable
 from dotenv import load_dotenv
 
-from src.ingestion import load_and_split
-from src.embeddings import embed_and_store
-from src.retriever import retrieve, format_context
-from src.generator import generate, generate_matching_report
+from src.ingestion import load_and_split, source_name, DocumentSource
+from src.embeddings import (
+    embed_and_store,
+    new_session_id,
+    delete_session_collections,
+    maybe_purge_expired_collections
+)
+from src.retriever import (
+    retrieve,
+    retrieve_many,
+    format_context,
+    CV_CONTEXT_QUERY,
+    JOB_CONTEXT_QUERY
+)
+from src.generator import (
+    generate,
+    generate_matching_report,
+    generate_structured_matching_report,
+    stream_matching_report,
+    MATCHING_CONTEXT_TOKENS
+)
+from src.matching_report import MatchingReport, format_matching_report
+from src.context_packer import pack_context
 from src.bias_detector import analyze, format_report
 
 import time
@@ -22,6 +42,9 @@ except ImportError:
 
 load_dotenv()
 
+# Passages candidats par document : le packing garde ceux qui tiennent dans le budget
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+
 
 # ---------------------------------------------------------------
 # Dataclass pour le résultat final
@@ -34,8 +57,10 @@ class FairHireResult:
     bias_report: str = ""
     bias_score: float = 0.0
     matching_report: str = ""
+    matching: MatchingReport | None = None  # rapport structuré (mode structured)
     cv_summary: str = ""
     job_summary: str = ""
+    context_tokens: int = 0
     status: str = "pending"
     error: str = ""
 
@@ -44,23 +69,28 @@ class FairHireResult:
 # Outils individuels (appelables séparément)
 # ---------------------------------------------------------------
 
-def tool_load_document(file_path: str, doc_type: str) -> list[str]:
+def tool_load_document(source: DocumentSource, doc_type: str) -> list[str]:
     """
-    Outil 1 : Charge et découpe un document PDF.
+    Outil 1 : Charge et découpe un document PDF ou texte.
 
     Args:
-        file_path: Chemin vers le PDF
+        source: Chemin, octets ou objet fichier (upload Streamlit, texte collé)
         doc_type: 'cv' ou 'job'
 
     Returns:
         Liste de chunks
     """
-    print(f"\n🔧 [Outil 1] Chargement du {doc_type} : {file_path}")
-    chunks = load_and_split(file_path)
+    print(f"\n🔧 [Outil 1] Chargement du {doc_type} : {source_name(source)}")
+    chunks = load_and_split(source)
     return chunks
 
 
-def tool_vectorize(chunks: list[str], collection_name: str, metadata: dict) -> None:
+def tool_vectorize(
+    chunks: list[str],
+    collection_name: str,
+    metadata: dict,
+    session_id: str | None = None
+) -> None:
     """
     Outil 2 : Vectorise et stocke les chunks dans ChromaDB.
 
@@ -68,12 +98,24 @@ def tool_vectorize(chunks: list[str], collection_name: str, metadata: dict) -> N
         chunks: Liste de morceaux de texte
         collection_name: Nom de la collection
         metadata: Métadonnées du document
+        session_id: Session propriétaire de la collection
     """
     print(f"\n🔧 [Outil 2] Vectorisation → collection '{collection_name}'")
-    embed_and_store(chunks, collection_name=collection_name, metadata=metadata)
-
-
-def tool_retrieve_context(query: str, collection_name: str, n_results: int = 3) -> str:
+    embed_and_store(
+        chunks,
+        collection_name=collection_name,
+        metadata=metadata,
+        incremental=True,
+        session_id=session_id
+    )
+
+
+def tool_retrieve_context(
+    query: str,
+    collection_name: str,
+    n_results: int = 3,
+    session_id: str | None = None
+) -> str:
     """
     Outil 3 : Récupère les passages pertinents pour une question.
 
@@ -81,15 +123,39 @@ def tool_retrieve_context(query: str, collection_name: str, n_results: int = 3)
         query: Question ou critère de recherche
         collection_name: Collection où chercher
         n_results: Nombre de passages
+        session_id: Session propriétaire de la collection
 
     Returns:
         Contexte formaté
     """
     print(f"\n🔧 [Outil 3] Recherche : '{query}' dans '{collection_name}'")
-    passages = retrieve(query, collection_name, n_results)
+    passages = retrieve(query, collection_name, n_results, session_id=session_id)
     return format_context(passages)
 
 
+def tool_retrieve_contexts(
+    queries: list[str],
+    collection_names: list[str],
+    n_results: int = 3,
+    session_id: str | None = None
+) -> list[list[dict]]:
+    """
+    Outil 3 bis : Récupère en un seul appel les passages de plusieurs questions.
+
+    Args:
+        queries: Questions ou critères de recherche
+        collection_names: Collection de chaque question
+        n_results: Nombre de passages par question
+        session_id: Session propriétaire des collections
+
+    Returns:
+        Les passages de chaque question, du plus au moins pertinent
+        (à réduire au budget de tokens avec pack_context)
+    """
+    print(f"\n🔧 [Outil 3] Recherche groupée : {len(queries)} questions")
+    return retrieve_many(queries, collection_names, n_results, session_id=session_id)
+
+
 def tool_detect_bias(text: str) -> tuple[str, float]:
     """
     Outil 4 : Détecte les biais dans une offre d'emploi.
@@ -129,7 +195,13 @@ def tool_generate_summary(context: str, doc_type: str) -> str:
 # Pipeline principal
 # ---------------------------------------------------------------
 
-def run_pipeline(cv_path: str, job_path: str) -> FairHireResult:
+def run_pipeline(
+    cv_source: DocumentSource,
+    job_source: DocumentSource,
+    session_id: str | None = None,
+    on_token: Callable[[str], None] | None = None,
+    structured: bool = False
+) -> FairHireResult:
     """
     Pipeline complet Fair Hire :
     1. Charge les documents
@@ -139,32 +211,49 @@ def run_pipeline(cv_path: str, job_path: str) -> FairHireResult:
     5. Génère le rapport de matching
 
     Args:
-        cv_path: Chemin vers le CV (PDF)
-        job_path: Chemin vers l'offre d'emploi (PDF)
+        cv_source: CV (PDF) — chemin, octets ou objet fichier
+        job_source: Offre d'emploi (PDF ou texte) — chemin, octets ou objet fichier ;
+                    un texte collé se passe tel quel dans un io.StringIO
+        session_id: Session utilisateur. Si fourni, les collections sont conservées
+                    (ré-analyse incrémentale) et expirent par TTL ; sinon elles
+                    sont propres à cette requête et supprimées à la fin.
+        on_token: Si fourni, le rapport de matching est généré en streaming et
+                  chaque token lui est passé dès son arrivée (affichage progressif)
+        structured: Si True, le rapport est demandé en JSON compact (score, points
+                    forts, points à développer, recommandation), stocké dans
+                    result.matching et mis en forme localement ; on_token est ignoré
 
     Returns:
         FairHireResult avec tous les résultats
     """
+    ephemeral = session_id is None
+    session_id = session_id or new_session_id()
+
+    cv_name = source_name(cv_source, "CV")
+    job_name = source_name(job_source, "Offre collée")
+
     result = FairHireResult(
-    cv_filename=os.path.basename(cv_path).replace(".pdf", " (CV)"),
-    job_filename="Offre collée" if job_path.endswith(".txt") else os.path.basename(job_path)
+    cv_filename=cv_name.replace(".pdf", " (CV)"),
+    job_filename="Offre collée" if job_name.endswith(".txt") else job_name
 )
 
     try:
         start_time = time.time()
+        maybe_purge_expired_collections()
+
         # --- Étape 1 : Chargement des documents ---
         print("\n" + "="*50)
         print("ÉTAPE 1 : Chargement des documents")
         print("="*50)
-        cv_chunks = tool_load_document(cv_path, "cv")
-        job_chunks = tool_load_document(job_path, "job")
+        cv_chunks = tool_load_document(cv_source, "cv")
+        job_chunks = tool_load_document(job_source, "job")
 
         # --- Étape 2 : Vectorisation ---
         print("\n" + "="*50)
         print("ÉTAPE 2 : Vectorisation")
         print("="*50)
-        tool_vectorize(cv_chunks, "cv_current", {"type": "cv", "file": cv_path})
-        tool_vectorize(job_chunks, "job_current", {"type": "job", "file": job_path})
+        tool_vectorize(cv_chunks, "cv_current", {"type": "cv", "file": cv_name}, session_id)
+        tool_vectorize(job_chunks, "job_current", {"type": "job", "file": job_name}, session_id)
 
         # --- Étape 3 : Détection des biais ---
         print("\n" + "="*50)
@@ -177,27 +266,42 @@ def run_pipeline(cv_path: str, job_path: str) -> FairHireResult:
         print("\n" + "="*50)
         print("ÉTAPE 4 : Génération des résumés")
         print("="*50)
-        cv_context = tool_retrieve_context(
-            "compétences expériences formation", "cv_current"
-        )
-        job_context = tool_retrieve_context(
-            "compétences requises poste missions", "job_current"
+        cv_passages, job_passages = tool_retrieve_contexts(
+            [CV_CONTEXT_QUERY, JOB_CONTEXT_QUERY],
+            ["cv_current", "job_current"],
+            n_results=CONTEXT_CANDIDATES,
+            session_id=session_id
         )
+        # Meilleurs passages dans le budget de tokens du prompt de matching
+        cv_packed = pack_context(cv_passages, MATCHING_CONTEXT_TOKENS)
+        job_packed = pack_context(job_passages, MATCHING_CONTEXT_TOKENS)
+        result.context_tokens = cv_packed.tokens_used + job_packed.tokens_used
         # On skipe les résumés séparés pour économiser les appels Mistral
-        result.cv_summary = cv_context  # contexte brut
-        result.job_summary = job_context  # contexte brut
+        result.cv_summary = cv_packed.text  # contexte brut
+        result.job_summary = job_packed.text  # contexte brut
 
         # --- Étape 5 : Matching ---
         print("\n" + "="*50)
         print("ÉTAPE 5 : Rapport de matching")
         print("="*50)
-        result.matching_report = generate_matching_report(cv_context, job_context)
+        if structured:
+            # Contextes déjà réduits : transmis tels quels, sans second packing
+            result.matching = generate_structured_matching_report(cv_packed, job_packed)
+            result.matching_report = format_matching_report(result.matching)
+        elif on_token is None:
+            result.matching_report = generate_matching_report(cv_packed, job_packed)
+        else:
+            parts = []
+            for token in stream_matching_report(cv_packed, job_packed):
+                parts.append(token)
+                on_token(token)
+            result.matching_report = "".join(parts).strip()
 
         # Log MLflow
         end_time = time.time()
         log_pipeline_run(
-            cv_file=os.path.basename(cv_path),
-            job_file=os.path.basename(job_path),
+            cv_file=cv_name,
+            job_file=job_name,
             bias_score=result.bias_score,
             pipeline_status="success",
             duration_seconds=round(end_time - start_time, 2)
@@ -210,6 +314,10 @@ def run_pipeline(cv_path: str, job_path: str) -> FairHireResult:
         result.error = str(e)
         print(f"\n❌ Erreur pipeline : {e}")
 
+    finally:
+        if ephemeral:
+            delete_session_collections(session_id, ["cv_current", "job_current"])
+
     return result
 
 
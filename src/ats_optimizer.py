@@ -3,12 +3,20 @@ ats_optimizer.py
 Extracteur de mots-clés ATS et réécriture du CV pour matcher l'offre
 """
 
+import os
 from dataclasses import dataclass, field
+from typing import Iterator
 
 try:
-    from src.generator import call_mistral_api, call_ollama, USE_API
+    from src.generator import call_llm, stream_llm
+    from src.context_packer import pack_context
 except ImportError:
-    from generator import call_mistral_api, call_ollama, USE_API
+    from generator import call_llm, stream_llm
+    from context_packer import pack_context
+
+# Budgets de tokens du CV et de l'offre dans le prompt de réécriture
+ATS_CV_TOKENS = int(os.getenv("ATS_CV_TOKENS", "300"))
+ATS_JOB_TOKENS = int(os.getenv("ATS_JOB_TOKENS", "200"))
 
 # ---------------------------------------------------------------
 # Mots-clés techniques courants en Data/ML
@@ -81,21 +89,25 @@ def analyze_ats(cv_text: str, job_text: str) -> ATSReport:
     return report
 
 
-def rewrite_cv_for_ats(cv_text: str, missing_keywords: list[str], job_text: str) -> str:
-    if not missing_keywords:
-        return "✅ Ton CV contient déjà tous les mots-clés importants de l'offre !"
+NO_MISSING_KEYWORDS = "✅ Ton CV contient déjà tous les mots-clés importants de l'offre !"
+
 
+def build_ats_prompt(cv_text: str, missing_keywords: list[str], job_text: str) -> str:
     keywords_str = ", ".join(missing_keywords[:10])
+    cv_packed = pack_context(cv_text, ATS_CV_TOKENS)
+    job_packed = pack_context(job_text, ATS_JOB_TOKENS)
+    print(f"🧮 Contexte ATS : CV {cv_packed.tokens_used}/{ATS_CV_TOKENS}, "
+          f"offre {job_packed.tokens_used}/{ATS_JOB_TOKENS} tokens")
 
-    prompt = f"""Tu es un expert en rédaction de CV pour des postes Data/ML.
+    return f"""Tu es un expert en rédaction de CV pour des postes Data/ML.
 
 Le candidat postule à cette offre et son CV manque ces mots-clés : {keywords_str}
 
 CV actuel :
-{cv_text[:800]}
+{cv_packed.text}
 
 Offre d'emploi :
-{job_text[:500]}
+{job_packed.text}
 
 Réécris 3 bullet points du CV en intégrant NATURELLEMENT ces mots-clés.
 Ne mens pas — utilise uniquement les vraies expériences du candidat.
@@ -114,10 +126,36 @@ Format :
 ## 💡 Conseil
 Une phrase de conseil personnalisé."""
 
+
+def rewrite_cv_for_ats(
+    cv_text: str,
+    missing_keywords: list[str],
+    job_text: str,
+    use_cache: bool = True
+) -> str:
+    if not missing_keywords:
+        return NO_MISSING_KEYWORDS
+
+    prompt = build_ats_prompt(cv_text, missing_keywords, job_text)
+    try:
+        return call_llm(prompt, max_tokens=600, use_cache=use_cache)
+    except Exception as e:
+        return f"Erreur lors de la réécriture : {e}"
+
+
+def stream_rewrite_cv_for_ats(
+    cv_text: str,
+    missing_keywords: list[str],
+    job_text: str,
+    use_cache: bool = True
+) -> Iterator[str]:
+    """Comme rewrite_cv_for_ats, mais produit la réécriture token par token."""
+    if not missing_keywords:
+        yield NO_MISSING_KEYWORDS
+        return
+
+    prompt = build_ats_prompt(cv_text, missing_keywords, job_text)
     try:
-        if USE_API:
-            return call_mistral_api(prompt, max_tokens=600)
-        else:
-            return call_ollama(prompt)
+        yield from stream_llm(prompt, max_tokens=600, use_cache=use_cache)
     except Exception as e:
-        return f"Erreur lors de la réécriture : {e}"
\ No newline at end of file
+        yield f"\n\nErreur lors de la réécriture : {e}"
\ No newline at end of file
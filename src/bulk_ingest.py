@@ -0,0 +1,368 @@
+"""
+bulk_ingest.py
+Import en masse d'un dossier de CVs / offres dans le corpus ChromaDB
+Reprise après crash grâce à un manifeste SQLite, erreurs en JSONL
+
+Usage: python -m src.bulk_ingest <dossier> [--workers N] [--doc-type auto|cv|job]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from src.ingestion import ingest_document, INGESTION_WORKERS
+from src.embeddings import encode_chunks
+from src.candidate_search import add_candidate, CANDIDATE_COLLECTION
+
+SUPPORTED_SUFFIXES = (".pdf", ".txt")
+
+# Les offres d'emploi vont dans leur propre collection : elles ne doivent pas
+# être classées comme des candidats par search_candidates
+JOB_COLLECTION = os.getenv("JOB_COLLECTION", "job_corpus")
+DOC_TYPES = ("auto", "cv", "job")
+# En mode "auto", un fichier sous l'un de ces dossiers est une offre
+JOB_DIRECTORIES = {"offres", "offre", "jobs", "job", "offers"}
+
+# Nombre de fichiers dont les chunks sont encodés ensemble
+EMBED_BATCH_FILES = int(os.getenv("BULK_EMBED_BATCH_FILES", "32"))
+
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+
+# ---------------------------------------------------------------
+# Manifeste
+# ---------------------------------------------------------------
+
+class Manifest:
+    """
+    Suivi de l'import : une ligne par fichier (chemin, hash, statut, durées).
+    Chaque fichier est validé dès qu'il est stocké : après un crash, la reprise
+    saute les fichiers "done" dont la taille et la date n'ont pas changé.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                doc_hash TEXT,
+                status TEXT NOT NULL,
+                n_pages INTEGER,
+                n_chunks INTEGER,
+                parse_seconds REAL,
+                embed_seconds REAL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def is_done(self, path: str, size: int, mtime: float) -> bool:
+        row = self._conn.execute(
+            "SELECT size, mtime, status FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        return row is not None and row[2] == STATUS_DONE and row[0] == size and row[1] == mtime
+
+    def record(self, path: str, size: int, mtime: float, status: str, **fields) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files "
+            "(path, size, mtime, doc_hash, status, n_pages, n_chunks, "
+            "parse_seconds, embed_seconds, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime, fields.get("doc_hash"), status, fields.get("n_pages"),
+             fields.get("n_chunks"), fields.get("parse_seconds"), fields.get("embed_seconds"),
+             fields.get("error"), time.time())
+        )
+        self._conn.commit()
+
+    def counts(self) -> dict:
+        return dict(self._conn.execute(
+            "SELECT status, COUNT(*) FROM files GROUP BY status"
+        ).fetchall())
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ---------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------
+
+@dataclass
+class BulkReport:
+    scanned: int = 0
+    skipped: int = 0
+    done: int = 0
+    errors: int = 0
+    pages: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        rate = self.done / self.seconds if self.seconds else 0.0
+        return (
+            f"{self.done} fichiers importés, {self.skipped} déjà faits, {self.errors} erreurs "
+            f"— {self.pages} pages, {self.chunks} chunks en {self.seconds:.1f}s "
+            f"({rate:.1f} fichiers/s, {self.chunks / (self.seconds or 1):.0f} chunks/s)"
+        )
+
+
+def _parse_file(path: str, chunk_size: int, chunk_overlap: int) -> dict:
+    """Lit et découpe un fichier (exécuté dans un process du pool). Ne lève jamais."""
+    start = time.perf_counter()
+    try:
+        document = ingest_document(path, chunk_size, chunk_overlap, use_cache=False)
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "path": path,
+        "doc_hash": document.doc_hash,
+        "n_pages": document.n_pages,
+        "chunks": document.chunks,
+        "parse_seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def _parse_isolated(path: str, chunk_size: int, chunk_overlap: int) -> dict:
+    """
+    Lit un fichier seul dans un process dédié, après un crash du pool :
+    si le process plante encore, ce fichier est le coupable.
+    """
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        try:
+            return pool.submit(_parse_file, path, chunk_size, chunk_overlap).result()
+        except BrokenProcessPool as e:
+            return {"path": path, "error": f"BrokenProcessPool: {e or 'process du pool arrêté'}"}
+
+
+def document_type(rel_path: str, doc_type: str = "auto") -> str:
+    """Type d'un fichier ("cv" ou "job") : imposé, ou déduit de ses dossiers en mode "auto"."""
+    if doc_type not in DOC_TYPES:
+        raise ValueError(f"Type de document inconnu : {doc_type}. Utilisez {', '.join(DOC_TYPES)}.")
+    if doc_type != "auto":
+        return doc_type
+    directories = Path(rel_path).parts[:-1]
+    return "job" if any(d.lower() in JOB_DIRECTORIES for d in directories) else "cv"
+
+
+def scan_directory(directory: str) -> list[Path]:
+    """Liste récursivement les PDF / TXT d'un dossier, dans un ordre stable."""
+    return sorted(
+        p for p in Path(directory).rglob("*")
+        if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES
+    )
+
+
+def bulk_ingest(
+    directory: str,
+    collection_name: str = CANDIDATE_COLLECTION,
+    job_collection_name: str = JOB_COLLECTION,
+    doc_type: str = "auto",
+    manifest_path: str | None = None,
+    error_log: str | None = None,
+    max_workers: int = INGESTION_WORKERS,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    batch_files: int = EMBED_BATCH_FILES
+) -> BulkReport:
+    """
+    Importe tous les PDF / TXT d'un dossier dans le corpus.
+
+    Les fichiers sont lus et découpés par un pool de process ; les chunks sont
+    encodés par lots de `batch_files` fichiers dans le process principal (un seul
+    modèle chargé), puis stockés avec add_candidate (identifiant = chemin relatif,
+    métadonnée "type" = "cv" ou "job"). Une erreur sur un fichier, y compris le
+    crash d'un process du pool, est écrite dans `error_log` sans arrêter l'import :
+    après un crash, les fichiers en vol sont relus un par un pour n'accuser que
+    celui qui fait planter son process.
+
+    Args:
+        directory: Dossier à importer (parcouru récursivement)
+        collection_name: Collection des CVs (corpus de candidats)
+        job_collection_name: Collection des offres d'emploi
+        doc_type: "cv", "job", ou "auto" (offre si le fichier est sous un dossier
+                  de JOB_DIRECTORIES, CV sinon)
+        manifest_path: Manifeste SQLite (défaut : <dossier>/.ingest_manifest.sqlite)
+        error_log: Journal JSONL des erreurs (défaut : <dossier>/.ingest_errors.jsonl)
+        max_workers: Nombre de process (1 = lecture séquentielle, sans pool)
+
+    Returns:
+        BulkReport avec les compteurs et la durée
+    """
+    document_type("", doc_type)  # valide doc_type avant de commencer
+    root = Path(directory)
+    if not root.is_dir():
+        raise FileNotFoundError(f"Dossier introuvable : {directory}")
+
+    manifest = Manifest(manifest_path or str(root / ".ingest_manifest.sqlite"))
+    error_log = error_log or str(root / ".ingest_errors.jsonl")
+    report = BulkReport()
+    start = time.perf_counter()
+
+    todo: dict[str, tuple[str, int, float]] = {}
+    for path in scan_directory(directory):
+        report.scanned += 1
+        stat = path.stat()
+        rel = path.relative_to(root).as_posix()
+        if manifest.is_done(rel, stat.st_size, stat.st_mtime):
+            report.skipped += 1
+        else:
+            todo[str(path)] = (rel, stat.st_size, stat.st_mtime)
+
+    print(f"📂 {report.scanned} fichiers trouvés, {report.skipped} déjà importés, {len(todo)} à traiter")
+
+    batch: list[dict] = []
+
+    def log_error(parsed: dict) -> None:
+        rel, size, mtime = todo[parsed["path"]]
+        manifest.record(rel, size, mtime, STATUS_ERROR, error=parsed["error"])
+        with open(error_log, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"path": rel, "error": parsed["error"], "time": time.time()},
+                               ensure_ascii=False) + "\n")
+        report.errors += 1
+        print(f"❌ {rel} : {parsed['error']}")
+
+    def flush() -> None:
+        if not batch:
+            return
+        embed_start = time.perf_counter()
+        try:
+            vectors = encode_chunks([c for parsed in batch for c in parsed["chunks"]])
+        except Exception as e:
+            for parsed in batch:
+                log_error({**parsed, "error": f"{type(e).__name__}: {e}"})
+            batch.clear()
+            return
+        per_chunk = (time.perf_counter() - embed_start) / max(len(vectors), 1)
+
+        offset = 0
+        for parsed in batch:
+            rel, size, mtime = todo[parsed["path"]]
+            n = len(parsed["chunks"])
+            kind = document_type(rel, doc_type)
+            try:
+                store_start = time.perf_counter()
+                add_candidate(rel, parsed["chunks"],
+                              {"file": rel, "doc_hash": parsed["doc_hash"], "type": kind},
+                              collection_name if kind == "cv" else job_collection_name,
+                              embeddings=vectors[offset:offset + n])
+                embed_seconds = per_chunk * n + time.perf_counter() - store_start
+            except Exception as e:
+                log_error({**parsed, "error": f"{type(e).__name__}: {e}"})
+            else:
+                manifest.record(
+                    rel, size, mtime, STATUS_DONE,
+                    doc_hash=parsed["doc_hash"], n_pages=parsed["n_pages"], n_chunks=n,
+                    parse_seconds=parsed["parse_seconds"], embed_seconds=round(embed_seconds, 4)
+                )
+                report.done += 1
+                report.pages += parsed["n_pages"]
+                report.chunks += n
+            offset += n
+        batch.clear()
+
+        elapsed = time.perf_counter() - start
+        print(f"⏳ {report.done + report.errors}/{len(todo)} — {report.done / elapsed:.1f} fichiers/s")
+
+    def handle(parsed: dict) -> None:
+        if "error" in parsed:
+            log_error(parsed)
+            return
+        batch.append(parsed)
+        if len(batch) >= batch_files:
+            flush()
+
+    try:
+        if max_workers <= 1:
+            for path in todo:
+                handle(_parse_file(path, chunk_size, chunk_overlap))
+        else:
+            pending = iter(todo)
+            suspects: list[str] = []
+            pool_broken = True
+            while pool_broken:
+                pool_broken = False
+                with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    # Fenêtre bornée de tâches en vol : la mémoire ne dépend pas de la taille du dossier
+                    window = {}
+                    for path in islice(pending, 4 * max_workers):
+                        window[pool.submit(_parse_file, path, chunk_size, chunk_overlap)] = path
+                    while window:
+                        finished = next(as_completed(window))
+                        path = window.pop(finished)
+                        try:
+                            parsed = finished.result()
+                        except BrokenProcessPool:
+                            # Un process a planté (ex: segfault PyMuPDF sur un PDF corrompu) :
+                            # le coupable est parmi les fichiers en vol non terminés
+                            for future, in_flight in [(finished, path), *window.items()]:
+                                if future.done() and future.exception() is None:
+                                    handle(future.result())
+                                else:
+                                    suspects.append(in_flight)
+                            window.clear()
+                            pool_broken = True
+                            break
+                        handle(parsed)
+                        next_path = next(pending, None)
+                        if next_path is not None:
+                            window[pool.submit(_parse_file, next_path, chunk_size, chunk_overlap)] = next_path
+                if pool_broken:
+                    # Quarantaine : chaque suspect est relu seul, seul le fichier
+                    # qui fait planter son process est journalisé en erreur
+                    print(f"♻️  Pool de process recréé après un crash, "
+                          f"{len(suspects)} fichiers relus un par un")
+                    for suspect in suspects:
+                        handle(_parse_isolated(suspect, chunk_size, chunk_overlap))
+                    suspects.clear()
+        flush()
+    finally:
+        manifest.close()
+
+    report.seconds = round(time.perf_counter() - start, 2)
+    print(f"✅ {report.summary()}")
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Import en masse de CVs / offres (PDF, TXT)")
+    parser.add_argument("directory", help="Dossier à importer (récursif)")
+    parser.add_argument("--collection", default=CANDIDATE_COLLECTION, help="Collection des CVs")
+    parser.add_argument("--job-collection", default=JOB_COLLECTION, help="Collection des offres")
+    parser.add_argument("--doc-type", choices=DOC_TYPES, default="auto",
+                        help="cv, job, ou auto (offre si sous un dossier offres/, jobs/...)")
+    parser.add_argument("--workers", type=int, default=INGESTION_WORKERS, help="Nombre de process")
+    parser.add_argument("--manifest", default=None, help="Chemin du manifeste SQLite")
+    parser.add_argument("--errors", default=None, help="Journal JSONL des erreurs")
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    report = bulk_ingest(
+        args.directory,
+        collection_name=args.collection,
+        job_collection_name=args.job_collection,
+        doc_type=args.doc_type,
+        manifest_path=args.manifest,
+        error_log=args.errors,
+        max_workers=args.workers,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap
+    )
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
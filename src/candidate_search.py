@@ -0,0 +1,313 @@
+"""
+candidate_search.py
+Présélection : classe les CVs d'un corpus persistant face à une offre d'emploi
+"""
+
+import os
+import heapq
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.embeddings import (
+    get_chroma_client,
+    get_collection,
+    encode_chunks
+)
+from src.lexical_index import delete_lexical_index
+
+load_dotenv()
+
+# Collection ChromaDB qui contient tous les CVs (un chunk = une entrée)
+CANDIDATE_COLLECTION = os.getenv("CANDIDATE_COLLECTION", "cv_corpus")
+
+# Paramètres HNSW par défaut du corpus (voir create_candidate_corpus)
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+
+AGGREGATIONS = ("max", "mean", "top_n")
+
+
+# ---------------------------------------------------------------
+# Dataclass résultat
+# ---------------------------------------------------------------
+
+@dataclass
+class CandidateMatch:
+    candidate_id: str
+    score: float = 0.0
+    n_matched_chunks: int = 0
+    best_chunk: str = ""
+    metadata: dict = field(default_factory=dict)
+
+
+# ---------------------------------------------------------------
+# Corpus de candidats
+# ---------------------------------------------------------------
+
+def create_candidate_corpus(
+    collection_name: str = CANDIDATE_COLLECTION,
+    hnsw_m: int = HNSW_M,
+    hnsw_ef_construction: int = HNSW_EF_CONSTRUCTION,
+    hnsw_ef_search: int = HNSW_EF_SEARCH
+):
+    """
+    Ouvre la collection du corpus, ou la crée avec ces paramètres HNSW.
+
+    Un corpus existant est ouvert tel quel : get_or_create_collection
+    écraserait ses métadonnées par les valeurs par défaut. ChromaDB (0.5)
+    fixe M, ef_construction et ef_search à la création de l'index : pour les
+    changer, il faut reconstruire le corpus.
+    """
+    client = get_chroma_client()
+    try:
+        return client.get_collection(name=collection_name)
+    except Exception:
+        pass
+    return client.create_collection(
+        name=collection_name,
+        metadata={
+            "hnsw:M": hnsw_m,
+            "hnsw:construction_ef": hnsw_ef_construction,
+            "hnsw:search_ef": hnsw_ef_search,
+        }
+    )
+
+
+def add_candidate(
+    candidate_id: str,
+    chunks: list[str],
+    metadata: dict = None,
+    collection_name: str = CANDIDATE_COLLECTION,
+    embeddings=None
+) -> int:
+    """
+    Ajoute (ou remplace) les chunks d'un CV dans le corpus.
+
+    Args:
+        candidate_id: Identifiant unique du candidat
+        chunks: Chunks du CV (depuis ingestion.py)
+        metadata: Métadonnées filtrables (ex: ville, séniorité, disponibilité) ;
+                  "type" vaut "cv" par défaut ("job" pour une offre)
+        collection_name: Collection du corpus
+        embeddings: Vecteurs déjà calculés (imports en masse), sinon encodés ici
+
+    Returns:
+        Nombre de chunks stockés
+    """
+    collection = create_candidate_corpus(collection_name)
+    collection.delete(where={"candidate_id": candidate_id})
+    if chunks:
+        meta = {"type": "cv", **(metadata or {}), "candidate_id": candidate_id}
+        collection.add(
+            documents=chunks,
+            embeddings=encode_chunks(chunks) if embeddings is None else embeddings,
+            metadatas=[{**meta, "chunk_index": i} for i in range(len(chunks))],
+            ids=[f"{candidate_id}_chunk_{i}" for i in range(len(chunks))]
+        )
+    # Index BM25 du corpus périmé : reconstruit à la prochaine recherche lexicale
+    delete_lexical_index(collection_name)
+    return len(chunks)
+
+
+# ---------------------------------------------------------------
+# Agrégation et top-k
+# ---------------------------------------------------------------
+
+def aggregate_scores(scores: list[float], method: str = "max", top_n: int = 3) -> float:
+    """
+    Agrège les scores des chunks d'un même CV en un score document.
+
+    Args:
+        scores: Scores de similarité des chunks retrouvés
+        method: "max" (meilleur chunk), "mean" (moyenne) ou "top_n" (moyenne des n meilleurs)
+        top_n: Nombre de chunks pris en compte pour "top_n"
+    """
+    if method not in AGGREGATIONS:
+        raise ValueError(f"Agrégation inconnue : {method}. Utilisez {', '.join(AGGREGATIONS)}.")
+    if not scores:
+        return 0.0
+    if method == "max":
+        return max(scores)
+    if method == "mean":
+        return sum(scores) / len(scores)
+    best = heapq.nlargest(top_n, scores)
+    return sum(best) / len(best)
+
+
+def top_k(scored: Iterable[tuple[float, str]], k: int) -> list[tuple[float, str]]:
+    """
+    Garde les k meilleurs éléments d'un flux (score, id) avec un tas de taille k,
+    sans trier tout le flux. Renvoie du meilleur au moins bon.
+    """
+    heap: list[tuple[float, str]] = []
+    for item in scored:
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+    return sorted(heap, reverse=True)
+
+
+# ---------------------------------------------------------------
+# Recherche
+# ---------------------------------------------------------------
+
+def rescore_candidates(
+    collection,
+    candidate_ids: list[str],
+    query_vectors: list[list[float]],
+    where: dict | None = None
+) -> dict[str, list[tuple[float, str, dict]]]:
+    """
+    Score exact de tous les chunks des candidats présélectionnés : un chunk
+    garde sa meilleure similarité face aux chunks de l'offre (même mesure
+    que l'index, 1 - L2²).
+
+    Args:
+        where: Filtre de la recherche (métadonnées, type de document), appliqué
+               aussi ici pour ne rescorer que les chunks qu'elle autorise
+
+    Returns:
+        {candidate_id: [(similarité, chunk, métadonnées), ...]}
+    """
+    selection = {"candidate_id": {"$in": candidate_ids}}
+    stored = collection.get(
+        where={"$and": [where, selection]} if where else selection,
+        include=["embeddings", "documents", "metadatas"]
+    )
+    if not stored["ids"]:
+        return {}
+
+    queries = np.asarray(query_vectors, dtype=np.float32)
+    vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+    # ||q - x||² = ||q||² + ||x||² - 2 q·x
+    distances = (
+        (queries ** 2).sum(axis=1, keepdims=True)
+        + (vectors ** 2).sum(axis=1)
+        - 2 * queries @ vectors.T
+    )
+    similarities = 1 - np.maximum(distances, 0.0).min(axis=0)
+
+    per_candidate: dict[str, list[tuple[float, str, dict]]] = {}
+    for similarity, doc, meta in zip(similarities, stored["documents"], stored["metadatas"]):
+        per_candidate.setdefault(meta["candidate_id"], []).append((float(similarity), doc, meta))
+    return per_candidate
+
+
+def search_candidates(
+    job_chunks: list[str],
+    top_k_candidates: int = 10,
+    aggregation: str = "max",
+    top_n: int = 3,
+    where: dict | None = None,
+    chunk_pool: int | None = None,
+    collection_name: str = CANDIDATE_COLLECTION,
+    doc_type: str | None = None
+) -> list[CandidateMatch]:
+    """
+    Classe les CVs du corpus face à une offre d'emploi.
+
+    Chaque chunk de l'offre interroge l'index HNSW ; un chunk de CV garde
+    sa meilleure similarité, puis les chunks sont agrégés par candidat.
+    Pour "mean" et "top_n", tous les chunks des candidats retrouvés sont
+    rescorés (rescore_candidates) : le score d'un CV ne dépend pas du nombre
+    de ses chunks entrés dans la réserve de l'index.
+
+    Args:
+        job_chunks: Chunks de l'offre d'emploi
+        top_k_candidates: Nombre de candidats à retourner
+        aggregation: "max", "mean" ou "top_n" (voir aggregate_scores)
+        top_n: Nombre de chunks pour l'agrégation "top_n"
+        where: Pré-filtre sur les métadonnées, syntaxe ChromaDB
+               (ex: {"city": "Paris"}, {"years": {"$gte": 3}})
+        chunk_pool: Nombre de chunks de CV récupérés par chunk d'offre
+                    (défaut : 20 × top_k_candidates). C'est le réglage de rappel
+                    à la requête : l'ef_search de l'index HNSW est fixé à la
+                    création du corpus (HNSW_EF_SEARCH, voir create_candidate_corpus)
+        collection_name: Collection du corpus
+        doc_type: Ne garde que les documents de ce type (ex: "cv" pour écarter
+                  des offres importées par erreur dans le corpus). Les entrées
+                  sans métadonnée "type" (corpus antérieur) sont alors exclues.
+
+    Returns:
+        Liste de CandidateMatch, du meilleur au moins bon
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Agrégation inconnue : {aggregation}. Utilisez {', '.join(AGGREGATIONS)}.")
+    if not job_chunks:
+        return []
+
+    collection = get_collection(collection_name)
+    n_chunks = min(chunk_pool or 20 * top_k_candidates, collection.count())
+    if n_chunks == 0:
+        return []
+
+    if doc_type is not None:
+        where = {"$and": [where, {"type": doc_type}]} if where else {"type": doc_type}
+
+    query_vectors = encode_chunks(job_chunks)
+    results = collection.query(
+        query_embeddings=query_vectors,
+        n_results=n_chunks,
+        where=where
+    )
+
+    # Meilleure similarité de chaque chunk de CV, toutes questions confondues
+    best_chunks: dict[str, tuple[float, str, dict]] = {}
+    for row in range(len(results["ids"])):
+        for id_, doc, meta, dist in zip(
+            results["ids"][row],
+            results["documents"][row],
+            results["metadatas"][row],
+            results["distances"][row]
+        ):
+            similarity = 1 - dist
+            if id_ not in best_chunks or similarity > best_chunks[id_][0]:
+                best_chunks[id_] = (similarity, doc, meta)
+
+    # Regroupement par candidat
+    per_candidate: dict[str, list[tuple[float, str, dict]]] = {}
+    for similarity, doc, meta in best_chunks.values():
+        per_candidate.setdefault(meta["candidate_id"], []).append((similarity, doc, meta))
+
+    if aggregation != "max":
+        per_candidate = rescore_candidates(collection, list(per_candidate), query_vectors, where)
+
+    ranked = top_k(
+        (
+            (aggregate_scores([c[0] for c in chunks], aggregation, top_n), candidate_id)
+            for candidate_id, chunks in per_candidate.items()
+        ),
+        top_k_candidates
+    )
+
+    matches = []
+    for score, candidate_id in ranked:
+        chunks = per_candidate[candidate_id]
+        best = max(chunks, key=lambda c: c[0])
+        meta = {k: v for k, v in best[2].items() if k not in ("candidate_id", "chunk_index")}
+        matches.append(CandidateMatch(
+            candidate_id=candidate_id,
+            score=round(score, 4),
+            n_matched_chunks=len(chunks),
+            best_chunk=best[1],
+            metadata=meta
+        ))
+
+    print(f"🏆 {len(matches)} candidats classés sur {len(per_candidate)} retrouvés")
+    return matches
+
+
+# Test rapide si on lance ce fichier directement
+if __name__ == "__main__":
+    add_candidate("alice", ["Data engineer : dbt, Airflow, Snowflake.", "5 ans d'expérience."], {"city": "Paris"})
+    add_candidate("bob", ["Développeur web React et Node.js."], {"city": "Lyon"})
+    add_candidate("chloe", ["ML engineer : SageMaker, MLflow, Docker."], {"city": "Paris"})
+
+    offre = ["Nous recherchons un data engineer maîtrisant dbt et Airflow."]
+    for match in search_candidates(offre, top_k_candidates=2, where={"city": "Paris"}):
+        print(f"{match.candidate_id} — {match.score} | {match.best_chunk}")
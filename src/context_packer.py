@@ -0,0 +1,197 @@
+"""
+context_packer.py
+Remplit un budget de tokens avec les meilleurs passages retrouvés
+Remplace les troncatures fixes en caractères ([:1000], [:800]...) des prompts
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Tokenizer Hugging Face servant à compter les tokens du contexte
+# (ex: "mistralai/Mistral-7B-Instruct-v0.2" pour celui du LLM). Par défaut,
+# celui du modèle d'embedding, chargé seul (sans le SentenceTransformer).
+# L'estimation locale (approx_token_count) ne sert que s'il est indisponible.
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+
+# En dessous, un reste de budget n'est pas rempli par un passage tronqué
+MIN_PASSAGE_TOKENS = 20
+
+# Chevauchement minimal (en caractères) pour dédoublonner deux chunks voisins
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400
+
+_APPROX_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+_SENTENCE_END = re.compile(r"[.!?…](?=\s)|\n")
+
+_TOKEN_COUNTER: Callable[[str], int] | None = None
+
+
+def approx_token_count(text: str) -> int:
+    """
+    Estimation du nombre de tokens BPE : un token par tranche de 4 caractères
+    de mot, un par signe de ponctuation. Légèrement pessimiste pour Mistral
+    en français, donc le budget n'est jamais dépassé en pratique.
+    """
+    return len(_APPROX_TOKEN_PATTERN.findall(text))
+
+
+def get_token_counter() -> Callable[[str], int]:
+    """
+    Compteur de tokens du tokenizer CONTEXT_TOKENIZER, chargé au premier
+    appel ; l'estimation seulement si le tokenizer n'est pas disponible.
+    """
+    global _TOKEN_COUNTER
+    if _TOKEN_COUNTER is None:
+        try:
+            from src.ingestion import token_length_function
+            _TOKEN_COUNTER = token_length_function(CONTEXT_TOKENIZER)
+        except (ImportError, OSError) as e:
+            print(f"⚠️ Tokenizer {CONTEXT_TOKENIZER} indisponible ({e}), estimation utilisée")
+            _TOKEN_COUNTER = approx_token_count
+    return _TOKEN_COUNTER
+
+
+def count_tokens(text: str) -> int:
+    return get_token_counter()(text)
+
+
+@dataclass
+class PackedContext:
+    text: str = ""
+    tokens_used: int = 0
+    budget: int = 0
+    n_passages: int = 0
+    n_dropped: int = 0
+
+
+# ---------------------------------------------------------------
+# Dédoublonnage et troncature
+# ---------------------------------------------------------------
+
+def _overlap(left: str, right: str) -> int:
+    """Longueur du plus long suffixe de `left` qui est aussi un préfixe de `right`."""
+    longest = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _deduplicate(text: str, selected: list[str]) -> str:
+    """
+    Retire d'un passage le texte déjà présent dans les passages retenus :
+    passage inclus dans un autre, ou chevauchement de découpage (chunk_overlap)
+    en début ou en fin de passage.
+    """
+    for kept in selected:
+        if text in kept:
+            return ""
+        start = _overlap(kept, text)
+        if start:
+            text = text[start:]
+        end = _overlap(text, kept)
+        if end:
+            text = text[:-end]
+    return text.strip()
+
+
+def truncate_to_budget(text: str, budget: int, count: Callable[[str], int] | None = None) -> str:
+    """
+    Coupe un texte pour qu'il tienne dans `budget` tokens, de préférence
+    en fin de phrase, sinon entre deux mots.
+    """
+    count = count or get_token_counter()
+    if count(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+
+    # Plus long préfixe qui tient dans le budget (recherche dichotomique)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = text[:low]
+
+    sentence_ends = [m.end() for m in _SENTENCE_END.finditer(prefix)]
+    if sentence_ends and sentence_ends[-1] >= len(prefix) // 2:
+        return prefix[:sentence_ends[-1]].strip()
+    if " " in prefix:
+        return prefix.rsplit(" ", 1)[0].strip()
+    return prefix.strip()
+
+
+# ---------------------------------------------------------------
+# Packing
+# ---------------------------------------------------------------
+
+def pack_context(
+    passages: list[dict] | str,
+    budget_tokens: int,
+    count: Callable[[str], int] | None = None
+) -> PackedContext:
+    """
+    Remplit `budget_tokens` avec les passages les mieux notés.
+
+    Les passages sont pris par score décroissant, débarrassés du texte déjà
+    retenu (chevauchement entre chunks voisins, doublons de la recherche
+    hybride), puis ajoutés tant qu'ils tiennent ; le dernier peut être coupé
+    en fin de phrase pour finir de remplir le budget.
+
+    Args:
+        passages: Passages de retrieve() (clés "text" et "score"),
+                  ou un texte brut (coupé en fin de phrase si trop long)
+        budget_tokens: Nombre maximal de tokens du contexte
+        count: Compteur de tokens (défaut : get_token_counter())
+
+    Returns:
+        PackedContext (texte au format "[Extrait i]", tokens utilisés, passages retenus)
+    """
+    count = count or get_token_counter()
+
+    if isinstance(passages, str):
+        text = truncate_to_budget(passages.strip(), budget_tokens, count)
+        return PackedContext(text, count(text), budget_tokens, 1 if text else 0, 0)
+
+    ranked = sorted(passages, key=lambda p: p.get("score", 0.0), reverse=True)
+    selected: list[str] = []
+    blocks: list[str] = []
+    used = 0
+
+    for passage in ranked:
+        text = _deduplicate(passage["text"].strip(), selected)
+        if not text:
+            continue
+
+        header = f"[Extrait {len(blocks) + 1}]\n"
+        separator = "\n\n" if blocks else ""
+        overhead = count(separator + header)
+        remaining = budget_tokens - used - overhead
+        if remaining < MIN_PASSAGE_TOKENS and count(text) > remaining:
+            continue
+
+        text = truncate_to_budget(text, remaining, count)
+        if not text:
+            continue
+
+        selected.append(text)
+        blocks.append(header + text)
+        used += overhead + count(text)
+
+    packed = "\n\n".join(blocks)
+    return PackedContext(
+        text=packed,
+        tokens_used=count(packed),
+        budget=budget_tokens,
+        n_passages=len(blocks),
+        n_dropped=len(ranked) - len(blocks)
+    )
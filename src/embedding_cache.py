@@ -0,0 +1,369 @@
+"""
+embedding_cache.py
+Cache disque des embeddings, adressé par contenu (modèle + hash du texte)
+Index SQLite + vecteurs stockés dans un fichier memory-mappé par modèle
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+
+# Croissance du fichier de vecteurs (en nombre de slots)
+_INITIAL_CAPACITY = 1024
+
+
+def text_hash(text: str) -> str:
+    """Hash SHA-256 d'un morceau de texte (clé de contenu)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache LRU persistant des embeddings.
+
+    Chaque modèle a son propre fichier de vecteurs (float16 ou float32),
+    découpé en slots de taille fixe. L'index SQLite associe
+    (modèle, hash du texte) -> slot et garde la date du dernier accès
+    pour l'éviction LRU. Le plafond `max_entries` s'applique par modèle.
+
+    Le dtype de chaque modèle est enregistré : si EMBEDDING_CACHE_DTYPE change,
+    les entrées écrites avec l'ancien dtype sont invalidées. L'allocation des
+    slots et la lecture des vecteurs se font dans une transaction d'écriture
+    (BEGIN IMMEDIATE) et un slot est unique par modèle, le cache peut donc être
+    partagé entre process (application et import en masse).
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        dtype: str = EMBEDDING_CACHE_DTYPE
+    ):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"dtype non supporté : {dtype}. Utilisez float16 ou float32.")
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._blobs: dict[str, np.memmap] = {}
+        self._conn = sqlite3.connect(
+            str(self.path / "index.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS models (
+                model TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                dtype TEXT
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (model, last_access);
+        """)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """Met à niveau un index créé par une version précédente du cache."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(models)")]
+        if "dtype" not in columns:
+            # dtype inconnu : les entrées seront invalidées au premier accès
+            self._conn.execute("ALTER TABLE models ADD COLUMN dtype TEXT")
+
+        try:
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_entries_slot ON entries (model, slot)"
+            )
+        except sqlite3.IntegrityError:
+            # Slots attribués deux fois par des process concurrents : vecteurs
+            # indéterminés, on supprime les entrées concernées
+            self._conn.execute("""
+                DELETE FROM entries WHERE (model, slot) IN (
+                    SELECT model, slot FROM entries GROUP BY model, slot HAVING COUNT(*) > 1
+                )
+            """)
+            self._conn.execute(
+                "CREATE UNIQUE INDEX idx_entries_slot ON entries (model, slot)"
+            )
+
+    # -----------------------------------------------------------
+    # Stockage des vecteurs
+    # -----------------------------------------------------------
+
+    def _blob_path(self, model_name: str, dtype: str | None = None) -> Path:
+        slug = re.sub(r"[^a-zA-Z0-9_.-]", "_", model_name)
+        return self.path / f"{slug}.{dtype or self.dtype.name}.bin"
+
+    def _model_dim(self, model_name: str) -> int | None:
+        """
+        Dimension des vecteurs d'un modèle, ou None s'il n'a pas d'entrée.
+        Les entrées écrites avec un autre dtype sont supprimées : leur fichier
+        de vecteurs n'est pas celui que ce cache lit.
+        """
+        row = self._conn.execute(
+            "SELECT dim, dtype FROM models WHERE model = ?", (model_name,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] == self.dtype.name:
+            return row[0]
+
+        print(f"♻️  Cache d'embeddings de {model_name} invalidé (dtype {row[1]} → {self.dtype.name})")
+        self._conn.execute("DELETE FROM entries WHERE model = ?", (model_name,))
+        self._conn.execute("DELETE FROM models WHERE model = ?", (model_name,))
+        if row[1]:
+            self._blob_path(model_name, row[1]).unlink(missing_ok=True)
+        return None
+
+    def _open_blob(self, model_name: str, dim: int, min_slots: int = 0) -> np.memmap:
+        """Ouvre (et agrandit si besoin) le fichier de vecteurs d'un modèle."""
+        blob = self._blobs.get(model_name)
+        if blob is not None and blob.shape[0] >= min_slots:
+            return blob
+
+        blob_path = self._blob_path(model_name)
+        row_bytes = dim * self.dtype.itemsize
+        current_slots = blob_path.stat().st_size // row_bytes if blob_path.exists() else 0
+
+        capacity = max(current_slots, _INITIAL_CAPACITY)
+        while capacity < min_slots:
+            capacity *= 2
+        capacity = min(capacity, max(self.max_entries, current_slots, min_slots))
+
+        if capacity > current_slots:
+            if blob is not None:
+                blob.flush()
+            with open(blob_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+
+        blob = np.memmap(blob_path, dtype=self.dtype, mode="r+", shape=(capacity, dim))
+        self._blobs[model_name] = blob
+        return blob
+
+    # -----------------------------------------------------------
+    # API publique
+    # -----------------------------------------------------------
+
+    def get_many(self, model_name: str, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Cherche les embeddings des textes dans le cache.
+
+        Returns:
+            Liste alignée sur `texts` : vecteur float32 ou None si absent
+        """
+        results: list[np.ndarray | None] = [None] * len(texts)
+        if not texts:
+            return results
+
+        hashes = [text_hash(t) for t in texts]
+
+        with self._lock:
+            # Recherche des slots et lecture des vecteurs dans la même transaction
+            # d'écriture : put_many d'un autre process ne peut pas évincer et
+            # réécrire un slot entre les deux. En WAL, une simple transaction de
+            # lecture ne bloque pas les écritures.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._model_dim(model_name)
+                slots = self._lookup_slots(model_name, list(set(hashes))) if dim is not None else {}
+
+                if slots:
+                    # Un autre process a pu agrandir le fichier depuis son ouverture
+                    blob = self._open_blob(model_name, dim, min_slots=max(slots.values()) + 1)
+                    for i, h in enumerate(hashes):
+                        if h in slots:
+                            results[i] = np.array(blob[slots[h]], dtype=np.float32)
+
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE entries SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model_name, h) for h in slots]
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+            n_hits = sum(r is not None for r in results)
+            self.hits += n_hits
+            self.misses += len(texts) - n_hits
+
+        return results
+
+    def put_many(self, model_name: str, texts: list[str], vectors) -> np.ndarray:
+        """
+        Ajoute des embeddings au cache (éviction LRU si le plafond est atteint).
+
+        Returns:
+            Les vecteurs tels que stockés (arrondis au dtype du cache),
+            pour que le résultat soit identique qu'il vienne du cache ou non
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        stored = vectors.astype(self.dtype).astype(np.float32)
+        if len(texts) == 0 or self.max_entries <= 0:
+            return stored
+
+        dim = vectors.shape[1]
+        unique: dict[str, int] = {}
+        for i, t in enumerate(texts):
+            unique.setdefault(text_hash(t), i)
+
+        with self._lock:
+            # Transaction d'écriture dès la lecture : deux process ne peuvent pas
+            # attribuer le même slot entre la recherche et l'insertion
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                known_dim = self._model_dim(model_name)
+                if known_dim is None:
+                    self._conn.execute(
+                        "INSERT INTO models (model, dim, dtype) VALUES (?, ?, ?)",
+                        (model_name, dim, self.dtype.name)
+                    )
+                elif known_dim != dim:
+                    raise ValueError(
+                        f"Dimension incohérente pour {model_name} : {dim} au lieu de {known_dim}"
+                    )
+
+                existing = self._lookup_slots(model_name, list(unique))
+                to_insert = [
+                    (h, i) for h, i in unique.items() if h not in existing
+                ][:self.max_entries]
+
+                if to_insert:
+                    free_slots = self._allocate_slots(model_name, len(to_insert))
+                    blob = self._open_blob(model_name, dim, min_slots=max(free_slots) + 1)
+
+                    now = time.time()
+                    for (h, i), slot in zip(to_insert, free_slots):
+                        blob[slot] = stored[i]
+                    blob.flush()
+
+                    self._conn.executemany(
+                        "INSERT INTO entries (model, text_hash, slot, last_access) VALUES (?, ?, ?, ?)",
+                        [(model_name, h, slot, now) for (h, _), slot in zip(to_insert, free_slots)]
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+        return stored
+
+    def _lookup_slots(self, model_name: str, hashes: list[str]) -> dict[str, int]:
+        """hash -> slot pour les hashes présents (requêtes par lots de 500)."""
+        slots = {}
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            slots.update(self._conn.execute(
+                f"SELECT text_hash, slot FROM entries "
+                f"WHERE model = ? AND text_hash IN ({placeholders})",
+                (model_name, *batch)
+            ).fetchall())
+        return slots
+
+    def _allocate_slots(self, model_name: str, n_needed: int) -> list[int]:
+        """Renvoie des slots libres, en évinçant les entrées les moins récentes si besoin."""
+        n_entries, max_slot = self._conn.execute(
+            "SELECT COUNT(*), MAX(slot) FROM entries WHERE model = ?", (model_name,)
+        ).fetchone()
+        next_slot = 0 if max_slot is None else max_slot + 1
+        n_new = min(n_needed, max(self.max_entries - n_entries, 0))
+        slots = list(range(next_slot, next_slot + n_new))
+
+        n_evict = n_needed - n_new
+        if n_evict > 0:
+            evicted = self._conn.execute(
+                "SELECT text_hash, slot FROM entries WHERE model = ? "
+                "ORDER BY last_access ASC LIMIT ?",
+                (model_name, n_evict)
+            ).fetchall()
+            self._conn.executemany(
+                "DELETE FROM entries WHERE model = ? AND text_hash = ?",
+                [(model_name, h) for h, _ in evicted]
+            )
+            slots.extend(slot for _, slot in evicted)
+
+        return slots
+
+    def stats(self) -> dict:
+        """Compteurs du cache : hits, misses, taux de hit et taille."""
+        with self._lock:
+            n_entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": n_entries,
+                "max_entries": self.max_entries,
+                "dtype": self.dtype.name,
+            }
+
+    def clear(self) -> None:
+        """Vide complètement le cache (index et vecteurs)."""
+        with self._lock:
+            self._blobs.clear()
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM models")
+            self._conn.commit()
+            for blob_path in self.path.glob("*.bin"):
+                blob_path.unlink()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            for blob in self._blobs.values():
+                blob.flush()
+            self._blobs.clear()
+            self._conn.close()
+
+
+# ---------------------------------------------------------------
+# Instance partagée par le process
+# ---------------------------------------------------------------
+
+_CACHE: EmbeddingCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Retourne le cache partagé, ou None si désactivé (EMBEDDING_CACHE_ENABLED=false)."""
+    global _CACHE
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = EmbeddingCache()
+        return _CACHE
+
+
+def cache_stats() -> dict:
+    """Compteurs du cache partagé (vide si le cache est désactivé)."""
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {}
@@ -4,57 +4,309 @@ Transformation du texte en vecteurs numériques et stockage dans ChromaDB
 """
 
 import os
+import re
+import threading
+import time
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
 
+from src.embedding_cache import get_embedding_cache, text_hash
+from src.vector_store import get_numpy_store
+from src.lexical_index import delete_lexical_index
+
 load_dotenv()
 
 # Modèle d'embedding léger et efficace
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
 
+# Backend vectoriel : "auto" (NumPy en mémoire pour les petits documents
+# de session, ChromaDB sinon), "numpy" ou "chroma"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
+NUMPY_BACKEND_MAX_CHUNKS = int(os.getenv("NUMPY_BACKEND_MAX_CHUNKS", "64"))
+
+# Durée de vie des collections de session sans écriture (en secondes)
+SESSION_COLLECTION_TTL_SECONDS = float(os.getenv("SESSION_COLLECTION_TTL_SECONDS", "3600"))
+
+# Intervalle minimal entre deux purges des collections expirées (en secondes)
+SESSION_PURGE_INTERVAL_SECONDS = float(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "300"))
+
+
+# Registre process-wide des modèles chargés : (nom, device) -> entrée
+# Décharge automatique après inactivité (0 = désactivée)
+EMBEDDING_IDLE_UNLOAD_SECONDS = float(os.getenv("EMBEDDING_IDLE_UNLOAD_SECONDS", "0"))
+
+_MODEL_REGISTRY: dict[tuple[str, str], dict] = {}
+_REGISTRY_LOCK = threading.RLock()
+_REAPER_THREAD: threading.Thread | None = None
+
 
-def get_embedding_model() -> SentenceTransformer:
+def _registry_key(model_name: str, device: str | None) -> tuple[str, str]:
+    return (model_name, device or "auto")
+
+
+def get_embedding_model(
+    model_name: str = EMBEDDING_MODEL,
+    device: str | None = None
+) -> SentenceTransformer:
     """
-    Charge le modèle d'embedding.
+    Retourne le modèle d'embedding partagé par tout le process.
+    Chargé une seule fois par couple (modèle, device), puis réutilisé.
     Téléchargé automatiquement au premier appel (~90Mo).
     """
-    print(f"📦 Chargement du modèle d'embedding : {EMBEDDING_MODEL}")
-    model = SentenceTransformer(EMBEDDING_MODEL)
+    key = _registry_key(model_name, device)
+
+    with _REGISTRY_LOCK:
+        entry = _MODEL_REGISTRY.get(key)
+        if entry is None:
+            print(f"📦 Chargement du modèle d'embedding : {model_name}")
+            start = time.time()
+            model = SentenceTransformer(model_name, device=device)
+            entry = {
+                "model": model,
+                "loaded_at": time.time(),
+                "last_used": time.time(),
+                "load_seconds": round(time.time() - start, 2),
+            }
+            _MODEL_REGISTRY[key] = entry
+            _start_idle_reaper()
+        entry["last_used"] = time.time()
+        return entry["model"]
+
+
+def warmup_embedding_model(
+    model_name: str = EMBEDDING_MODEL,
+    device: str | None = None
+) -> SentenceTransformer:
+    """
+    Charge le modèle et exécute un encodage à blanc.
+    À appeler au démarrage de l'app pour que la première requête soit rapide.
+    """
+    model = get_embedding_model(model_name, device)
+    model.encode(["warm-up"])
     return model
 
 
+def unload_embedding_model(
+    model_name: str = EMBEDDING_MODEL,
+    device: str | None = None
+) -> bool:
+    """Retire un modèle du registre. Retourne True s'il était chargé."""
+    with _REGISTRY_LOCK:
+        entry = _MODEL_REGISTRY.pop(_registry_key(model_name, device), None)
+    if entry is not None:
+        print(f"🗑️  Modèle d'embedding déchargé : {model_name}")
+    return entry is not None
+
+
+def loaded_models() -> list[dict]:
+    """Liste les modèles actuellement chargés dans le registre."""
+    now = time.time()
+    with _REGISTRY_LOCK:
+        return [
+            {
+                "model_name": name,
+                "device": device,
+                "load_seconds": entry["load_seconds"],
+                "idle_seconds": round(now - entry["last_used"], 1),
+            }
+            for (name, device), entry in _MODEL_REGISTRY.items()
+        ]
+
+
+def unload_idle_models(idle_seconds: float) -> list[str]:
+    """Décharge les modèles inutilisés depuis plus de `idle_seconds`."""
+    now = time.time()
+    with _REGISTRY_LOCK:
+        expired = [
+            key for key, entry in _MODEL_REGISTRY.items()
+            if now - entry["last_used"] > idle_seconds
+        ]
+        for key in expired:
+            del _MODEL_REGISTRY[key]
+    for name, _ in expired:
+        print(f"💤 Modèle d'embedding inactif déchargé : {name}")
+    return [name for name, _ in expired]
+
+
+def _start_idle_reaper() -> None:
+    """Démarre (une seule fois) le thread de décharge des modèles inactifs."""
+    global _REAPER_THREAD
+    if EMBEDDING_IDLE_UNLOAD_SECONDS <= 0:
+        return
+    if _REAPER_THREAD is not None and _REAPER_THREAD.is_alive():
+        return
+
+    def _reap():
+        interval = max(EMBEDDING_IDLE_UNLOAD_SECONDS / 2, 1.0)
+        while True:
+            time.sleep(interval)
+            unload_idle_models(EMBEDDING_IDLE_UNLOAD_SECONDS)
+
+    _REAPER_THREAD = threading.Thread(target=_reap, name="embedding-reaper", daemon=True)
+    _REAPER_THREAD.start()
+
+
+# Clients ChromaDB (un par chemin) et handles de collections déjà ouvertes
+_CHROMA_CLIENTS: dict[str, chromadb.Client] = {}
+_COLLECTION_HANDLES: dict[str, chromadb.Collection] = {}
+_HANDLES_LOCK = threading.Lock()
+
+
 def get_chroma_client() -> chromadb.Client:
     """
-    Initialise le client ChromaDB en mode persistant.
+    Retourne le client ChromaDB persistant (créé une fois par process).
     Les vecteurs sont sauvegardés sur disque dans CHROMA_PATH.
     """
-    Path(CHROMA_PATH).mkdir(parents=True, exist_ok=True)
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    return client
+    with _HANDLES_LOCK:
+        client = _CHROMA_CLIENTS.get(CHROMA_PATH)
+        if client is None:
+            Path(CHROMA_PATH).mkdir(parents=True, exist_ok=True)
+            client = chromadb.PersistentClient(path=CHROMA_PATH)
+            _CHROMA_CLIENTS[CHROMA_PATH] = client
+        return client
+
+
+def get_collection(collection_name: str):
+    """
+    Ouvre une collection existante sans lister toutes les collections :
+    mémoire d'abord, puis handle ChromaDB en cache, puis lookup par nom.
+
+    Raises:
+        ValueError: si la collection n'existe dans aucun backend
+    """
+    numpy_store = get_numpy_store()
+    if numpy_store.has_collection(collection_name):
+        return numpy_store.get_collection(collection_name)
+
+    collection = _COLLECTION_HANDLES.get(collection_name)
+    if collection is not None:
+        return collection
+
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(name=collection_name)
+    except Exception:
+        raise ValueError(f"Collection introuvable : '{collection_name}'. "
+                         f"Collections disponibles : {list_collections()}")
+
+    with _HANDLES_LOCK:
+        _COLLECTION_HANDLES[collection_name] = collection
+    return collection
+
+
+def invalidate_collection_handle(collection_name: str) -> None:
+    """Oublie le handle d'une collection (après suppression ou recréation)."""
+    with _HANDLES_LOCK:
+        _COLLECTION_HANDLES.pop(collection_name, None)
+
+
+def choose_backend(n_chunks: int, session_id: str | None = None) -> str:
+    """
+    Choisit le backend vectoriel d'une collection.
+    En mode "auto", les documents d'une session assez petits restent en mémoire,
+    le corpus persistant va dans ChromaDB.
+    """
+    if VECTOR_BACKEND in ("numpy", "chroma"):
+        return VECTOR_BACKEND
+    if session_id and n_chunks <= NUMPY_BACKEND_MAX_CHUNKS:
+        return "numpy"
+    return "chroma"
+
+
+def get_vector_store(backend: str):
+    """Retourne le client du backend : store NumPy en mémoire ou client ChromaDB."""
+    if backend == "numpy":
+        return get_numpy_store()
+    if backend == "chroma":
+        return get_chroma_client()
+    raise ValueError(f"Backend vectoriel inconnu : {backend}. Utilisez numpy ou chroma.")
+
+
+def locate_collection_store(collection_name: str):
+    """Retourne le client qui héberge une collection (NumPy en priorité, sinon ChromaDB)."""
+    numpy_store = get_numpy_store()
+    if numpy_store.has_collection(collection_name):
+        return numpy_store
+    return get_chroma_client()
+
+
+def encode_chunks(chunks: list[str], model_name: str = EMBEDDING_MODEL) -> list[list[float]]:
+    """
+    Vectorise des morceaux de texte en passant par le cache disque.
+    Seuls les morceaux absents du cache sont envoyés au modèle.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        model = get_embedding_model(model_name)
+        return model.encode(chunks, show_progress_bar=True).tolist()
+
+    vectors = cache.get_many(model_name, chunks)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+
+    if missing:
+        model = get_embedding_model(model_name)
+        missing_chunks = [chunks[i] for i in missing]
+        encoded = model.encode(missing_chunks, show_progress_bar=True)
+        stored = cache.put_many(model_name, missing_chunks, encoded)
+        for i, vector in zip(missing, stored):
+            vectors[i] = vector
+
+    print(f"💾 Cache embeddings : {len(chunks) - len(missing)} hits, {len(missing)} misses")
+    return [v.tolist() for v in vectors]
 
 
 def embed_and_store(
     chunks: list[str],
     collection_name: str,
-    metadata: dict = None
-) -> chromadb.Collection:
+    metadata: dict = None,
+    incremental: bool = False,
+    session_id: str | None = None,
+    backend: str | None = None
+):
     """
-    Vectorise les morceaux de texte et les stocke dans ChromaDB.
+    Vectorise les morceaux de texte et les stocke dans le backend vectoriel
+    (ChromaDB, ou NumPy en mémoire pour les petits documents de session).
 
     Args:
         chunks: Liste de morceaux de texte (depuis ingestion.py)
         collection_name: Nom de la collection ChromaDB (ex: "cv_john", "offre_dev")
         metadata: Infos supplémentaires sur le document (ex: type, nom fichier)
+        incremental: Si True, met à jour la collection existante au lieu de la recréer
+                     (seuls les morceaux nouveaux sont vectorisés)
+        session_id: Si fourni, la collection est propre à cette session
+                    (nom préfixé, expirée après SESSION_COLLECTION_TTL_SECONDS)
+        backend: "numpy" ou "chroma" ; par défaut choisi par choose_backend()
 
     Returns:
-        La collection ChromaDB créée
+        La collection créée (ChromaDB ou NumpyCollection)
     """
-    model = get_embedding_model()
-    client = get_chroma_client()
+    collection_meta = None
+    if session_id:
+        collection_name = session_collection_name(collection_name, session_id)
+        collection_meta = {"session_id": session_id, "last_write": time.time()}
+
+    backend = backend or choose_backend(len(chunks), session_id)
+    client = get_vector_store(backend)
+    invalidate_collection_handle(collection_name)
+    # Si la collection change de backend, l'ancienne copie est supprimée :
+    # en mémoire elle masquerait la nouvelle, sur disque elle resterait orpheline
+    other = get_chroma_client() if backend == "numpy" else get_numpy_store()
+    try:
+        other.delete_collection(name=collection_name)
+    except Exception:
+        pass
+
+    if incremental:
+        collection = _upsert_incremental(client, chunks, collection_name, metadata or {})
+        if collection_meta:
+            collection.modify(metadata=collection_meta)
+        delete_lexical_index(collection_name)
+        return collection
 
     # Supprime la collection si elle existe déjà (rechargement propre)
     try:
@@ -63,18 +315,18 @@ def embed_and_store(
     except Exception:
         pass
 
-    collection = client.create_collection(name=collection_name)
+    collection = client.create_collection(name=collection_name, metadata=collection_meta)
 
     # Génération des embeddings
     print(f"⚙️  Vectorisation de {len(chunks)} morceaux...")
-    embeddings = model.encode(chunks, show_progress_bar=True).tolist()
+    embeddings = encode_chunks(chunks)
 
     # Préparation des métadonnées
     meta = metadata or {}
     metadatas = [{**meta, "chunk_index": i} for i in range(len(chunks))]
     ids = [f"{collection_name}_chunk_{i}" for i in range(len(chunks))]
 
-    # Stockage dans ChromaDB
+    # Stockage dans le backend vectoriel
     collection.add(
         documents=chunks,
         embeddings=embeddings,
@@ -82,17 +334,177 @@ def embed_and_store(
         ids=ids
     )
 
-    print(f"✅ {len(chunks)} vecteurs stockés dans la collection '{collection_name}'")
+    # Index BM25 périmé : reconstruit une fois, à la première recherche
+    # lexicale ou hybride, plutôt qu'à chaque écriture (imports en masse)
+    delete_lexical_index(collection_name)
+
+    print(f"✅ {len(chunks)} vecteurs stockés dans la collection '{collection_name}' ({backend})")
+    return collection
+
+
+def chunk_ids(collection_name: str, chunks: list[str]) -> list[str]:
+    """
+    Identifiants stables dérivés du contenu des morceaux.
+    Un même texte répété dans le document reçoit un suffixe d'occurrence.
+    """
+    seen: dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        h = text_hash(chunk)[:32]
+        occurrence = seen.get(h, 0)
+        seen[h] = occurrence + 1
+        ids.append(f"{collection_name}_{h}_{occurrence}")
+    return ids
+
+
+def _upsert_incremental(
+    client,
+    chunks: list[str],
+    collection_name: str,
+    meta: dict
+):
+    """
+    Synchronise la collection avec les morceaux reçus, par hash de contenu :
+    ajoute les nouveaux, supprime ceux qui ont disparu, et laisse
+    les vecteurs inchangés en place (seules leurs métadonnées sont mises à jour).
+    """
+    collection = client.get_or_create_collection(name=collection_name)
+
+    ids = chunk_ids(collection_name, chunks)
+    metadatas = [
+        {**meta, "chunk_index": i, "content_hash": text_hash(chunk)}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    stored = collection.get(include=["metadatas"])
+    stored_meta = dict(zip(stored["ids"], stored["metadatas"]))
+    wanted = set(ids)
+
+    vanished = [id_ for id_ in stored_meta if id_ not in wanted]
+    new = [i for i, id_ in enumerate(ids) if id_ not in stored_meta]
+    moved = [
+        i for i, id_ in enumerate(ids)
+        if id_ in stored_meta and stored_meta[id_] != metadatas[i]
+    ]
+
+    if vanished:
+        collection.delete(ids=vanished)
+
+    if new:
+        print(f"⚙️  Vectorisation de {len(new)} nouveaux morceaux...")
+        collection.add(
+            documents=[chunks[i] for i in new],
+            embeddings=encode_chunks([chunks[i] for i in new]),
+            metadatas=[metadatas[i] for i in new],
+            ids=[ids[i] for i in new]
+        )
+
+    if moved:
+        collection.update(
+            ids=[ids[i] for i in moved],
+            metadatas=[metadatas[i] for i in moved]
+        )
+
+    unchanged = len(chunks) - len(new)
+    print(f"✅ Collection '{collection_name}' synchronisée : "
+          f"+{len(new)} ajoutés, -{len(vanished)} supprimés, {unchanged} inchangés")
     return collection
 
 
 def list_collections() -> list[str]:
-    """Retourne la liste des collections disponibles dans ChromaDB."""
+    """Retourne la liste des collections disponibles (ChromaDB et mémoire)."""
     client = get_chroma_client()
-    collections = client.list_collections()
+    collections = client.list_collections() + get_numpy_store().list_collections()
     return [col.name for col in collections]
 
 
+# ---------------------------------------------------------------
+# Collections par session (plusieurs pipelines en parallèle)
+# ---------------------------------------------------------------
+
+def new_session_id() -> str:
+    """Génère un identifiant de session court, utilisable dans un nom de collection."""
+    return uuid.uuid4().hex[:12]
+
+
+# Commence et finit par un caractère alphanumérique (contrainte de nommage ChromaDB)
+_SESSION_ID_PATTERN = re.compile(r"[a-zA-Z0-9](?:[a-zA-Z0-9_-]{0,30}[a-zA-Z0-9])?")
+
+
+def session_collection_name(base_name: str, session_id: str) -> str:
+    """
+    Nom de collection propre à une session, ex: "cv_current" -> "cv_current_3f2a9c1b7d4e".
+    Le session_id est utilisé tel quel : un identifiant hors [a-zA-Z0-9_-]{1,32}
+    (ou qui ne commence ou ne finit pas par une lettre ou un chiffre)
+    est refusé plutôt que réécrit, deux sessions ne peuvent donc pas partager
+    une collection.
+    """
+    if not isinstance(session_id, str) or not _SESSION_ID_PATTERN.fullmatch(session_id):
+        raise ValueError(
+            f"session_id invalide : '{session_id}' (1 à 32 caractères parmi a-z, A-Z, 0-9, _ et -)"
+        )
+    return f"{base_name}_{session_id}"
+
+
+def delete_session_collections(session_id: str, base_names: list[str]) -> None:
+    """Supprime les collections d'une session (fin de requête), dans les deux backends."""
+    for base_name in base_names:
+        name = session_collection_name(base_name, session_id)
+        invalidate_collection_handle(name)
+        delete_lexical_index(name, dropped=True)
+        for client in (get_numpy_store(), get_chroma_client()):
+            try:
+                client.delete_collection(name=name)
+            except Exception:
+                pass
+
+
+def purge_expired_collections(ttl_seconds: float = SESSION_COLLECTION_TTL_SECONDS) -> list[str]:
+    """
+    Supprime les collections de session sans écriture depuis plus de `ttl_seconds`.
+    Les collections sans session_id (corpus persistant) ne sont jamais touchées.
+    """
+    now = time.time()
+    purged = []
+    for client in (get_numpy_store(), get_chroma_client()):
+        for col in client.list_collections():
+            meta = col.metadata or {}
+            if "session_id" not in meta:
+                continue
+            if now - meta.get("last_write", 0) > ttl_seconds:
+                try:
+                    invalidate_collection_handle(col.name)
+                    delete_lexical_index(col.name, dropped=True)
+                    client.delete_collection(name=col.name)
+                    purged.append(col.name)
+                except Exception:
+                    pass
+    if purged:
+        print(f"🧹 {len(purged)} collections de session expirées supprimées")
+    return purged
+
+
+_LAST_PURGE = 0.0
+_PURGE_LOCK = threading.Lock()
+
+
+def maybe_purge_expired_collections(
+    interval_seconds: float = SESSION_PURGE_INTERVAL_SECONDS
+) -> list[str]:
+    """
+    Purge les collections expirées au plus une fois par `interval_seconds`.
+    À appeler à chaque requête : le listing des collections n'est pas payé
+    par toutes les requêtes.
+    """
+    global _LAST_PURGE
+    with _PURGE_LOCK:
+        now = time.time()
+        if now - _LAST_PURGE < interval_seconds:
+            return []
+        _LAST_PURGE = now
+    return purge_expired_collections()
+
+
 # Test rapide si on lance ce fichier directement
 if __name__ == "__main__":
     test_chunks = [
@@ -5,30 +5,183 @@ Génération de réponses via Mistral API (cloud) ou Ollama (local)
 
 import os
 import json
+import time
+import random
+import asyncio
+import queue
+import threading
+import weakref
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from email.utils import parsedate_to_datetime
+from typing import AsyncContextManager, Awaitable, Callable, ContextManager, Iterator
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from src.context_packer import PackedContext, approx_token_count, pack_context
+from src.llm_cache import get_llm_cache, prompt_hash
+from src.rate_limiter import get_rate_limiter, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from src.matching_report import (
+    MatchingReport,
+    parse_matching_report,
+    MATCHING_JSON_MAX_TOKENS,
+    MATCHING_JSON_SCHEMA
+)
+
 load_dotenv()
 
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
 MISTRAL_API_URL = "https://api.mistral.ai/v1/chat/completions"
+MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-small-latest")
 USE_API = os.getenv("USE_MISTRAL_API", "false").lower() == "true"
+LLM_TEMPERATURE = 0.1
+
+# Ollama : durée pendant laquelle le modèle reste chargé après un appel
+# ("30m", "1h", "-1" = indéfiniment), et préchargement au démarrage de l'app
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+
+# Budget de tokens de chaque document (CV, offre) dans le prompt de matching
+MATCHING_CONTEXT_TOKENS = int(os.getenv("MATCHING_CONTEXT_TOKENS", "400"))
+
+# Pool de connexions HTTP partagé et politique de retry des appels LLM
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+MISTRAL_READ_TIMEOUT = float(os.getenv("MISTRAL_READ_TIMEOUT", "60"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "600"))
+
+# Nombre maximal d'appels LLM simultanés du client asynchrone
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Attente maximale d'un appel identique déjà en vol avant de faire son propre
+# appel (file du limiteur de débit et retries du meneur compris)
+LLM_FLIGHT_WAIT = float(os.getenv("LLM_FLIGHT_WAIT", "900"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# ---------------------------------------------------------------
+# Session HTTP partagée (keep-alive) et retries
+# ---------------------------------------------------------------
+
+_SESSION: requests.Session | None = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Session requests partagée par le process : les connexions TCP/TLS vers
+    Mistral et Ollama sont réutilisées d'un appel à l'autre (keep-alive).
+    Le pool garde jusqu'à LLM_POOL_SIZE connexions par hôte.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LLM_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSION = session
+        return _SESSION
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Délai en secondes d'un en-tête Retry-After (nombre de secondes ou date HTTP)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """
+    Attente avant la tentative suivante : Retry-After s'il est fourni,
+    sinon backoff exponentiel avec jitter complet (0 à base × 2^attempt).
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def post_with_retry(
+    url: str,
+    max_retries: int = LLM_MAX_RETRIES,
+    pause: Callable[[], ContextManager] | None = None,
+    **kwargs
+) -> requests.Response:
+    """
+    POST via la session partagée, retenté sur erreur de connexion, timeout,
+    429 et 5xx. Un Retry-After plus long que LLM_BACKOFF_MAX n'est pas attendu :
+    l'erreur est remontée tout de suite.
+
+    `pause` encadre chaque attente entre deux tentatives : RateLimiter.paused
+    y rend la place du limiteur de débit, reprise avant la tentative suivante.
+    """
+    session = get_http_session()
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                response.raise_for_status()
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > LLM_BACKOFF_MAX:
+                response.raise_for_status()
+            delay = backoff_delay(attempt, retry_after)
+            response.close()
+
+        print(f"🔁 Appel LLM retenté dans {delay:.1f}s ({attempt + 1}/{max_retries})")
+        with pause() if pause is not None else nullcontext():
+            time.sleep(delay)
+
+
+# Préfixe commun à tous les prompts. Il est placé en tête et ne varie jamais :
+# Ollama (llama.cpp) réutilise le cache KV du plus long préfixe commun avec
+# l'appel précédent et ne réévalue que la partie variable du prompt.
+PROMPT_PREFIX = """Tu es un expert RH, spécialisé dans le recrutement en France.
+Réponds en français, uniquement à partir des documents fournis. Sois précis et structuré."""
+
+# Début littéral de tous les prompts et du préchargement : un seul octet de
+# différence (ex: balise [INST] absente) et le cache KV n'est plus réutilisé
+PROMPT_HEAD = f"<s>[INST] {PROMPT_PREFIX}"
+PROMPT_TAIL = " [/INST]"
+
+PROMPT_ROLES = {
+    "matching": "Analyse les CVs et les offres d'emploi.",
+    "bias": "En tant qu'expert en diversité et inclusion dans le recrutement, "
+            "détecte les biais potentiels et propose des alternatives inclusives.",
+    "general": "Réponds à la question posée sur le document.",
+}
 
 
 def build_prompt(question: str, context: str, mode: str = "general") -> str:
-    if mode == "matching":
-        system = """Tu es un expert RH spécialisé dans l'analyse de CVs et d'offres d'emploi.
-Réponds uniquement à partir des extraits fournis. Sois précis et structuré."""
-    elif mode == "bias":
-        system = """Tu es un expert en diversité et inclusion dans le recrutement.
-Détecte les biais potentiels et propose des alternatives inclusives."""
-    else:
-        system = """Tu es un assistant RH expert.
-Réponds uniquement à partir des extraits fournis."""
-
-    prompt = f"""<s>[INST] {system}
+    """
+    Prompt d'une question sur un document. Partie fixe en tête (préfixe
+    commun, rôle du mode), partie variable (extraits, question) en fin.
+    """
+    role = PROMPT_ROLES.get(mode, PROMPT_ROLES["general"])
+
+    prompt = f"""{PROMPT_HEAD}
+{role}
 
 ### Extraits du document :
 {context}
@@ -36,88 +189,447 @@ Réponds uniquement à partir des extraits fournis."""
 ### Question :
 {question}
 
-Réponds de manière structurée et précise. [/INST]"""
+Réponds de manière structurée et précise.{PROMPT_TAIL}"""
 
     return prompt
 
 
-def call_mistral_api(prompt: str, max_tokens: int = 500) -> str:
-    """Appel à l'API Mistral cloud."""
+def _mistral_request(
+    prompt: str,
+    max_tokens: int,
+    stream: bool,
+    json_mode: bool = False,
+    pause: Callable[[], ContextManager] | None = None
+) -> requests.Response:
     headers = {
         "Authorization": f"Bearer {MISTRAL_API_KEY}",
         "Content-Type": "application/json"
     }
     payload = {
-        "model": "mistral-small-latest",
+        "model": MISTRAL_MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": max_tokens,
-        "temperature": 0.1
+        "temperature": LLM_TEMPERATURE,
+        "stream": stream
     }
-    response = requests.post(
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    return post_with_retry(
         MISTRAL_API_URL,
         headers=headers,
         json=payload,
-        timeout=60
+        stream=stream,
+        timeout=(LLM_CONNECT_TIMEOUT, MISTRAL_READ_TIMEOUT),
+        pause=pause
     )
-    response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"].strip()
 
 
-def call_ollama(prompt: str) -> str:
-    """Appel à Ollama en local avec streaming."""
-    response = requests.post(
+def _reserved_tokens(prompt: str, max_tokens: int) -> int:
+    """
+    Tokens réservés auprès du limiteur de débit : prompt estimé + génération
+    maximale. L'estimation suffit (le débit réel est corrigé par `usage`)
+    et évite de tokeniser chaque prompt sur le chemin d'envoi.
+    """
+    return approx_token_count(prompt) + max_tokens
+
+
+def call_mistral_api(
+    prompt: str,
+    max_tokens: int = 500,
+    priority: int = PRIORITY_INTERACTIVE,
+    json_mode: bool = False
+) -> str:
+    """
+    Appel à l'API Mistral cloud (soumis au limiteur de débit du process).
+    La place du limiteur est rendue pendant les attentes entre deux tentatives.
+    """
+    limiter = get_rate_limiter()
+    reserved = _reserved_tokens(prompt, max_tokens)
+    with limiter.slot(reserved, priority) as usage:
+        pause = partial(limiter.paused, usage, reserved, priority)
+        data = _mistral_request(prompt, max_tokens, stream=False, json_mode=json_mode, pause=pause).json()
+        usage["tokens"] = data.get("usage", {}).get("total_tokens")
+    return data["choices"][0]["message"]["content"].strip()
+
+
+def stream_mistral_api(
+    prompt: str,
+    max_tokens: int = 500,
+    priority: int = PRIORITY_INTERACTIVE
+) -> Iterator[str]:
+    """Appel à l'API Mistral en streaming (Server-Sent Events) : produit les tokens un à un."""
+    limiter = get_rate_limiter()
+    reserved = _reserved_tokens(prompt, max_tokens)
+    with limiter.slot(reserved, priority) as usage:
+        response = _mistral_request(
+            prompt, max_tokens, stream=True, pause=partial(limiter.paused, usage, reserved, priority)
+        )
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    usage["tokens"] = chunk["usage"].get("total_tokens")
+                delta = chunk["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+        finally:
+            response.close()  # rend la connexion au pool
+
+
+def _ollama_payload(prompt: str, max_tokens: int, stream: bool, json_mode: bool = False) -> dict:
+    payload = {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": LLM_TEMPERATURE,
+            "num_predict": max_tokens
+        }
+    }
+    if json_mode:
+        payload["format"] = "json"
+    return payload
+
+
+def _log_ollama_timings(data: dict) -> None:
+    """Affiche le temps de chargement et d'évaluation du prompt (message final d'Ollama)."""
+    if "prompt_eval_duration" not in data:
+        return
+    load = data.get("load_duration", 0) / 1e9
+    print(f"⏱️ Ollama : prompt de {data.get('prompt_eval_count', 0)} tokens évalué en "
+          f"{data['prompt_eval_duration'] / 1e9:.2f}s (chargement {load:.2f}s)")
+
+
+def stream_ollama(prompt: str, max_tokens: int = 500, json_mode: bool = False) -> Iterator[str]:
+    """Appel à Ollama en streaming (NDJSON) : produit les tokens un à un."""
+    response = post_with_retry(
         f"{OLLAMA_HOST}/api/generate",
-        json={
-            "model": OLLAMA_MODEL,
-            "prompt": prompt,
-            "stream": True,
-            "options": {
-                "temperature": 0.1,
-                "num_predict": 500
-            }
-        },
+        json=_ollama_payload(prompt, max_tokens, stream=True, json_mode=json_mode),
         stream=True,
-        timeout=600
+        timeout=(LLM_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
     )
-    response.raise_for_status()
+    try:
+        for line in response.iter_lines():
+            if line:
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done", False):
+                    _log_ollama_timings(data)
+                    break
+    finally:
+        response.close()  # rend la connexion au pool
 
-    result = ""
-    for line in response.iter_lines():
-        if line:
-            data = json.loads(line)
-            result += data.get("response", "")
-            if data.get("done", False):
-                break
-    return result.strip()
 
+def call_ollama(prompt: str, max_tokens: int = 500, json_mode: bool = False) -> str:
+    """Appel à Ollama en local avec streaming."""
+    return "".join(stream_ollama(prompt, max_tokens, json_mode)).strip()
 
-def generate(question: str, context: str, mode: str = "general") -> str:
-    """Génère une réponse via API Mistral ou Ollama selon la config."""
-    prompt = build_prompt(question, context, mode)
 
+def warmup_ollama() -> bool:
+    """
+    Charge le modèle Ollama en mémoire (requête sans prompt) et évalue le
+    préfixe commun des prompts, pour que le premier vrai appel ne paie ni
+    le chargement du modèle ni l'évaluation de la partie fixe.
+
+    Returns:
+        True si le modèle est prêt, False si Ollama n'est pas utilisé ou injoignable
+    """
+    if USE_API or not OLLAMA_WARMUP:
+        return False
+
+    start = time.perf_counter()
     try:
-        if USE_API:
-            return call_mistral_api(prompt)
-        else:
-            return call_ollama(prompt)
+        post_with_retry(
+            f"{OLLAMA_HOST}/api/generate",
+            max_retries=0,
+            json=_ollama_payload(PROMPT_HEAD, max_tokens=1, stream=False),
+            timeout=(LLM_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
+        )
+    except (requests.exceptions.RequestException, OSError) as e:
+        print(f"⚠️ Préchargement d'Ollama impossible : {e}")
+        return False
 
-    except requests.exceptions.ConnectionError:
+    print(f"🔥 Modèle Ollama {OLLAMA_MODEL} chargé en {time.perf_counter() - start:.1f}s "
+          f"(keep_alive={OLLAMA_KEEP_ALIVE})")
+    return True
+
+
+@contextmanager
+def _llm_errors():
+    """Traduit les erreurs réseau en erreurs lisibles pour l'interface."""
+    try:
+        yield
+    except (requests.exceptions.ConnectionError, httpx.ConnectError):
         raise ConnectionError("Impossible de contacter le LLM.")
-    except requests.exceptions.Timeout:
+    except (requests.exceptions.Timeout, httpx.TimeoutException):
         raise TimeoutError("Mistral met trop de temps à répondre. Réessaie.")
     except Exception as e:
         raise RuntimeError(f"Erreur lors de la génération : {e}")
 
 
-def generate_matching_report(cv_context: str, job_context: str) -> str:
-    """Génère un rapport de matching CV / Offre d'emploi."""
-    full_prompt = f"""Tu es un expert RH français. Analyse en français la correspondance entre ce candidat et ce poste.
+# ---------------------------------------------------------------
+# Coalescence des requêtes identiques en vol (singleflight)
+# ---------------------------------------------------------------
 
-### CV :
-{cv_context[:1000]}
+class _Flight:
+    """Appel LLM en cours : les appelants du même prompt attendent son résultat."""
 
-### OFFRE :
-{job_context[:1000]}
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: str | None = None
+        self.error: BaseException | None = None
+
+
+_FLIGHTS: dict[tuple, _Flight] = {}
+_FLIGHTS_LOCK = threading.Lock()
+_FLIGHT_STATS = {"upstream": 0, "coalesced": 0}
+
+
+def _request_key(prompt: str, max_tokens: int, json_mode: bool = False) -> tuple:
+    """
+    Clé d'un appel LLM : celle du cache de réponses (backend, modèle, prompt,
+    paramètres), plus le mode JSON, qui change la réponse du backend.
+    """
+    backend, model = ("mistral", MISTRAL_MODEL) if USE_API else ("ollama", OLLAMA_MODEL)
+    return (backend, model, prompt_hash(prompt), max_tokens, LLM_TEMPERATURE, json_mode)
+
+
+def _join_flight(key: tuple) -> tuple[_Flight, bool]:
+    """Rejoint l'appel en vol pour `key`, ou en ouvre un. Retourne (appel, meneur)."""
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(key)
+        if flight is not None:
+            _FLIGHT_STATS["coalesced"] += 1
+            return flight, False
+        flight = _Flight()
+        _FLIGHTS[key] = flight
+        _FLIGHT_STATS["upstream"] += 1
+        return flight, True
+
+
+def _land_flight(key: tuple, flight: _Flight, result: str | None = None,
+                 error: BaseException | None = None) -> None:
+    """Publie le résultat (ou l'erreur) du meneur et réveille les appelants en attente."""
+    flight.result, flight.error = result, error
+    with _FLIGHTS_LOCK:
+        if _FLIGHTS.get(key) is flight:
+            del _FLIGHTS[key]
+    flight.done.set()
+
+
+def _wait_flight(flight: _Flight) -> str | None:
+    """
+    Attend le meneur au plus LLM_FLIGHT_WAIT secondes et retourne son
+    résultat, ou relève son erreur. Le délai est indépendant des timeouts
+    de lecture : il couvre la file du limiteur de débit et les retries du
+    meneur. Retourne None si le meneur n'a rien publié à temps : l'appelant
+    fait alors son propre appel.
+    """
+    if not flight.done.wait(LLM_FLIGHT_WAIT):
+        print("⌛ Appel LLM identique toujours sans réponse, nouvel appel")
+        return None
+    if flight.error is not None:
+        raise flight.error
+    return flight.result
+
+
+def singleflight(key: tuple, fn: Callable[[], str]) -> str:
+    """
+    Exécute `fn` une seule fois pour tous les appelants simultanés de même clé :
+    le premier (meneur) fait l'appel, les autres attendent et partagent son
+    résultat. Une erreur du meneur est relevée chez tous les appelants ; un
+    meneur sans réponse après LLM_FLIGHT_WAIT est doublé par un nouvel appel.
+    """
+    flight, leader = _join_flight(key)
+    if not leader:
+        print("🔗 Requête LLM identique déjà en cours, résultat partagé")
+        result = _wait_flight(flight)
+        return fn() if result is None else result
+    try:
+        result = fn()
+    except BaseException as e:
+        _land_flight(key, flight, error=e)
+        raise
+    _land_flight(key, flight, result=result)
+    return result
+
+
+def singleflight_stats() -> dict:
+    """Appels réellement envoyés, appels coalescés et appels en vol."""
+    with _FLIGHTS_LOCK:
+        return {**_FLIGHT_STATS, "in_flight": len(_FLIGHTS)}
+
+
+def call_llm(prompt: str, max_tokens: int = 500, use_cache: bool = True, json_mode: bool = False) -> str:
+    """
+    Appelle le backend configuré (Mistral API ou Ollama) en passant par le
+    cache de réponses : un prompt déjà vu avec le même modèle et les mêmes
+    paramètres est servi sans appel réseau. Des appels identiques simultanés
+    (double clic, même offre ouverte par deux recruteurs) partagent un seul
+    appel au backend.
+
+    Args:
+        prompt: Prompt complet
+        max_tokens: Nombre maximal de tokens générés
+        use_cache: False pour forcer un nouvel appel (la réponse est quand même stockée)
+        json_mode: Contraint le backend à produire un objet JSON valide
+    """
+    backend, model = ("mistral", MISTRAL_MODEL) if USE_API else ("ollama", OLLAMA_MODEL)
+    cache = get_llm_cache()
+
+    if cache is not None and use_cache:
+        cached = cache.get(backend, model, prompt, max_tokens, LLM_TEMPERATURE, json_mode)
+        if cached is not None:
+            print(f"💬 Réponse LLM servie par le cache ({backend}/{model})")
+            return cached
+
+    def fetch() -> str:
+        start = time.perf_counter()
+        if USE_API:
+            response = call_mistral_api(prompt, max_tokens=max_tokens, json_mode=json_mode)
+        else:
+            response = call_ollama(prompt, max_tokens=max_tokens, json_mode=json_mode)
+        # Mise en cache avant de libérer les appelants en attente
+        if cache is not None:
+            cache.put(backend, model, prompt, max_tokens, LLM_TEMPERATURE,
+                      response, time.perf_counter() - start, json_mode)
+        return response
+
+    return singleflight(_request_key(prompt, max_tokens, json_mode), fetch)
+
+
+def _stream_upstream(prompt: str, max_tokens: int, cache, tokens: queue.Queue) -> str:
+    """
+    Génère en streaming auprès du backend configuré en poussant chaque token
+    dans `tokens`, met en cache la génération complète et la retourne.
+    """
+    backend, model = ("mistral", MISTRAL_MODEL) if USE_API else ("ollama", OLLAMA_MODEL)
+    stream = stream_mistral_api if USE_API else stream_ollama
+    start = time.perf_counter()
+    parts = []
+    for token in stream(prompt, max_tokens=max_tokens):
+        if not parts:
+            print(f"⚡ Premier token en {time.perf_counter() - start:.2f}s")
+        parts.append(token)
+        tokens.put(token)
+    response = "".join(parts).strip()
+    if cache is not None:
+        cache.put(backend, model, prompt, max_tokens, LLM_TEMPERATURE,
+                  response, time.perf_counter() - start, json_mode=False)
+    return response
+
+
+def _drain_stream(prompt: str, max_tokens: int, cache, tokens: queue.Queue,
+                  key: tuple | None = None, flight: _Flight | None = None) -> None:
+    """
+    Fil de génération d'un stream_llm : lit le flux du backend jusqu'au bout,
+    même si le consommateur l'abandonne, puis publie le résultat dans
+    `flight` (meneur). `tokens` se termine par None ou par l'exception du backend.
+    """
+    try:
+        response = _stream_upstream(prompt, max_tokens, cache, tokens)
+    except Exception as e:
+        if flight is not None:
+            _land_flight(key, flight, error=e)
+        tokens.put(e)
+        return
+    if flight is not None:
+        _land_flight(key, flight, result=response)
+    tokens.put(None)
+
+
+def stream_llm(prompt: str, max_tokens: int = 500, use_cache: bool = True) -> Iterator[str]:
+    """
+    Version streaming de call_llm : produit les tokens au fil de la génération.
+    Une réponse en cache est produite d'un bloc ; une génération complète
+    est mise en cache. Le flux du backend est lu dans un fil dédié : si le
+    consommateur s'arrête (rerun Streamlit), la génération va quand même
+    à son terme pour le cache et les appels identiques en attente, qui la
+    reçoivent d'un bloc.
+    """
+    backend, model = ("mistral", MISTRAL_MODEL) if USE_API else ("ollama", OLLAMA_MODEL)
+    cache = get_llm_cache()
+
+    if cache is not None and use_cache:
+        cached = cache.get(backend, model, prompt, max_tokens, LLM_TEMPERATURE, json_mode=False)
+        if cached is not None:
+            print(f"💬 Réponse LLM servie par le cache ({backend}/{model})")
+            yield cached
+            return
+
+    key = _request_key(prompt, max_tokens, json_mode=False)
+    flight, leader = _join_flight(key)
+    tokens: queue.Queue = queue.Queue()
+    if not leader:
+        print("🔗 Requête LLM identique déjà en cours, résultat partagé")
+        result = _wait_flight(flight)
+        if result is not None:
+            yield result
+            return
+        # Meneur sans réponse : appel propre, hors coalescence
+        key = flight = None
+    threading.Thread(
+        target=_drain_stream,
+        args=(prompt, max_tokens, cache, tokens, key, flight),
+        daemon=True
+    ).start()
+
+    while True:
+        token = tokens.get()
+        if token is None:
+            return
+        if isinstance(token, BaseException):
+            raise token
+        yield token
+
+
+def generate(question: str, context: str, mode: str = "general", use_cache: bool = True) -> str:
+    """Génère une réponse via API Mistral ou Ollama selon la config."""
+    prompt = build_prompt(question, context, mode)
+
+    with _llm_errors():
+        return call_llm(prompt, use_cache=use_cache)
+
+
+def stream_generate(
+    question: str,
+    context: str,
+    mode: str = "general",
+    use_cache: bool = True
+) -> Iterator[str]:
+    """Comme generate, mais produit les tokens au fur et à mesure."""
+    prompt = build_prompt(question, context, mode)
+    with _llm_errors():
+        yield from stream_llm(prompt, use_cache=use_cache)
+
+
+def _pack(context: str | list[dict] | PackedContext, budget_tokens: int) -> PackedContext:
+    """Réduit un contexte au budget, sauf s'il l'a déjà été (PackedContext)."""
+    if isinstance(context, PackedContext):
+        return context
+    return pack_context(context, budget_tokens)
+
+
+def build_matching_prompt(
+    cv_context: str | list[dict] | PackedContext,
+    job_context: str | list[dict] | PackedContext,
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS
+) -> str:
+    """Prompt du rapport de matching, contextes réduits au budget de tokens."""
+    cv_packed = _pack(cv_context, budget_tokens)
+    job_packed = _pack(job_context, budget_tokens)
+    print(f"🧮 Contexte : CV {cv_packed.tokens_used} + offre {job_packed.tokens_used} tokens "
+          f"(budget {budget_tokens} chacun)")
+
+    return f"""{PROMPT_HEAD}
+Analyse la correspondance entre le candidat et le poste ci-dessous.
 
 Réponds UNIQUEMENT avec ce format markdown :
 
@@ -133,15 +645,345 @@ Réponds UNIQUEMENT avec ce format markdown :
 - point 2
 
 ## 📋 Recommandation
-Une phrase de conclusion."""
+Une phrase de conclusion.
+
+### CV :
+{cv_packed.text}
+
+### OFFRE :
+{job_packed.text}{PROMPT_TAIL}"""
+
+
+def generate_matching_report(
+    cv_context: str | list[dict] | PackedContext,
+    job_context: str | list[dict] | PackedContext,
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS,
+    use_cache: bool = True
+) -> str:
+    """
+    Génère un rapport de matching CV / Offre d'emploi.
+
+    Args:
+        cv_context: Contexte du CV : texte, passages de retrieve() ou contexte
+                    déjà réduit par pack_context (repris tel quel)
+        job_context: Contexte de l'offre, sous les mêmes formes
+        budget_tokens: Budget de tokens de chaque contexte (voir context_packer)
+        use_cache: False pour ignorer le cache de réponses LLM
+    """
+    full_prompt = build_matching_prompt(cv_context, job_context, budget_tokens)
 
     try:
-        if USE_API:
-            return call_mistral_api(full_prompt, max_tokens=600)
-        else:
-            return call_ollama(full_prompt)
+        return call_llm(full_prompt, max_tokens=600, use_cache=use_cache)
 
     except requests.exceptions.ConnectionError:
         raise ConnectionError("Impossible de contacter le LLM.")
     except requests.exceptions.Timeout:
-        raise TimeoutError("Mistral met trop de temps à répondre. Réessaie.")
\ No newline at end of file
+        raise TimeoutError("Mistral met trop de temps à répondre. Réessaie.")
+
+
+def build_matching_json_prompt(
+    cv_context: str | list[dict] | PackedContext,
+    job_context: str | list[dict] | PackedContext,
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS
+) -> str:
+    """Prompt du rapport de matching structuré : réponse en JSON compact."""
+    cv_packed = _pack(cv_context, budget_tokens)
+    job_packed = _pack(job_context, budget_tokens)
+
+    return f"""{PROMPT_HEAD}
+Analyse la correspondance entre le candidat et le poste ci-dessous.
+
+Réponds UNIQUEMENT avec un objet JSON, sans texte autour, au format :
+{MATCHING_JSON_SCHEMA}
+
+### CV :
+{cv_packed.text}
+
+### OFFRE :
+{job_packed.text}{PROMPT_TAIL}"""
+
+
+def generate_structured_matching_report(
+    cv_context: str | list[dict] | PackedContext,
+    job_context: str | list[dict] | PackedContext,
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS,
+    use_cache: bool = True
+) -> MatchingReport:
+    """
+    Rapport de matching structuré : le LLM produit un JSON compact (au plus
+    MATCHING_JSON_MAX_TOKENS tokens) validé en MatchingReport. Le markdown
+    s'obtient localement avec format_matching_report. Une réponse non
+    conforme est régénérée une fois, hors cache.
+    """
+    prompt = build_matching_json_prompt(cv_context, job_context, budget_tokens)
+    with _llm_errors():
+        raw = call_llm(prompt, max_tokens=MATCHING_JSON_MAX_TOKENS, use_cache=use_cache, json_mode=True)
+        try:
+            return parse_matching_report(raw)
+        except ValueError as e:
+            print(f"⚠️ Rapport JSON non conforme ({e}), nouvelle génération")
+        raw = call_llm(prompt, max_tokens=MATCHING_JSON_MAX_TOKENS, use_cache=False, json_mode=True)
+        return parse_matching_report(raw)
+
+
+def stream_matching_report(
+    cv_context: str | list[dict] | PackedContext,
+    job_context: str | list[dict] | PackedContext,
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS,
+    use_cache: bool = True
+) -> Iterator[str]:
+    """Comme generate_matching_report, mais produit le rapport token par token."""
+    full_prompt = build_matching_prompt(cv_context, job_context, budget_tokens)
+    with _llm_errors():
+        yield from stream_llm(full_prompt, max_tokens=600, use_cache=use_cache)
+
+
+# ---------------------------------------------------------------
+# Client asynchrone (traitements par lots)
+# ---------------------------------------------------------------
+
+# Un client httpx et un sémaphore par boucle asyncio : ni l'un ni l'autre
+# ne peut être partagé entre deux boucles
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_ASYNC_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_ASYNC_FLIGHTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, asyncio.Future]]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Client httpx de la boucle courante : connexions keep-alive partagées
+    (jusqu'à LLM_POOL_SIZE), timeouts de connexion et de lecture séparés.
+    """
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_POOL_SIZE,
+                max_keepalive_connections=LLM_POOL_SIZE
+            ),
+            timeout=httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        )
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _ASYNC_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _ASYNC_SEMAPHORES[loop] = semaphore
+    return semaphore
+
+
+async def aclose_async_client() -> None:
+    """Ferme le client httpx de la boucle courante (fin d'un traitement par lots)."""
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def asingleflight(key: tuple, fn: Callable[[], Awaitable[str]]) -> str:
+    """
+    Équivalent asynchrone de singleflight : un seul appel par clé dans la boucle.
+    L'appel tourne dans sa propre tâche : l'annulation d'un appelant
+    n'interrompt pas les autres.
+    """
+    flights = _ASYNC_FLIGHTS.setdefault(asyncio.get_running_loop(), {})
+    task = flights.get(key)
+    with _FLIGHTS_LOCK:
+        _FLIGHT_STATS["upstream" if task is None else "coalesced"] += 1
+    if task is None:
+        task = asyncio.ensure_future(fn())
+        flights[key] = task
+        task.add_done_callback(partial(_land_async_flight, flights, key))
+    return await asyncio.shield(task)
+
+
+def _land_async_flight(flights: dict, key: tuple, task: asyncio.Task) -> None:
+    """
+    Fin d'un appel partagé : le retire des appels en vol et consomme son
+    exception, pour qu'elle ne soit pas signalée ("Task exception was never
+    retrieved") si tous les appelants ont été annulés entre-temps.
+    """
+    if flights.get(key) is task:
+        del flights[key]
+    if not task.cancelled():
+        task.exception()
+
+
+async def apost_with_retry(
+    url: str,
+    max_retries: int = LLM_MAX_RETRIES,
+    pause: Callable[[], AsyncContextManager] | None = None,
+    **kwargs
+) -> httpx.Response:
+    """Équivalent asynchrone de post_with_retry (même politique de retry et de pause)."""
+    client = get_async_client()
+    for attempt in range(max_retries + 1):
+        try:
+            response = await client.post(url, **kwargs)
+        except (httpx.TransportError, httpx.TimeoutException):
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                response.raise_for_status()
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > LLM_BACKOFF_MAX:
+                response.raise_for_status()
+            delay = backoff_delay(attempt, retry_after)
+
+        print(f"🔁 Appel LLM retenté dans {delay:.1f}s ({attempt + 1}/{max_retries})")
+        async with pause() if pause is not None else nullcontext():
+            await asyncio.sleep(delay)
+
+
+async def acall_mistral_api(
+    prompt: str,
+    max_tokens: int = 500,
+    priority: int = PRIORITY_BATCH,
+    json_mode: bool = False
+) -> str:
+    """
+    Appel asynchrone à l'API Mistral cloud. Soumis au même limiteur de débit
+    que les appels synchrones, en priorité "lot" par défaut : les requêtes
+    de l'interface passent devant.
+    """
+    limiter = get_rate_limiter()
+    reserved = _reserved_tokens(prompt, max_tokens)
+    async with limiter.aslot(reserved, priority) as usage:
+        response = await apost_with_retry(
+            MISTRAL_API_URL,
+            pause=partial(limiter.apaused, usage, reserved, priority),
+            headers={
+                "Authorization": f"Bearer {MISTRAL_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": MISTRAL_MODEL,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "temperature": LLM_TEMPERATURE,
+                **({"response_format": {"type": "json_object"}} if json_mode else {})
+            },
+            timeout=httpx.Timeout(MISTRAL_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        )
+        data = response.json()
+        usage["tokens"] = data.get("usage", {}).get("total_tokens")
+    return data["choices"][0]["message"]["content"].strip()
+
+
+async def acall_ollama(prompt: str, max_tokens: int = 500, json_mode: bool = False) -> str:
+    """Appel asynchrone à Ollama (réponse complète, sans streaming)."""
+    response = await apost_with_retry(
+        f"{OLLAMA_HOST}/api/generate",
+        json=_ollama_payload(prompt, max_tokens, stream=False, json_mode=json_mode)
+    )
+    data = response.json()
+    _log_ollama_timings(data)
+    return data.get("response", "").strip()
+
+
+async def acall_llm(prompt: str, max_tokens: int = 500, use_cache: bool = True, json_mode: bool = False) -> str:
+    """
+    Équivalent asynchrone de call_llm : même cache de réponses, même
+    coalescence des appels identiques, et au plus LLM_MAX_CONCURRENCY
+    appels réseau en vol dans la boucle.
+    """
+    backend, model = ("mistral", MISTRAL_MODEL) if USE_API else ("ollama", OLLAMA_MODEL)
+    cache = get_llm_cache()
+
+    if cache is not None and use_cache:
+        cached = cache.get(backend, model, prompt, max_tokens, LLM_TEMPERATURE, json_mode)
+        if cached is not None:
+            return cached
+
+    async def fetch() -> str:
+        async with _get_semaphore():
+            start = time.perf_counter()
+            if USE_API:
+                response = await acall_mistral_api(prompt, max_tokens=max_tokens, json_mode=json_mode)
+            else:
+                response = await acall_ollama(prompt, max_tokens=max_tokens, json_mode=json_mode)
+        if cache is not None:
+            cache.put(backend, model, prompt, max_tokens, LLM_TEMPERATURE,
+                      response, time.perf_counter() - start, json_mode)
+        return response
+
+    return await asingleflight(_request_key(prompt, max_tokens, json_mode), fetch)
+
+
+async def agenerate(question: str, context: str, mode: str = "general", use_cache: bool = True) -> str:
+    """Version asynchrone de generate."""
+    prompt = build_prompt(question, context, mode)
+    with _llm_errors():
+        return await acall_llm(prompt, use_cache=use_cache)
+
+
+async def agenerate_matching_report(
+    cv_context: str | list[dict] | PackedContext,
+    job_context: str | list[dict] | PackedContext,
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS,
+    use_cache: bool = True
+) -> str:
+    """Version asynchrone de generate_matching_report."""
+    full_prompt = build_matching_prompt(cv_context, job_context, budget_tokens)
+    with _llm_errors():
+        return await acall_llm(full_prompt, max_tokens=600, use_cache=use_cache)
+
+
+async def agenerate_structured_matching_report(
+    cv_context: str | list[dict] | PackedContext,
+    job_context: str | list[dict] | PackedContext,
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS,
+    use_cache: bool = True
+) -> MatchingReport:
+    """Version asynchrone de generate_structured_matching_report."""
+    prompt = build_matching_json_prompt(cv_context, job_context, budget_tokens)
+    with _llm_errors():
+        raw = await acall_llm(prompt, max_tokens=MATCHING_JSON_MAX_TOKENS, use_cache=use_cache, json_mode=True)
+        try:
+            return parse_matching_report(raw)
+        except ValueError as e:
+            print(f"⚠️ Rapport JSON non conforme ({e}), nouvelle génération")
+        raw = await acall_llm(prompt, max_tokens=MATCHING_JSON_MAX_TOKENS, use_cache=False, json_mode=True)
+        return parse_matching_report(raw)
+
+
+def generate_matching_reports(
+    pairs: list[tuple[str | list[dict], str | list[dict]]],
+    budget_tokens: int = MATCHING_CONTEXT_TOKENS,
+    use_cache: bool = True,
+    return_exceptions: bool = False,
+    structured: bool = False
+) -> list:
+    """
+    Génère plusieurs rapports de matching en parallèle (jusqu'à
+    LLM_MAX_CONCURRENCY en vol), depuis du code synchrone.
+
+    Args:
+        pairs: Liste de (contexte CV, contexte offre)
+        return_exceptions: Si True, un rapport en erreur donne son exception
+                           dans la liste au lieu d'interrompre tout le lot
+        structured: Si True, des MatchingReport (JSON compact, classables par
+                    score) au lieu de rapports markdown
+
+    Returns:
+        Les rapports, dans l'ordre de `pairs`
+    """
+    agenerate_report = agenerate_structured_matching_report if structured else agenerate_matching_report
+
+    async def run() -> list:
+        try:
+            return await asyncio.gather(
+                *(agenerate_report(cv, job, budget_tokens, use_cache) for cv, job in pairs),
+                return_exceptions=return_exceptions
+            )
+        finally:
+            await aclose_async_client()
+
+    return asyncio.run(run())
@@ -4,12 +4,40 @@ Lecture et découpage des documents PDF (CVs et offres d'emploi)
 """
 
 import os
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Callable, Iterable, Iterator, Union
 import fitz  # PyMuPDF
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src.ingestion_cache import ParsedDocument, document_hash, file_hash, get_ingestion_cache
 
-def load_pdf(file_path: str) -> str:
+SEPARATORS = ["\n\n", "\n", ".", " "]
+
+# Extraction parallèle : nombre de process et taille des lots de pages
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", "16"))
+
+# Au-delà de ce nombre de caractères extraits, le texte brut n'est plus conservé
+# (ParsedDocument.text vide) : seuls les chunks sont gardés et mis en cache
+INGESTION_TEXT_MAX_CHARS = int(os.getenv("INGESTION_TEXT_MAX_CHARS", "2000000"))
+
+# Un document peut être un chemin, des octets en mémoire ou un objet fichier
+# (ex: UploadedFile de Streamlit, io.BytesIO, io.StringIO pour un texte collé)
+DocumentSource = Union[str, os.PathLike, bytes, bytearray, memoryview, IO]
+
+# Signature d'un PDF, cherchée dans le premier Ko comme le font les lecteurs PDF
+_PDF_MAGIC = b"%PDF-"
+_SNIFF_BYTES = 1024
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[str]:
+    """
+    Lit un PDF page par page (générateur).
+    Une seule page est en mémoire à la fois ; le fichier est fermé
+    à la fin de l'itération ou si le consommateur s'arrête avant.
+    """
     path = Path(file_path)
 
     if path.suffix.lower() != ".pdf":
@@ -18,23 +46,133 @@ def load_pdf(file_path: str) -> str:
     if not path.exists():
         raise FileNotFoundError(f"Fichier introuvable : {file_path}")
 
-    text = ""
-    doc = fitz.open(file_path)
+    yield from _iter_doc_pages(fitz.open(file_path))
+
 
+def _iter_doc_pages(doc) -> Iterator[str]:
+    """Produit les pages d'un document PyMuPDF ouvert, puis le ferme."""
     try:
         for page_num, page in enumerate(doc):
-            text += f"\n--- Page {page_num + 1} ---\n"
-            text += page.get_text()
-        n_pages = len(doc)
+            yield f"\n--- Page {page_num + 1} ---\n" + page.get_text()
     finally:
         doc.close()
 
+
+def load_pdf(file_path: str) -> str:
+    pages = list(iter_pdf_pages(file_path))
+    text = "".join(pages)
+
     if not text.strip():
         raise ValueError(f"Aucun texte extrait du PDF : {file_path}")
 
-    print(f"✅ PDF chargé : {path.name} ({n_pages} pages, {len(text)} caractères)")
+    print(f"✅ PDF chargé : {Path(file_path).name} ({len(pages)} pages, {len(text)} caractères)")
     return text
 
+
+# ---------------------------------------------------------------
+# Extraction parallèle (imports en masse)
+# ---------------------------------------------------------------
+
+def _extract_page_range(file_path: str, start: int, end: int) -> list[str]:
+    """Extrait les pages [start, end) d'un PDF (exécuté dans un process du pool)."""
+    doc = fitz.open(file_path)
+    try:
+        return [
+            f"\n--- Page {page_num + 1} ---\n" + doc[page_num].get_text()
+            for page_num in range(start, min(end, len(doc)))
+        ]
+    finally:
+        doc.close()
+
+
+def _page_ranges(file_path: str, pages_per_task: int) -> list[tuple[int, int]]:
+    """Découpe un PDF en lots de pages. Lève les mêmes erreurs que load_pdf."""
+    path = Path(file_path)
+    if path.suffix.lower() != ".pdf":
+        raise ValueError(f"Le fichier doit être un PDF : {file_path}")
+    if not path.exists():
+        raise FileNotFoundError(f"Fichier introuvable : {file_path}")
+
+    doc = fitz.open(file_path)
+    try:
+        n_pages = len(doc)
+    finally:
+        doc.close()
+    return [(start, min(start + pages_per_task, n_pages)) for start in range(0, n_pages, pages_per_task)]
+
+
+def load_pdfs_parallel(
+    file_paths: list[str],
+    max_workers: int = INGESTION_WORKERS,
+    pages_per_task: int = PAGES_PER_TASK,
+    return_exceptions: bool = False
+) -> list:
+    """
+    Extrait le texte de plusieurs PDFs en parallèle dans un ProcessPoolExecutor.
+    Les gros PDFs sont découpés en lots de pages traités par des process différents.
+
+    Args:
+        file_paths: Chemins des PDFs
+        max_workers: Nombre de process (1 = extraction séquentielle, sans pool)
+        pages_per_task: Nombre de pages par tâche
+        return_exceptions: Si True, un fichier en erreur donne son exception
+                           dans la liste au lieu d'interrompre tout le lot
+
+    Returns:
+        Le texte de chaque PDF, dans l'ordre de `file_paths`
+    """
+    tasks: list[tuple[int, str, int, int]] = []
+    errors: dict[int, Exception] = {}
+    for doc_index, file_path in enumerate(file_paths):
+        try:
+            for start, end in _page_ranges(file_path, pages_per_task):
+                tasks.append((doc_index, file_path, start, end))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            errors[doc_index] = e
+
+    if max_workers <= 1:
+        results = [_extract_page_range(path, start, end) for _, path, start, end in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_extract_page_range, path, start, end) for _, path, start, end in tasks]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results.append(e)
+
+    # Réassemble les lots de pages dans l'ordre des documents
+    pages: dict[int, list[str]] = {i: [] for i in range(len(file_paths))}
+    for (doc_index, _, _, _), result in zip(tasks, results):
+        if isinstance(result, Exception):
+            errors.setdefault(doc_index, result)
+        else:
+            pages[doc_index].extend(result)
+
+    texts = []
+    for doc_index, file_path in enumerate(file_paths):
+        if doc_index in errors:
+            texts.append(errors[doc_index])
+            continue
+        text = "".join(pages[doc_index])
+        if not text.strip():
+            error = ValueError(f"Aucun texte extrait du PDF : {file_path}")
+            if not return_exceptions:
+                raise error
+            texts.append(error)
+            continue
+        texts.append(text)
+
+    n_pages = sum(len(p) for p in pages.values())
+    print(f"✅ {len(file_paths)} PDFs chargés en parallèle ({n_pages} pages, {max_workers} workers)")
+    return texts
+
+
 def load_txt(file_path: str) -> str:
     """Lit un fichier texte brut."""
     path = Path(file_path)
@@ -51,46 +189,508 @@ def load_txt(file_path: str) -> str:
     print(f"✅ Texte chargé : {path.name} ({len(text)} caractères)")
     return text
 
-def split_text(text: str, chunk_size: int = 512, chunk_overlap: int = 50) -> list[str]:
+def split_text(
+    text: str,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    length_function: Callable[[str], int] = len
+) -> list[str]:
     """
     Découpe le texte en morceaux pour la vectorisation.
     
     Args:
         text: Texte brut à découper
-        chunk_size: Taille de chaque morceau (en caractères)
+        chunk_size: Taille de chaque morceau (en caractères, ou selon length_function)
         chunk_overlap: Chevauchement entre morceaux (évite de couper les idées)
+        length_function: Mesure de la taille d'un morceau (len, ou token_length_function())
         
     Returns:
         Liste de morceaux de texte
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ".", " "]
-    )
-    
-    chunks = splitter.split_text(text)
+    chunks = _split(text, chunk_size, chunk_overlap, length_function)
     print(f"✅ Texte découpé : {len(chunks)} morceaux (chunk_size={chunk_size})")
     return chunks
 
 
-def load_and_split(file_path: str, chunk_size: int = 512, chunk_overlap: int = 50) -> list[str]:
+# ---------------------------------------------------------------
+# Découpage récursif natif
+# Mêmes morceaux que RecursiveCharacterTextSplitter de LangChain
+# (keep_separator=True, strip_whitespace=True), sans importer LangChain
+# ---------------------------------------------------------------
+
+def _split(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    length_function: Callable[[str], int] = len,
+    separators: list[str] = SEPARATORS
+) -> list[str]:
+    if chunk_overlap > chunk_size:
+        raise ValueError(
+            f"Chevauchement ({chunk_overlap}) supérieur à la taille des morceaux ({chunk_size})"
+        )
+    return _split_recursive(text, separators, chunk_size, chunk_overlap, length_function)
+
+
+def _split_recursive(
+    text: str,
+    separators: list[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    length_function: Callable[[str], int]
+) -> list[str]:
+    # Premier séparateur présent dans le texte ; les suivants servent à
+    # redécouper les morceaux encore trop longs
+    separator, remaining = separators[-1], []
+    for i, candidate in enumerate(separators):
+        if candidate in text:
+            separator, remaining = candidate, separators[i + 1:]
+            break
+
+    # Le séparateur est gardé en tête du morceau qui le suit
+    parts = text.split(separator)
+    splits = [parts[0]] + [separator + part for part in parts[1:]]
+
+    chunks: list[str] = []
+    good: list[str] = []
+    for piece in splits:
+        if not piece:
+            continue
+        if length_function(piece) < chunk_size:
+            good.append(piece)
+            continue
+        if good:
+            chunks.extend(_merge(good, chunk_size, chunk_overlap, length_function))
+            good = []
+        if remaining:
+            chunks.extend(_split_recursive(piece, remaining, chunk_size, chunk_overlap, length_function))
+        else:
+            chunks.append(piece)
+
+    if good:
+        chunks.extend(_merge(good, chunk_size, chunk_overlap, length_function))
+    return chunks
+
+
+class _Merger:
     """
-    Pipeline complet : charge un PDF ou TXT et le découpe.
+    Regroupe des petits morceaux jusqu'à chunk_size, en gardant en tête du
+    morceau suivant jusqu'à chunk_overlap de la fin du précédent.
+    Incrémental : add() rend les morceaux complets, finish() le dernier.
     """
-    path = Path(file_path)
 
-    if path.suffix.lower() == ".pdf":
-        text = load_pdf(file_path)
-    elif path.suffix.lower() == ".txt":
-        text = load_txt(file_path)
-    else:
-        raise ValueError(f"Format non supporté : {path.suffix}. Utilisez PDF ou TXT.")
+    def __init__(self, chunk_size: int, chunk_overlap: int, length_function: Callable[[str], int]):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        self.window: deque[str] = deque()
+        self.lengths: deque[int] = deque()
+        self.total = 0
+
+    def add(self, piece: str) -> list[str]:
+        chunks = []
+        length = self.length_function(piece)
+        if self.window and self.total + length > self.chunk_size:
+            chunk = "".join(self.window).strip()
+            if chunk:
+                chunks.append(chunk)
+            while self.total > self.chunk_overlap or (
+                self.total + length > self.chunk_size and self.total > 0
+            ):
+                self.total -= self.lengths.popleft()
+                self.window.popleft()
+        self.window.append(piece)
+        self.lengths.append(length)
+        self.total += length
+        return chunks
 
-    chunks = split_text(text, chunk_size, chunk_overlap)
+    def finish(self) -> list[str]:
+        chunk = "".join(self.window).strip()
+        self.window.clear()
+        self.lengths.clear()
+        self.total = 0
+        return [chunk] if chunk else []
+
+
+def _merge(
+    pieces: list[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    length_function: Callable[[str], int]
+) -> list[str]:
+    """Regroupe des petits morceaux jusqu'à chunk_size (voir _Merger)."""
+    merger = _Merger(chunk_size, chunk_overlap, length_function)
+    chunks: list[str] = []
+    for piece in pieces:
+        chunks.extend(merger.add(piece))
+    chunks.extend(merger.finish())
     return chunks
 
 
+class _StreamSplitter:
+    """
+    Équivalent incrémental de _split_recursive : feed() reçoit le texte par
+    morceaux (pages) et rend les chunks déjà définitifs, finish() les derniers.
+    Le résultat est exactement _split(texte complet) pour une length_function
+    croissante avec le texte (len, nombre de tokens).
+
+    _split_recursive découpe au premier séparateur présent dans tout le texte.
+    Tant que le texte reçu fait moins de chunk_size, il est gardé tel quel.
+    Ensuite, un séparateur plus prioritaire qui apparaît plus loin ne change
+    rien à ce qui précède : ce préfixe devient le premier morceau (trop long,
+    donc redécoupé avec les séparateurs suivants, ce qui est déjà en cours).
+    Le découpage en cours est clos et un nouveau repart du séparateur.
+    La mémoire reste bornée à ~chunk_size par niveau de séparateur, sauf
+    pour un texte sans aucun séparateur (rendu d'un bloc, comme _split).
+    """
+
+    def __init__(
+        self,
+        separators: list[str],
+        chunk_size: int,
+        chunk_overlap: int,
+        length_function: Callable[[str], int]
+    ):
+        self.separators = separators
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        # Un séparateur de plusieurs caractères peut chevaucher deux pages
+        self.hold = max(len(s) for s in separators) - 1
+        self.buffer = ""        # texte reçu, pas encore parcouru
+        self.started = False    # False : moins de chunk_size reçus, rien n'est découpé
+        self.level: int | None = None  # séparateur courant (None : aucun vu)
+        self.merger = _Merger(chunk_size, chunk_overlap, length_function)
+        self.piece = ""         # morceau en cours, tant qu'il est court (ou sans séparateur)
+        self.big = False        # morceau en cours plus long que chunk_size
+        self.child: "_StreamSplitter | None" = None  # redécoupage du morceau long
+
+    def feed(self, text: str) -> list[str]:
+        self.buffer += text
+        if not self.started:
+            if self.length_function(self.buffer[:len(self.buffer) - self.hold]) < self.chunk_size:
+                return []
+            self.started = True
+            self.level = self._first_separator(len(self.buffer) - self.hold)
+        out: list[str] = []
+        self._scan(out, final=False)
+        return out
+
+    def finish(self) -> list[str]:
+        if not self.started:
+            # Texte court : aucun chunk n'a été rendu, découpage direct
+            return _split_recursive(self.buffer, self.separators, self.chunk_size,
+                                    self.chunk_overlap, self.length_function)
+        out: list[str] = []
+        self._scan(out, final=True)
+        self._close(out)
+        return out
+
+    def _first_separator(self, limit: int) -> int | None:
+        for index, separator in enumerate(self.separators):
+            position = self.buffer.find(separator, 0, limit + len(separator) - 1)
+            if position != -1:
+                return index
+        return None
+
+    def _scan(self, out: list[str], final: bool) -> None:
+        """Parcourt le tampon jusqu'à `limit` : fins de morceaux et changements de séparateur."""
+        buffer = self.buffer
+        limit = len(buffer) if final else len(buffer) - self.hold
+        position = 0
+        found: dict[int, int] = {}
+
+        while True:
+            last = len(self.separators) - 1 if self.level is None else self.level
+            event, event_index = limit, None
+            for index in range(last + 1):
+                separator = self.separators[index]
+                cached = found.get(index)
+                if cached is None or (cached != -1 and cached < position):
+                    cached = buffer.find(separator, position, min(len(buffer), limit + len(separator) - 1))
+                    found[index] = cached
+                if cached != -1 and cached < event:
+                    event, event_index = cached, index
+
+            if event_index is None:
+                if position < limit:
+                    self._extend(buffer[position:limit], out)
+                self.buffer = buffer[max(position, limit):]
+                return
+
+            self._extend(buffer[position:event], out)
+            if event_index != self.level:
+                # Séparateur plus prioritaire : tout ce qui précède forme le premier morceau
+                self._close(out)
+                self.level = event_index
+                self.merger = _Merger(self.chunk_size, self.chunk_overlap, self.length_function)
+            else:
+                self._end_piece(out)
+            separator = self.separators[event_index]
+            self._extend(separator, out)
+            position = event + len(separator)
+
+    def _extend(self, text: str, out: list[str]) -> None:
+        if not text:
+            return
+        if self.child is not None:
+            out.extend(self.child.feed(text))
+            return
+        self.piece += text
+        if self.level is None or self.big or self.length_function(self.piece) < self.chunk_size:
+            return
+        # Morceau trop long : les morceaux courts qui précèdent sont regroupés,
+        # puis il est redécoupé avec les séparateurs suivants
+        out.extend(self.merger.finish())
+        self.big = True
+        remaining = self.separators[self.level + 1:]
+        if remaining:
+            self.child = _StreamSplitter(remaining, self.chunk_size, self.chunk_overlap,
+                                         self.length_function)
+            out.extend(self.child.feed(self.piece))
+            self.piece = ""
+
+    def _end_piece(self, out: list[str]) -> None:
+        if self.child is not None:
+            out.extend(self.child.finish())
+        elif self.big:
+            out.append(self.piece)
+        elif self.piece:
+            out.extend(self.merger.add(self.piece))
+        self.piece, self.big, self.child = "", False, None
+
+    def _close(self, out: list[str]) -> None:
+        if self.level is None and self.length_function(self.piece) >= self.chunk_size:
+            # Aucun séparateur : le texte est rendu d'un bloc, comme _split
+            out.append(self.piece)
+            self.piece = ""
+        self._end_piece(out)
+        out.extend(self.merger.finish())
+
+
+@lru_cache(maxsize=4)
+def token_length_function(
+    tokenizer_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+) -> Callable[[str], int]:
+    """
+    Fonction de longueur en tokens, à passer à split_text pour un chunk_size
+    exprimé en tokens du modèle d'embedding (évite les troncatures silencieuses).
+    """
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+
+    def token_length(text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    return token_length
+
+
+def iter_chunks(
+    pages: Iterable[str],
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    length_function: Callable[[str], int] = len
+) -> Iterator[str]:
+    """
+    Découpe un flux de pages en morceaux, au fil de l'eau (générateur).
+
+    Produit exactement les morceaux de split_text("".join(pages)), sans
+    assembler le texte complet : un morceau sort dès qu'aucune page suivante
+    ne peut plus le modifier (voir _StreamSplitter). La mémoire reste bornée
+    à ~une page + quelques morceaux, quelle que soit la taille du document.
+    """
+    if chunk_overlap > chunk_size:
+        raise ValueError(
+            f"Chevauchement ({chunk_overlap}) supérieur à la taille des morceaux ({chunk_size})"
+        )
+    splitter = _StreamSplitter(SEPARATORS, chunk_size, chunk_overlap, length_function)
+    for page in pages:
+        yield from splitter.feed(page)
+    yield from splitter.finish()
+
+
+# ---------------------------------------------------------------
+# Sources en mémoire (uploads, textes collés)
+# ---------------------------------------------------------------
+
+def source_name(source: DocumentSource, default: str = "document") -> str:
+    """Nom affichable d'une source : nom du fichier, ou `default` pour des octets."""
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source).name
+    name = getattr(source, "name", None)
+    return Path(name).name if isinstance(name, str) and name else default
+
+
+def read_source(source: DocumentSource) -> bytes | memoryview | str:
+    """
+    Lit le contenu d'une source en mémoire sans passer par le disque.
+    Les octets et memoryview sont renvoyés tels quels (pas de copie) ;
+    un objet fichier texte (io.StringIO) renvoie directement une chaîne.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return source.read()
+    raise TypeError(f"Source non supportée : {type(source).__name__}")
+
+
+def detect_content_type(data: bytes | memoryview) -> str:
+    """Renvoie "pdf" si la signature %PDF- est présente en tête, "text" sinon."""
+    head = bytes(data[:_SNIFF_BYTES])
+    return "pdf" if _PDF_MAGIC in head else "text"
+
+
+def _decode_text(data: bytes | memoryview, name: str) -> str:
+    try:
+        return str(data, "utf-8")
+    except UnicodeDecodeError:
+        raise ValueError(f"Format non supporté : {name} n'est ni un PDF ni un texte UTF-8.")
+
+
+def _iter_bytes_pages(data: bytes | memoryview | str, name: str) -> Iterator[str]:
+    """Pages d'un contenu déjà en mémoire : PDF via fitz.open(stream=...), sinon texte."""
+    if isinstance(data, str):
+        yield data
+    elif detect_content_type(data) == "pdf":
+        yield from _iter_doc_pages(fitz.open(stream=data, filetype="pdf"))
+    else:
+        yield _decode_text(data, name)
+
+
+def iter_source_pages(source: DocumentSource) -> Iterator[str]:
+    """
+    Produit les pages d'une source, en choisissant le lecteur d'après le
+    contenu (signature PDF) et non d'après l'extension du fichier.
+
+    - chemin : le PDF est lu page par page depuis le disque
+    - octets / memoryview / objet fichier binaire : fitz.open(stream=...)
+    - objet fichier texte ou octets UTF-8 : une seule "page" de texte
+    """
+    name = source_name(source)
+
+    if isinstance(source, (str, os.PathLike)):
+        path = Path(source)
+        if not path.exists():
+            raise FileNotFoundError(f"Fichier introuvable : {source}")
+        with open(path, "rb") as f:
+            head = f.read(_SNIFF_BYTES)
+        if detect_content_type(head) == "pdf":
+            yield from _iter_doc_pages(fitz.open(path))
+        else:
+            with open(path, "rb") as f:
+                yield _decode_text(f.read(), name)
+        return
+
+    yield from _iter_bytes_pages(read_source(source), name)
+
+
+def iter_document_chunks(
+    source: DocumentSource,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50
+) -> Iterator[str]:
+    """
+    Charge un PDF ou un texte et produit ses morceaux au fur et à mesure.
+    Pour un PDF, le premier morceau est disponible dès la première page lue.
+
+    Args:
+        source: Chemin, octets, memoryview ou objet fichier (voir iter_source_pages)
+    """
+    empty = True
+    for chunk in iter_chunks(iter_source_pages(source), chunk_size, chunk_overlap):
+        empty = False
+        yield chunk
+
+    if empty:
+        raise ValueError(f"Aucun texte extrait du document : {source_name(source)}")
+
+
+def ingest_document(
+    source: DocumentSource,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    use_cache: bool = True
+) -> ParsedDocument:
+    """
+    Lit et découpe un document en passant par le cache d'ingestion.
+
+    Le document est identifié par le SHA-256 de ses octets bruts : le même
+    CV vu par un autre onglet (biais, matching, ATS) ou une autre requête
+    est resservi sans relancer PyMuPDF ni le découpage.
+
+    Un fichier sur disque est haché par blocs puis, en cas d'absence du cache,
+    lu page par page (iter_source_pages) : seule l'extraction est en flux, les
+    chunks restent proportionnels à la taille du document. Le texte extrait
+    n'est conservé (et mis en cache) que jusqu'à INGESTION_TEXT_MAX_CHARS
+    caractères ; au-delà, ParsedDocument.text est vide pour ne pas doubler
+    la mémoire occupée par les chunks.
+
+    Returns:
+        ParsedDocument (texte extrait, nombre de pages, chunks)
+    """
+    name = source_name(source)
+    if isinstance(source, (str, os.PathLike)):
+        if not Path(source).exists():
+            raise FileNotFoundError(f"Fichier introuvable : {source}")
+        doc_hash = file_hash(source)
+        stream = iter_source_pages(source)  # générateur : rien n'est lu avant l'itération
+    else:
+        data = read_source(source)
+        doc_hash = document_hash(data.encode("utf-8") if isinstance(data, str) else data)
+        stream = _iter_bytes_pages(data, name)
+
+    cache = get_ingestion_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(doc_hash, chunk_size, chunk_overlap)
+        if cached is not None:
+            return cached
+
+    pages: list[str] | None = []
+    n_pages = 0
+    n_chars = 0
+
+    def collect(stream: Iterator[str]) -> Iterator[str]:
+        nonlocal pages, n_pages, n_chars
+        for page in stream:
+            n_pages += 1
+            n_chars += len(page)
+            if pages is not None:
+                if n_chars > INGESTION_TEXT_MAX_CHARS:
+                    pages = None  # document trop gros : on abandonne le texte brut
+                else:
+                    pages.append(page)
+            yield page
+
+    chunks = list(iter_chunks(collect(stream), chunk_size, chunk_overlap))
+    if not chunks:
+        raise ValueError(f"Aucun texte extrait du document : {name}")
+
+    text = "".join(pages) if pages is not None else ""
+    document = ParsedDocument(doc_hash, text, n_pages, chunks)
+    if cache is not None:
+        cache.put(document, chunk_size, chunk_overlap)
+    return document
+
+
+def load_and_split(
+    source: DocumentSource,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    use_cache: bool = True
+) -> list[str]:
+    """
+    Pipeline complet : charge un PDF ou un texte (chemin ou contenu en mémoire) et le découpe.
+    Les documents déjà vus sont servis par le cache d'ingestion (voir ingest_document).
+    """
+    document = ingest_document(source, chunk_size, chunk_overlap, use_cache)
+    origin = " (cache)" if document.from_cache else ""
+    print(f"✅ {source_name(source)} découpé{origin} : {len(document.chunks)} morceaux (chunk_size={chunk_size})")
+    return document.chunks
+
+
 # Test rapide si on lance ce fichier directement
 if __name__ == "__main__":
     import sys
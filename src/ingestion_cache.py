@@ -0,0 +1,200 @@
+"""
+ingestion_cache.py
+Cache disque des documents déjà lus et découpés
+Clé : SHA-256 des octets bruts + paramètres de découpage
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INGESTION_CACHE_ENABLED = os.getenv("INGESTION_CACHE_ENABLED", "true").lower() == "true"
+INGESTION_CACHE_PATH = os.getenv("INGESTION_CACHE_PATH", "./ingestion_cache")
+INGESTION_CACHE_MAX_MB = float(os.getenv("INGESTION_CACHE_MAX_MB", "256"))
+
+
+def document_hash(data: bytes | memoryview) -> str:
+    """Hash SHA-256 des octets bruts d'un document."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str | os.PathLike, block_size: int = 1024 * 1024) -> str:
+    """Hash SHA-256 d'un fichier, lu par blocs (même valeur que document_hash de son contenu)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class ParsedDocument:
+    doc_hash: str
+    text: str
+    n_pages: int
+    chunks: list[str] = field(default_factory=list)
+    from_cache: bool = False
+
+
+class IngestionCache:
+    """
+    Cache LRU persistant des documents parsés.
+
+    Une ligne SQLite par (document, chunk_size, chunk_overlap) : texte extrait,
+    nombre de pages et chunks (JSON). La taille cumulée est plafonnée à
+    `max_mb` ; au-delà, les documents les moins récemment lus sont évincés.
+    """
+
+    def __init__(self, path: str = INGESTION_CACHE_PATH, max_mb: float = INGESTION_CACHE_MAX_MB):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            str(self.path / "documents.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_hash TEXT NOT NULL,
+                chunk_size INTEGER NOT NULL,
+                chunk_overlap INTEGER NOT NULL,
+                n_pages INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                chunks TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (doc_hash, chunk_size, chunk_overlap)
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_lru ON documents (last_access);
+        """)
+        self._conn.commit()
+
+    def get(self, doc_hash: str, chunk_size: int, chunk_overlap: int) -> ParsedDocument | None:
+        """Retourne le document parsé s'il est en cache, sinon None."""
+        key = (doc_hash, chunk_size, chunk_overlap)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT n_pages, text, chunks FROM documents "
+                "WHERE doc_hash = ? AND chunk_size = ? AND chunk_overlap = ?",
+                key
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE documents SET last_access = ? "
+                "WHERE doc_hash = ? AND chunk_size = ? AND chunk_overlap = ?",
+                (time.time(), *key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        n_pages, text, chunks = row
+        return ParsedDocument(doc_hash, text, n_pages, json.loads(chunks), from_cache=True)
+
+    def put(self, document: ParsedDocument, chunk_size: int, chunk_overlap: int) -> None:
+        """Ajoute un document parsé (éviction LRU si le plafond est dépassé)."""
+        chunks = json.dumps(document.chunks, ensure_ascii=False)
+        size = len(document.text.encode("utf-8")) + len(chunks.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(doc_hash, chunk_size, chunk_overlap, n_pages, text, chunks, size_bytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (document.doc_hash, chunk_size, chunk_overlap, document.n_pages,
+                 document.text, chunks, size, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Supprime les documents les moins récents jusqu'à repasser sous le plafond."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for doc_hash, chunk_size, chunk_overlap, size in self._conn.execute(
+            "SELECT doc_hash, chunk_size, chunk_overlap, size_bytes FROM documents "
+            "ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((doc_hash, chunk_size, chunk_overlap))
+            total -= size
+
+        self._conn.executemany(
+            "DELETE FROM documents WHERE doc_hash = ? AND chunk_size = ? AND chunk_overlap = ?",
+            evicted
+        )
+
+    def stats(self) -> dict:
+        """Compteurs du cache : hits, misses, taux de hit et taille."""
+        with self._lock:
+            n_documents, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM documents"
+            ).fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "documents": n_documents,
+                "size_mb": round(size / (1024 * 1024), 3),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 3),
+            }
+
+    def clear(self) -> None:
+        """Vide complètement le cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------------------------------------------------------------
+# Instance partagée par le process
+# ---------------------------------------------------------------
+
+_CACHE: IngestionCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_ingestion_cache() -> IngestionCache | None:
+    """Retourne le cache partagé, ou None si désactivé (INGESTION_CACHE_ENABLED=false)."""
+    global _CACHE
+    if not INGESTION_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = IngestionCache()
+        return _CACHE
+
+
+def ingestion_cache_stats() -> dict:
+    """Compteurs du cache partagé (vide si le cache est désactivé)."""
+    cache = get_ingestion_cache()
+    return cache.stats() if cache is not None else {}
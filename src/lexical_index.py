@@ -0,0 +1,240 @@
+"""
+lexical_index.py
+Index inversé BM25 construit à côté de chaque collection vectorielle
+Retrouve les termes techniques exacts ("dbt", "sagemaker", "ci/cd") sans modèle d'embedding
+"""
+
+import os
+import re
+import json
+import math
+import threading
+import uuid
+from pathlib import Path
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LEXICAL_INDEX_PATH = os.getenv(
+    "LEXICAL_INDEX_PATH",
+    os.path.join(os.getenv("CHROMA_PATH", "./chroma_db"), "lexical")
+)
+
+# Paramètres BM25 classiques
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Constante de la fusion par rang réciproque (RRF)
+RRF_K = 60
+
+# Garde "ci/cd", "scikit-learn", "c++", "node.js" en un seul token
+_TOKEN_PATTERN = re.compile(r"\w+(?:[/\-.+#]+\w+)*[+#]*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Découpe un texte en tokens minuscules pour l'index BM25."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Index inversé BM25 d'une collection : terme -> [(position du doc, fréquence)].
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict] | None = None
+    ):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas) if metadatas else [{} for _ in ids]
+        # Empreinte du corpus indexé (jeton d'écriture, nombre de documents) ; None : à reconstruire
+        self.fingerprint: dict | None = None
+        self.doc_lengths: list[int] = []
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+
+        for position, document in enumerate(self.documents):
+            counts = Counter(tokenize(document))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((position, tf))
+
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, n_results: int = 3) -> list[tuple[int, float]]:
+        """
+        Retourne les `n_results` meilleurs documents : [(position, score BM25)].
+        Seuls les documents contenant au moins un terme de la question sont scorés.
+        """
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for position, tf in postings:
+                norm = 1 - BM25_B + BM25_B * self.doc_lengths[position] / (self.avg_length or 1)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:n_results]
+
+    def to_dict(self) -> dict:
+        return {
+            "ids": self.ids,
+            "documents": self.documents,
+            "metadatas": self.metadatas,
+            "fingerprint": self.fingerprint,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        index = cls(data["ids"], data["documents"], data["metadatas"])
+        index.fingerprint = data.get("fingerprint")
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """
+    Fusionne plusieurs classements (listes d'ids, du meilleur au moins bon)
+    avec la formule RRF : score(d) = somme de 1 / (k + rang(d)).
+    """
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            fused[id_] = fused.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+# ---------------------------------------------------------------
+# Stockage des index : mémoire + fichier JSON pour les collections persistantes
+# ---------------------------------------------------------------
+
+_INDEXES: dict[str, BM25Index] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _index_file(collection_name: str) -> Path:
+    return Path(LEXICAL_INDEX_PATH) / f"{collection_name}.json"
+
+
+def _generation_file(collection_name: str) -> Path:
+    return Path(LEXICAL_INDEX_PATH) / f"{collection_name}.generation"
+
+
+def _generation(collection_name: str) -> str:
+    """Jeton d'écriture courant de la collection ("" si jamais écrite)."""
+    try:
+        return _generation_file(collection_name).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return ""
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    """Écrit un fichier d'un coup (fichier temporaire puis renommage)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _is_current(index: BM25Index, collection_name: str, collection=None) -> bool:
+    """
+    Vrai si l'index correspond au corpus : même jeton d'écriture (renouvelé
+    par chaque delete_lexical_index, y compris depuis un autre process) et,
+    si la collection est fournie, même nombre de documents.
+    """
+    fingerprint = index.fingerprint
+    if fingerprint is None or fingerprint["generation"] != _generation(collection_name):
+        return False
+    return collection is None or fingerprint["count"] == collection.count()
+
+
+def build_lexical_index(collection, persist: bool = True) -> BM25Index:
+    """
+    (Re)construit l'index BM25 d'une collection à partir de son contenu.
+    Appelé à la première recherche lexicale ou hybride après une écriture :
+    embed_and_store se contente de supprimer l'index périmé.
+
+    L'empreinte du corpus est relevée avant la lecture : si une écriture
+    survient pendant la construction, l'index est retourné à l'appelant mais
+    ni partagé ni écrit sur disque, pour ne pas masquer le nouveau corpus.
+
+    Args:
+        collection: Collection ChromaDB ou NumpyCollection
+        persist: Écrit aussi l'index sur disque (collections ChromaDB)
+    """
+    generation = _generation(collection.name)
+    stored = collection.get(include=["documents", "metadatas"])
+    index = BM25Index(stored["ids"], stored["documents"], stored["metadatas"])
+    index.fingerprint = {"generation": generation, "count": len(index)}
+
+    with _INDEXES_LOCK:
+        if _generation(collection.name) != generation:
+            return index
+        _INDEXES[collection.name] = index
+        if persist:
+            _write_atomic(
+                _index_file(collection.name),
+                json.dumps(index.to_dict(), ensure_ascii=False)
+            )
+
+    return index
+
+
+def get_lexical_index(collection_name: str, collection=None) -> BM25Index | None:
+    """
+    Retourne l'index BM25 d'une collection (mémoire, sinon disque), ou None
+    s'il n'existe pas ou ne correspond plus au corpus (empreinte différente).
+
+    Args:
+        collection_name: Nom de la collection
+        collection: Collection elle-même, pour vérifier aussi son nombre de documents
+    """
+    index = _INDEXES.get(collection_name)
+    if index is None:
+        path = _index_file(collection_name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = BM25Index.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    if not _is_current(index, collection_name, collection):
+        with _INDEXES_LOCK:
+            if _INDEXES.get(collection_name) is index:
+                del _INDEXES[collection_name]
+        return None
+
+    with _INDEXES_LOCK:
+        _INDEXES.setdefault(collection_name, index)
+    return index
+
+
+def delete_lexical_index(collection_name: str, dropped: bool = False) -> None:
+    """
+    Supprime l'index BM25 d'une collection (mémoire et disque), à appeler
+    après chaque écriture : le jeton d'écriture est renouvelé, ce qui périme
+    aussi les index en cours de construction et ceux des autres process.
+
+    Args:
+        collection_name: Nom de la collection
+        dropped: La collection elle-même est supprimée (le jeton l'est aussi)
+    """
+    with _INDEXES_LOCK:
+        _INDEXES.pop(collection_name, None)
+        if dropped:
+            _generation_file(collection_name).unlink(missing_ok=True)
+        else:
+            _write_atomic(_generation_file(collection_name), uuid.uuid4().hex)
+        _index_file(collection_name).unlink(missing_ok=True)
@@ -0,0 +1,220 @@
+"""
+llm_cache.py
+Cache SQLite des réponses LLM
+Clé : (backend, modèle, hash du prompt, max_tokens, température, mode JSON)
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "64"))
+
+
+def prompt_hash(prompt: str) -> str:
+    """Hash SHA-256 d'un prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Cache persistant des réponses LLM, avec expiration et éviction LRU.
+
+    Une réponse expire `ttl_seconds` après sa génération. La taille cumulée
+    des réponses est plafonnée à `max_mb` ; au-delà, les réponses les moins
+    récemment servies sont évincées. Le temps de génération est conservé
+    pour mesurer le temps économisé par les hits.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        max_mb: float = LLM_CACHE_MAX_MB
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            str(self.path / "responses.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                backend TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                max_tokens INTEGER NOT NULL,
+                temperature REAL NOT NULL,
+                json_mode INTEGER NOT NULL,
+                response TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                generation_seconds REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (backend, model, prompt_hash, max_tokens, temperature, json_mode)
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses (last_access);
+        """)
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """Met à niveau un cache créé par une version précédente."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(responses)")]
+        if columns and "json_mode" not in columns:
+            # Clé primaire sans le mode JSON : réponses texte et JSON mélangées,
+            # impossible de les distinguer, on repart d'un cache vide
+            self._conn.execute("DROP TABLE responses")
+
+    def get(
+        self,
+        backend: str,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        json_mode: bool = False
+    ) -> str | None:
+        """Retourne la réponse en cache si elle existe et n'a pas expiré, sinon None."""
+        key = (backend, model, prompt_hash(prompt), max_tokens, temperature, int(json_mode))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, generation_seconds, created_at FROM responses "
+                "WHERE backend = ? AND model = ? AND prompt_hash = ? "
+                "AND max_tokens = ? AND temperature = ? AND json_mode = ?",
+                key
+            ).fetchone()
+
+            if row is None or now - row[2] > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE backend = ? AND model = ? "
+                "AND prompt_hash = ? AND max_tokens = ? AND temperature = ? AND json_mode = ?",
+                (now, *key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            self.seconds_saved += row[1]
+            return row[0]
+
+    def put(
+        self,
+        backend: str,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        response: str,
+        generation_seconds: float = 0.0,
+        json_mode: bool = False
+    ) -> None:
+        """Stocke une réponse (les réponses vides ne sont pas mises en cache)."""
+        size = len(response.encode("utf-8"))
+        if not response or size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(backend, model, prompt_hash, max_tokens, temperature, json_mode, "
+                "response, size_bytes, generation_seconds, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (backend, model, prompt_hash(prompt), max_tokens, temperature,
+                 int(json_mode), response, size, generation_seconds, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Supprime les réponses expirées, puis les moins récentes au-delà du plafond."""
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for rowid, size in self._conn.execute(
+            "SELECT rowid, size_bytes FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE rowid = ?", evicted)
+
+    def stats(self) -> dict:
+        """Compteurs du cache : hits, misses, taux de hit, temps économisé et taille."""
+        with self._lock:
+            n_responses, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM responses"
+            ).fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "seconds_saved": round(self.seconds_saved, 2),
+                "responses": n_responses,
+                "size_mb": round(size / (1024 * 1024), 3),
+            }
+
+    def clear(self) -> None:
+        """Vide complètement le cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+            self.seconds_saved = 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------------------------------------------------------------
+# Instance partagée par le process
+# ---------------------------------------------------------------
+
+_CACHE: LLMCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache | None:
+    """Retourne le cache partagé, ou None si désactivé (LLM_CACHE_ENABLED=false)."""
+    global _CACHE
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LLMCache()
+        return _CACHE
+
+
+def llm_cache_stats() -> dict:
+    """Compteurs du cache partagé (vide si le cache est désactivé)."""
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,110 @@
+"""
+matching_report.py
+Rapport de matching structuré : le LLM renvoie un JSON compact
+(score, points forts, points à développer, recommandation),
+validé ici puis mis en forme en markdown localement
+"""
+
+import re
+import json
+import math
+from dataclasses import dataclass, field
+
+# Le JSON attendu tient en ~150 tokens : inutile d'en autoriser 600
+MATCHING_JSON_MAX_TOKENS = 250
+
+MAX_STRENGTHS = 3
+MAX_GAPS = 3
+
+MATCHING_JSON_SCHEMA = (
+    '{"score": <entier de 0 à 10>, '
+    '"strengths": [<3 points forts, phrases courtes>], '
+    '"gaps": [<2 points à développer, phrases courtes>], '
+    '"recommendation": "<une phrase de conclusion>"}'
+)
+
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+@dataclass
+class MatchingReport:
+    score: int = 0                   # sur 10
+    strengths: list[str] = field(default_factory=list)
+    gaps: list[str] = field(default_factory=list)
+    recommendation: str = ""
+
+
+# ---------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------
+
+def _extract_json(raw: str) -> dict:
+    """Isole l'objet JSON de la réponse (bloc ```json, texte autour)."""
+    text = _FENCE_PATTERN.sub("", raw.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("Aucun objet JSON dans la réponse du LLM")
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON invalide dans la réponse du LLM : {e}")
+    if not isinstance(data, dict):
+        raise ValueError("La réponse du LLM n'est pas un objet JSON")
+    return data
+
+
+def _parse_score(value) -> int:
+    """Score entier entre 0 et 10 ; accepte 7, 7.5, "7" ou "7/10"."""
+    if isinstance(value, str):
+        value = value.split("/")[0].strip().replace(",", ".")
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Score invalide : {value!r}")
+    # json.loads accepte NaN, Infinity et 1e999 (inf)
+    if not math.isfinite(score):
+        raise ValueError(f"Score invalide : {value!r}")
+    return max(0, min(10, round(score)))
+
+
+def _parse_points(value, limit: int) -> list[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError(f"Liste de points attendue, reçu : {type(value).__name__}")
+    points = [str(p).strip() for p in value if str(p).strip()]
+    return points[:limit]
+
+
+def parse_matching_report(raw: str) -> MatchingReport:
+    """
+    Valide la réponse JSON du LLM et la convertit en MatchingReport.
+
+    Raises:
+        ValueError si la réponse n'est pas un JSON conforme au schéma
+    """
+    data = _extract_json(raw)
+    missing = [key for key in ("score", "strengths", "gaps", "recommendation") if key not in data]
+    if missing:
+        raise ValueError(f"Champs manquants dans le rapport : {', '.join(missing)}")
+
+    return MatchingReport(
+        score=_parse_score(data["score"]),
+        strengths=_parse_points(data["strengths"], MAX_STRENGTHS),
+        gaps=_parse_points(data["gaps"], MAX_GAPS),
+        recommendation=str(data["recommendation"]).strip()
+    )
+
+
+# ---------------------------------------------------------------
+# Mise en forme
+# ---------------------------------------------------------------
+
+def format_matching_report(report: MatchingReport) -> str:
+    """Rend le rapport au format markdown du rapport libre (## Score : X/10, listes)."""
+    lines = [f"## Score : {report.score}/10", "", "## ✅ Points forts"]
+    lines += [f"- {point}" for point in report.strengths] or ["- Aucun point fort identifié"]
+    lines += ["", "## ⚠️ Points à développer"]
+    lines += [f"- {point}" for point in report.gaps] or ["- Aucun point bloquant identifié"]
+    lines += ["", "## 📋 Recommandation", report.recommendation]
+    return "\n".join(lines)
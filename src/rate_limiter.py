@@ -0,0 +1,250 @@
+"""
+rate_limiter.py
+Limiteur de débit côté client pour l'API Mistral
+Seaux à jetons (requêtes/s et tokens/min) + plafond d'appels en vol,
+partagés par tous les threads du process, file d'attente par priorité
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MISTRAL_REQUESTS_PER_SECOND = float(os.getenv("MISTRAL_REQUESTS_PER_SECOND", "1"))
+MISTRAL_TOKENS_PER_MINUTE = float(os.getenv("MISTRAL_TOKENS_PER_MINUTE", "500000"))
+MISTRAL_MAX_IN_FLIGHT = int(os.getenv("MISTRAL_MAX_IN_FLIGHT", "4"))
+
+# Les requêtes interactives (interface) passent avant les traitements par lots
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class TokenBucket:
+    """
+    Seau à jetons : `rate` jetons ajoutés par seconde, au plus `capacity`.
+    Non thread-safe : protégé par le verrou du RateLimiter.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Secondes à attendre avant de pouvoir prélever `amount` jetons (0 si disponible)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing / self.rate, 0.0) if self.rate > 0 else 0.0
+
+    def consume(self, amount: float, now: float) -> None:
+        """Prélève `amount` jetons (le solde peut devenir négatif : dette remboursée au refill)."""
+        self._refill(now)
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Gouverneur des appels LLM d'un process.
+
+    Un appel attend son tour dans une file ordonnée par (priorité, arrivée) :
+    FIFO à priorité égale, les requêtes interactives devant les lots. La tête
+    de file part quand les deux seaux (requêtes/s, tokens/min) ont assez de
+    jetons et que moins de `max_in_flight` appels sont en cours.
+
+    Les tokens d'un appel sont estimés à l'entrée (prompt + max_tokens), puis
+    corrigés à la sortie avec l'usage réel renvoyé par l'API.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = MISTRAL_REQUESTS_PER_SECOND,
+        tokens_per_minute: float = MISTRAL_TOKENS_PER_MINUTE,
+        max_in_flight: int = MISTRAL_MAX_IN_FLIGHT
+    ):
+        self.requests = TokenBucket(requests_per_second, max(requests_per_second, 1.0))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._admitted = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE,
+                timeout: float | None = None) -> float:
+        """
+        Attend une place pour un appel de `tokens` tokens.
+
+        Returns:
+            Temps d'attente en secondes
+
+        Raises:
+            TimeoutError si la place n'est pas obtenue avant `timeout` secondes
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        ticket = (priority, next(self._counter))
+
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = None
+                    if self._queue[0] == ticket and self.in_flight < self.max_in_flight:
+                        delay = max(self.requests.time_until(1, now),
+                                    self.tokens.time_until(tokens, now))
+                        if delay <= 0:
+                            break
+
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise TimeoutError("Limite de débit du LLM : file d'attente trop longue")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._queue)
+            self.requests.consume(1, now)
+            self.tokens.consume(tokens, now)
+            self.in_flight += 1
+
+            waited = now - start
+            self._admitted += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._cond.notify_all()  # la nouvelle tête de file réévalue son délai
+        return waited
+
+    def release(self, reserved: int = 0, used: int | None = None) -> None:
+        """Libère une place ; `used` corrige la réservation de tokens avec l'usage réel."""
+        with self._cond:
+            self.in_flight -= 1
+            if used is not None:
+                self.tokens.consume(used - reserved, time.monotonic())
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE) -> Iterator[dict]:
+        """
+        Contexte d'un appel : attend une place puis la libère à la sortie.
+        Renseigner usage["tokens"] dans le bloc pour corriger la réservation ;
+        paused(usage, ...) rend la place pendant une attente entre deux tentatives.
+        """
+        self.acquire(tokens, priority)
+        usage: dict = {}
+        try:
+            yield usage
+        finally:
+            if not usage.get("released"):
+                self.release(tokens, usage.get("tokens"))
+
+    @contextmanager
+    def paused(self, usage: dict, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE) -> Iterator[None]:
+        """
+        Rend la place d'un slot le temps d'une attente (backoff entre deux
+        tentatives), puis en reprend une, à réserver comme un nouvel appel.
+        Si le bloc échoue, la place n'est pas reprise et le slot ne la rend pas.
+        """
+        self.release(tokens)
+        usage["released"] = True
+        yield
+        self.acquire(tokens, priority)
+        usage["released"] = False
+
+    def _give_back_when_acquired(self, waiting: asyncio.Future, tokens: int) -> None:
+        """Rend aussitôt une place obtenue par une attente dont l'appelant a été annulé."""
+        def give_back(future: asyncio.Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                self.release(tokens)
+        waiting.add_done_callback(give_back)
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[dict]:
+        """
+        Équivalent asynchrone de slot : l'attente se fait dans un thread pour
+        ne pas bloquer la boucle. Si l'appelant est annulé pendant l'attente,
+        la place obtenue ensuite est rendue aussitôt.
+        """
+        waiting = asyncio.ensure_future(asyncio.to_thread(self.acquire, tokens, priority))
+        try:
+            await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            self._give_back_when_acquired(waiting, tokens)
+            raise
+
+        usage: dict = {}
+        try:
+            yield usage
+        finally:
+            if not usage.get("released"):
+                self.release(tokens, usage.get("tokens"))
+
+    @asynccontextmanager
+    async def apaused(self, usage: dict, tokens: int = 0,
+                      priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """Équivalent asynchrone de paused, pour un slot obtenu par aslot."""
+        self.release(tokens)
+        usage["released"] = True
+        yield
+        waiting = asyncio.ensure_future(asyncio.to_thread(self.acquire, tokens, priority))
+        try:
+            await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            self._give_back_when_acquired(waiting, tokens)
+            raise
+        usage["released"] = False
+
+    def stats(self) -> dict:
+        """Profondeur de file, appels en vol et temps d'attente (moyen, maximal)."""
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "in_flight": self.in_flight,
+                "admitted": self._admitted,
+                "avg_wait_seconds": round(self._total_wait / self._admitted, 3) if self._admitted else 0.0,
+                "max_wait_seconds": round(self._max_wait, 3),
+            }
+
+
+# ---------------------------------------------------------------
+# Instance partagée par le process
+# ---------------------------------------------------------------
+
+_LIMITER: RateLimiter | None = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Retourne le limiteur partagé par tous les threads du process."""
+    global _LIMITER
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            _LIMITER = RateLimiter()
+        return _LIMITER
+
+
+def rate_limiter_stats() -> dict:
+    """Compteurs du limiteur partagé."""
+    return get_rate_limiter().stats()
@@ -1,22 +1,128 @@
 """
 retriever.py
-Recherche des passages pertinents dans ChromaDB
+Recherche des passages pertinents dans le backend vectoriel (ChromaDB ou mémoire)
 """
 
 import os
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 import chromadb
 
-from src.embeddings import get_embedding_model, get_chroma_client
+from src.embeddings import (
+    EMBEDDING_MODEL,
+    get_embedding_model,
+    get_collection,
+    session_collection_name
+)
+from src.lexical_index import (
+    get_lexical_index,
+    build_lexical_index,
+    reciprocal_rank_fusion
+)
+from src.vector_store import NumpyCollection
 
 load_dotenv()
 
+# Modes de recherche : vectorielle, BM25, ou fusion des deux (RRF)
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+# En mode hybride, chaque moteur propose n_results * facteur candidats avant fusion
+HYBRID_CANDIDATES_FACTOR = 3
+
+# Questions fixes utilisées par le pipeline (agent.run_pipeline)
+CV_CONTEXT_QUERY = "compétences expériences formation"
+JOB_CONTEXT_QUERY = "compétences requises poste missions"
+PIPELINE_QUERIES = [CV_CONTEXT_QUERY, JOB_CONTEXT_QUERY]
+
+# Cache LRU des vecteurs de questions : (modèle, question) -> vecteur
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+
+_QUERY_CACHE: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+_PINNED_QUERIES: dict[tuple[str, str], list[float]] = {}
+_QUERY_CACHE_LOCK = threading.Lock()
+_QUERY_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def encode_queries(queries: list[str], model_name: str = EMBEDDING_MODEL) -> list[list[float]]:
+    """
+    Vectorise des questions en passant par le cache LRU.
+    Seules les questions jamais vues (ou évincées) sont envoyées au modèle, en un batch.
+    """
+    vectors: list[list[float] | None] = [None] * len(queries)
+
+    with _QUERY_CACHE_LOCK:
+        for i, query in enumerate(queries):
+            key = (model_name, query)
+            if key in _PINNED_QUERIES:
+                vectors[i] = _PINNED_QUERIES[key]
+            elif key in _QUERY_CACHE:
+                _QUERY_CACHE.move_to_end(key)
+                vectors[i] = _QUERY_CACHE[key]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        _QUERY_CACHE_STATS["hits"] += len(queries) - len(missing)
+        _QUERY_CACHE_STATS["misses"] += len(missing)
+
+    if missing:
+        unique = list(dict.fromkeys(queries[i] for i in missing))
+        model = get_embedding_model(model_name)
+        encoded = dict(zip(unique, model.encode(unique).tolist()))
+
+        with _QUERY_CACHE_LOCK:
+            for query, vector in encoded.items():
+                _QUERY_CACHE[(model_name, query)] = vector
+                _QUERY_CACHE.move_to_end((model_name, query))
+            while len(_QUERY_CACHE) > QUERY_CACHE_SIZE:
+                _QUERY_CACHE.popitem(last=False)
+
+        for i in missing:
+            vectors[i] = encoded[queries[i]]
+
+    return vectors
+
+
+def precompute_query_embeddings(
+    queries: list[str] = PIPELINE_QUERIES,
+    model_name: str = EMBEDDING_MODEL
+) -> None:
+    """
+    Vectorise à l'avance des questions fixes et les épingle dans le cache
+    (jamais évincées). Appelé au démarrage pour les questions du pipeline.
+    """
+    model = get_embedding_model(model_name)
+    vectors = model.encode(list(queries)).tolist()
+    with _QUERY_CACHE_LOCK:
+        for query, vector in zip(queries, vectors):
+            _PINNED_QUERIES[(model_name, query)] = vector
+    print(f"📌 {len(queries)} questions pré-vectorisées")
+
+
+def query_cache_stats() -> dict:
+    """Compteurs du cache de questions."""
+    with _QUERY_CACHE_LOCK:
+        return {
+            **_QUERY_CACHE_STATS,
+            "entries": len(_QUERY_CACHE),
+            "pinned": len(_PINNED_QUERIES),
+            "max_entries": QUERY_CACHE_SIZE,
+        }
+
+
+def clear_query_cache() -> None:
+    """Vide le cache de questions (entrées épinglées comprises)."""
+    with _QUERY_CACHE_LOCK:
+        _QUERY_CACHE.clear()
+        _PINNED_QUERIES.clear()
+        _QUERY_CACHE_STATS.update(hits=0, misses=0)
+
 
 def retrieve(
     query: str,
     collection_name: str,
-    n_results: int = 3
+    n_results: int = 3,
+    session_id: str | None = None,
+    mode: str = "dense"
 ) -> list[dict]:
     """
     Recherche les passages les plus pertinents pour une question.
@@ -25,44 +131,142 @@ def retrieve(
         query: La question posée par l'utilisateur
         collection_name: La collection ChromaDB où chercher
         n_results: Nombre de passages à retourner
+        session_id: Session propriétaire de la collection (voir embed_and_store)
+        mode: "dense" (embeddings), "lexical" (BM25, sans modèle)
+              ou "hybrid" (fusion RRF des deux)
 
     Returns:
         Liste de dicts avec 'text', 'score', 'metadata'
     """
-    model = get_embedding_model()
-    client = get_chroma_client()
+    return retrieve_many([query], collection_name, n_results, session_id, mode)[0]
 
-    # Vérifie que la collection existe
-    existing = [col.name for col in client.list_collections()]
-    if collection_name not in existing:
-        raise ValueError(f"Collection introuvable : '{collection_name}'. "
-                         f"Collections disponibles : {existing}")
 
-    collection = client.get_collection(name=collection_name)
+def retrieve_many(
+    queries: list[str],
+    collection_names: str | list[str],
+    n_results: int = 3,
+    session_id: str | None = None,
+    mode: str = "dense"
+) -> list[list[dict]]:
+    """
+    Recherche groupée : toutes les questions sont vectorisées en un seul batch,
+    et chaque collection n'est interrogée qu'une fois avec tous ses vecteurs.
+
+    Args:
+        queries: Les questions à poser
+        collection_names: Une collection pour toutes les questions,
+                          ou une liste alignée sur `queries`
+        n_results: Nombre de passages à retourner par question
+        session_id: Session propriétaire des collections (voir embed_and_store)
+        mode: "dense", "lexical" ou "hybrid" (voir retrieve)
+
+    Returns:
+        Une liste de passages par question, dans l'ordre de `queries`
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Mode de recherche inconnu : {mode}. Utilisez {', '.join(RETRIEVAL_MODES)}.")
+    if isinstance(collection_names, str):
+        collection_names = [collection_names] * len(queries)
+    if len(collection_names) != len(queries):
+        raise ValueError(f"{len(queries)} questions mais {len(collection_names)} collections")
+    if session_id:
+        collection_names = [session_collection_name(c, session_id) for c in collection_names]
+
+    # Regroupe les questions par collection
+    by_collection: dict[str, list[int]] = {}
+    for i, name in enumerate(collection_names):
+        by_collection.setdefault(name, []).append(i)
+
+    # Vérifie que les collections existent avant de charger le modèle
+    collections = {name: get_collection(name) for name in by_collection}
+
+    n_candidates = n_results if mode != "hybrid" else n_results * HYBRID_CANDIDATES_FACTOR
+
+    # Vectorise toutes les questions en un seul appel (hors cache)
+    query_vectors = encode_queries(queries) if mode != "lexical" else []
+
+    grouped: list[list[dict]] = [[] for _ in queries]
+    for name, indexes in by_collection.items():
+        collection = collections[name]
 
-    # Vectorise la question
-    query_vector = model.encode(query).tolist()
+        dense = {}
+        if mode != "lexical":
+            dense = _dense_search(
+                collection, [query_vectors[i] for i in indexes], n_candidates, indexes
+            )
 
-    # Recherche dans ChromaDB
+        lexical = {}
+        if mode != "dense":
+            index = get_lexical_index(name, collection) or build_lexical_index(
+                collection, persist=not isinstance(collection, NumpyCollection)
+            )
+            lexical = {i: _lexical_search(index, queries[i], n_candidates) for i in indexes}
+
+        for i in indexes:
+            if mode == "dense":
+                grouped[i] = [p for _, p in dense[i]]
+            elif mode == "lexical":
+                grouped[i] = [p for _, p in lexical[i]]
+            else:
+                grouped[i] = _fuse(dense[i], lexical[i], n_results)
+
+    for query, passages in zip(queries, grouped):
+        print(f"🔍 {len(passages)} passages trouvés pour : '{query}'")
+        for i, p in enumerate(passages):
+            print(f"  [{i+1}] Score: {p['score']} | {p['text'][:80]}...")
+
+    return grouped
+
+
+def _dense_search(
+    collection,
+    vectors: list[list[float]],
+    n_results: int,
+    indexes: list[int]
+) -> dict[int, list[tuple[str, dict]]]:
+    """Une seule requête vectorielle pour toutes les questions d'une collection."""
     results = collection.query(
-        query_embeddings=[query_vector],
+        query_embeddings=vectors,
         n_results=min(n_results, collection.count())
     )
+    found = {}
+    for row, i in enumerate(indexes):
+        found[i] = [
+            (results["ids"][row][j], {
+                "text": results["documents"][row][j],
+                "score": round(1 - results["distances"][row][j], 4),  # score de similarité
+                "metadata": results["metadatas"][row][j]
+            })
+            for j in range(len(results["documents"][row]))
+        ]
+    return found
 
-    # Formate les résultats
-    passages = []
-    for i in range(len(results["documents"][0])):
-        passages.append({
-            "text": results["documents"][0][i],
-            "score": round(1 - results["distances"][0][i], 4),  # score de similarité
-            "metadata": results["metadatas"][0][i]
+
+def _lexical_search(index, query: str, n_results: int) -> list[tuple[str, dict]]:
+    """Recherche BM25 ; le score est le score BM25 brut."""
+    return [
+        (index.ids[position], {
+            "text": index.documents[position],
+            "score": round(score, 4),
+            "metadata": index.metadatas[position]
         })
+        for position, score in index.search(query, n_results)
+    ]
 
-    print(f"🔍 {len(passages)} passages trouvés pour : '{query}'")
-    for i, p in enumerate(passages):
-        print(f"  [{i+1}] Score: {p['score']} | {p['text'][:80]}...")
 
-    return passages
+def _fuse(
+    dense: list[tuple[str, dict]],
+    lexical: list[tuple[str, dict]],
+    n_results: int
+) -> list[dict]:
+    """Fusion RRF des deux classements ; le score est le score RRF."""
+    passages = dict(lexical)
+    passages.update(dense)
+    fused = reciprocal_rank_fusion([[id_ for id_, _ in dense], [id_ for id_, _ in lexical]])
+    return [
+        {**passages[id_], "score": round(score, 4)}
+        for id_, score in fused[:n_results]
+    ]
 
 
 def format_context(passages: list[dict]) -> str:
@@ -0,0 +1,164 @@
+"""
+vector_store.py
+Backend vectoriel en mémoire (NumPy) pour les petits documents d'une requête
+
+Expose le même sous-ensemble d'API que le client et les collections ChromaDB
+utilisés par embeddings.py / retriever.py, pour que les deux backends soient
+interchangeables. ChromaDB reste le backend du corpus persistant.
+"""
+
+import threading
+
+import numpy as np
+
+
+class NumpyCollection:
+    """
+    Collection en mémoire : une matrice (n, dim) float32 + documents et métadonnées.
+    La recherche est un produit scalaire brute-force, instantané pour quelques
+    dizaines de morceaux. Les distances renvoyées sont des L2 au carré, comme
+    l'espace par défaut de ChromaDB, pour que les scores restent comparables.
+    """
+
+    def __init__(self, name: str, metadata: dict | None = None):
+        self.name = name
+        self.metadata = metadata
+        self._ids: list[str] = []
+        self._documents: list[str] = []
+        self._metadatas: list[dict] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.RLock()
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def modify(self, metadata: dict | None = None) -> None:
+        if metadata is not None:
+            self.metadata = metadata
+
+    def add(
+        self,
+        ids: list[str],
+        embeddings: list[list[float]],
+        documents: list[str],
+        metadatas: list[dict] | None = None
+    ) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            duplicates = set(ids) & set(self._ids)
+            if duplicates:
+                raise ValueError(f"Identifiants déjà présents : {sorted(duplicates)[:3]}")
+            if self._vectors.size == 0:
+                self._vectors = vectors
+            else:
+                self._vectors = np.vstack([self._vectors, vectors])
+            self._ids.extend(ids)
+            self._documents.extend(documents)
+            self._metadatas.extend(metadatas or [{} for _ in ids])
+
+    def get(self, ids: list[str] | None = None, include: list[str] | None = None) -> dict:
+        with self._lock:
+            if ids is None:
+                positions = range(len(self._ids))
+            else:
+                index = {id_: i for i, id_ in enumerate(self._ids)}
+                positions = [index[id_] for id_ in ids if id_ in index]
+            return {
+                "ids": [self._ids[i] for i in positions],
+                "documents": [self._documents[i] for i in positions],
+                "metadatas": [self._metadatas[i] for i in positions],
+            }
+
+    def update(self, ids: list[str], metadatas: list[dict]) -> None:
+        with self._lock:
+            index = {id_: i for i, id_ in enumerate(self._ids)}
+            for id_, meta in zip(ids, metadatas):
+                if id_ in index:
+                    self._metadatas[index[id_]] = meta
+
+    def delete(self, ids: list[str]) -> None:
+        with self._lock:
+            to_delete = set(ids)
+            keep = [i for i, id_ in enumerate(self._ids) if id_ not in to_delete]
+            self._ids = [self._ids[i] for i in keep]
+            self._documents = [self._documents[i] for i in keep]
+            self._metadatas = [self._metadatas[i] for i in keep]
+            self._vectors = self._vectors[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+    def query(self, query_embeddings: list[list[float]], n_results: int = 10) -> dict:
+        """Recherche des n plus proches voisins pour chaque vecteur requête."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        with self._lock:
+            if not self._ids:
+                empty = [[] for _ in range(len(queries))]
+                return {"ids": empty, "documents": empty, "metadatas": empty, "distances": empty}
+
+            # ||q - x||² = ||q||² + ||x||² - 2 q·x
+            distances = (
+                (queries ** 2).sum(axis=1, keepdims=True)
+                + (self._vectors ** 2).sum(axis=1)
+                - 2 * queries @ self._vectors.T
+            )
+            k = min(n_results, len(self._ids))
+            top = np.argsort(distances, axis=1)[:, :k]
+
+            return {
+                "ids": [[self._ids[i] for i in row] for row in top],
+                "documents": [[self._documents[i] for i in row] for row in top],
+                "metadatas": [[self._metadatas[i] for i in row] for row in top],
+                "distances": [
+                    [float(max(distances[q, i], 0.0)) for i in row]
+                    for q, row in enumerate(top)
+                ],
+            }
+
+
+class NumpyVectorStore:
+    """
+    Équivalent en mémoire de chromadb.PersistentClient (création, lecture,
+    suppression de collections). Les données vivent le temps du process.
+    """
+
+    def __init__(self):
+        self._collections: dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def has_collection(self, name: str) -> bool:
+        return name in self._collections
+
+    def create_collection(self, name: str, metadata: dict | None = None) -> NumpyCollection:
+        with self._lock:
+            if name in self._collections:
+                raise ValueError(f"Collection déjà existante : '{name}'")
+            collection = NumpyCollection(name, metadata)
+            self._collections[name] = collection
+            return collection
+
+    def get_or_create_collection(self, name: str, metadata: dict | None = None) -> NumpyCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NumpyCollection(name, metadata)
+            return self._collections[name]
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        try:
+            return self._collections[name]
+        except KeyError:
+            raise ValueError(f"Collection introuvable : '{name}'")
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            if self._collections.pop(name, None) is None:
+                raise ValueError(f"Collection introuvable : '{name}'")
+
+    def list_collections(self) -> list[NumpyCollection]:
+        return list(self._collections.values())
+
+
+# Instance partagée par le process
+_NUMPY_STORE = NumpyVectorStore()
+
+
+def get_numpy_store() -> NumpyVectorStore:
+    """Retourne le store en mémoire partagé par le process."""
+    return _NUMPY_STORE
@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from src.agent import (
     tool_detect_bias,
     tool_retrieve_context,
+    tool_retrieve_contexts,
     FairHireResult,
     run_pipeline
 )
@@ -57,4 +58,65 @@ def test_tool_retrieve_context_mocked():
         mock_format.return_value = "Python dev"
 
         context = tool_retrieve_context("compétences", "cv_current")
-        assert context == "Python dev"
\ No newline at end of file
+        assert context == "Python dev"
+
+
+def test_tool_retrieve_contexts_mocked():
+    """Vérifie la recherche groupée CV + offre en un seul appel"""
+    with patch("src.agent.retrieve_many") as mock_retrieve_many:
+        mock_retrieve_many.return_value = [
+            [{"text": "Python dev", "score": 0.9, "metadata": {}}],
+            [{"text": "Poste Data", "score": 0.8, "metadata": {}}],
+        ]
+        cv_passages, job_passages = tool_retrieve_contexts(
+            ["compétences", "missions"], ["cv_current", "job_current"]
+        )
+        assert mock_retrieve_many.call_count == 1
+        assert cv_passages[0]["text"] == "Python dev"
+        assert job_passages[0]["text"] == "Poste Data"
+
+
+def test_run_pipeline_structured_matching():
+    """En mode structuré, le rapport est un MatchingReport mis en forme localement"""
+    from src.matching_report import MatchingReport
+
+    report = MatchingReport(score=8, strengths=["Python"], gaps=["Spark"], recommendation="À recevoir.")
+    passages = [[{"text": "Python dev", "score": 0.9, "metadata": {}}],
+                [{"text": "Poste Data", "score": 0.8, "metadata": {}}]]
+    with patch("src.agent.tool_load_document", return_value=["texte"]), \
+         patch("src.agent.tool_vectorize"), \
+         patch("src.agent.maybe_purge_expired_collections"), \
+         patch("src.agent.delete_session_collections"), \
+         patch("src.agent.retrieve_many", return_value=passages) as mock_retrieve_many, \
+         patch("src.agent.generate_structured_matching_report", return_value=report) as mock_report, \
+         patch("src.agent.generate_matching_report") as mock_markdown:
+        result = run_pipeline("cv.pdf", "offre.pdf", structured=True)
+
+    assert result.status == "success"
+    assert result.matching.score == 8
+    assert "## Score : 8/10" in result.matching_report
+    assert mock_report.call_count == 1
+    assert mock_retrieve_many.call_count == 1
+    mock_markdown.assert_not_called()
+
+
+def test_run_pipeline_packs_context_once():
+    """Les contextes réduits par le pipeline sont transmis au prompt sans second packing"""
+    from src.generator import generate_matching_report
+
+    passages = [[{"text": "Python dev", "score": 0.9, "metadata": {}}],
+                [{"text": "Poste Data", "score": 0.8, "metadata": {}}]]
+    with patch("src.agent.tool_load_document", return_value=["texte"]), \
+         patch("src.agent.tool_vectorize"), \
+         patch("src.agent.maybe_purge_expired_collections"), \
+         patch("src.agent.delete_session_collections"), \
+         patch("src.agent.retrieve_many", return_value=passages), \
+         patch("src.agent.generate_matching_report", side_effect=generate_matching_report), \
+         patch("src.generator.pack_context", side_effect=AssertionError("second packing")), \
+         patch("src.generator.call_llm", return_value="## Score : 7/10") as mock_llm:
+        result = run_pipeline("cv.pdf", "offre.pdf")
+
+    assert result.status == "success", result.error
+    assert result.matching_report == "## Score : 7/10"
+    prompt = mock_llm.call_args[0][0]
+    assert "Python dev" in prompt and "Poste Data" in prompt
@@ -0,0 +1,121 @@
+"""
+Tests unitaires pour bulk_ingest.py
+"""
+
+import pytest
+import os
+import sys
+import json
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.bulk_ingest import bulk_ingest, scan_directory, document_type, _parse_file
+
+
+def _crashing_parse(path, chunk_size, chunk_overlap):
+    """Simule un crash natif (segfault) du process sur un fichier précis"""
+    if path.endswith("crash.txt"):
+        os._exit(1)
+    return _parse_file(path, chunk_size, chunk_overlap)
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    """Dossier avec un PDF, deux TXT (dont un vide) et un fichier ignoré"""
+    import fitz
+
+    root = tmp_path / "corpus"
+    (root / "offres").mkdir(parents=True)
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Data engineer : dbt, Airflow, Snowflake.")
+    doc.save(str(root / "alice.pdf"))
+    doc.close()
+    (root / "bob.txt").write_text("Développeur web React et Node.js.", encoding="utf-8")
+    (root / "offres" / "vide.txt").write_text("   ", encoding="utf-8")
+    (root / "notes.docx").write_bytes(b"ignored")
+    return root
+
+
+@pytest.fixture
+def fake_store():
+    """Remplace l'encodage et le stockage ChromaDB"""
+    stored = {}
+
+    def fake_add(candidate_id, chunks, metadata, collection_name, embeddings):
+        stored[candidate_id] = (chunks, metadata, embeddings, collection_name)
+        return len(chunks)
+
+    with patch("src.bulk_ingest.encode_chunks", side_effect=lambda chunks: [[0.0] * 3 for _ in chunks]), \
+         patch("src.bulk_ingest.add_candidate", side_effect=fake_add):
+        yield stored
+
+
+def test_scan_directory(corpus_dir):
+    """Seuls les PDF et TXT sont retenus, récursivement"""
+    names = [p.relative_to(corpus_dir).as_posix() for p in scan_directory(str(corpus_dir))]
+    assert names == ["alice.pdf", "bob.txt", "offres/vide.txt"]
+
+
+def test_bulk_ingest_logs_errors_without_aborting(corpus_dir, fake_store):
+    """Un fichier en erreur est journalisé en JSONL, les autres sont importés"""
+    report = bulk_ingest(str(corpus_dir), max_workers=1)
+
+    assert report.done == 2
+    assert report.errors == 1
+    assert set(fake_store) == {"alice.pdf", "bob.txt"}
+    assert fake_store["alice.pdf"][1]["doc_hash"]
+
+    with open(corpus_dir / ".ingest_errors.jsonl", encoding="utf-8") as f:
+        errors = [json.loads(line) for line in f]
+    assert errors[0]["path"] == "offres/vide.txt"
+    assert "ValueError" in errors[0]["error"]
+
+
+def test_bulk_ingest_resumes(corpus_dir, fake_store):
+    """Une reprise saute les fichiers terminés et ne retente que les erreurs et les nouveaux"""
+    bulk_ingest(str(corpus_dir), max_workers=1)
+    fake_store.clear()
+
+    (corpus_dir / "chloe.txt").write_text("ML engineer SageMaker MLflow.", encoding="utf-8")
+    report = bulk_ingest(str(corpus_dir), max_workers=1)
+
+    assert report.skipped == 2
+    assert report.done == 1
+    assert report.errors == 1
+    assert set(fake_store) == {"chloe.txt"}
+
+
+def test_document_type():
+    """Les fichiers sous offres/ ou jobs/ sont des offres en mode auto"""
+    assert document_type("alice.pdf") == "cv"
+    assert document_type("offres/data.txt") == "job"
+    assert document_type("2024/Jobs/data.txt") == "job"
+    assert document_type("offres/data.txt", "cv") == "cv"
+    with pytest.raises(ValueError):
+        document_type("alice.pdf", "lettre")
+
+
+def test_bulk_ingest_routes_job_offers(corpus_dir, fake_store):
+    """Les offres vont dans leur collection avec type "job", jamais dans le corpus de candidats"""
+    (corpus_dir / "offres" / "data.txt").write_text("Nous recrutons un data engineer.", encoding="utf-8")
+    bulk_ingest(str(corpus_dir), max_workers=1, collection_name="cvs", job_collection_name="offres")
+
+    assert fake_store["alice.pdf"][1]["type"] == "cv"
+    assert fake_store["alice.pdf"][3] == "cvs"
+    assert fake_store["offres/data.txt"][1]["type"] == "job"
+    assert fake_store["offres/data.txt"][3] == "offres"
+
+
+def test_bulk_ingest_survives_worker_crash(corpus_dir, fake_store):
+    """Seul le fichier qui fait planter son process est en erreur, les autres en vol sont importés"""
+    (corpus_dir / "crash.txt").write_text("Provoque un crash.", encoding="utf-8")
+    with patch("src.bulk_ingest._parse_file", _crashing_parse):
+        report = bulk_ingest(str(corpus_dir), max_workers=2)
+
+    with open(corpus_dir / ".ingest_errors.jsonl", encoding="utf-8") as f:
+        errors = {e["path"]: e["error"] for e in map(json.loads, f)}
+    assert "BrokenProcessPool" in errors["crash.txt"]
+    assert set(errors) == {"crash.txt", "offres/vide.txt"}
+    assert set(fake_store) == {"alice.pdf", "bob.txt"}
+    assert report.done == 2
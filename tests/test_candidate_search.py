@@ -0,0 +1,155 @@
+"""
+Tests unitaires pour candidate_search.py
+"""
+
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.candidate_search import (
+    aggregate_scores,
+    top_k,
+    add_candidate,
+    search_candidates,
+    CandidateMatch
+)
+
+
+def test_aggregate_scores_methods():
+    """Vérifie les trois agrégations de scores de chunks"""
+    scores = [0.9, 0.5, 0.4, 0.2]
+    assert aggregate_scores(scores, "max") == 0.9
+    assert aggregate_scores(scores, "mean") == pytest.approx(0.5)
+    assert aggregate_scores(scores, "top_n", top_n=2) == pytest.approx(0.7)
+    assert aggregate_scores([], "max") == 0.0
+
+
+def test_aggregate_scores_unknown_method():
+    """Vérifie l'erreur sur une agrégation inconnue"""
+    with pytest.raises(ValueError):
+        aggregate_scores([0.5], "median")
+
+
+def test_top_k_streaming():
+    """Vérifie que le tas garde les k meilleurs, triés"""
+    stream = ((float(i % 97), f"cv_{i}") for i in range(10_000))
+    best = top_k(stream, 3)
+    assert [score for score, _ in best] == [96.0, 96.0, 96.0]
+    assert len(top_k(iter([(0.1, "a")]), 5)) == 1
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """Petit corpus de CVs de test"""
+    name = "test_candidate_corpus"
+    add_candidate("alice", ["Data engineer dbt Airflow Snowflake.", "Cinq ans d'expérience."],
+                  {"city": "Paris"}, collection_name=name)
+    add_candidate("bob", ["Développeur web React et Node.js."],
+                  {"city": "Lyon"}, collection_name=name)
+    add_candidate("chloe", ["ML engineer SageMaker MLflow Docker."],
+                  {"city": "Paris"}, collection_name=name)
+    return name
+
+
+def test_search_candidates_ranked(corpus):
+    """Vérifie qu'on obtient des candidats distincts, triés par score"""
+    matches = search_candidates(["Data engineer dbt Airflow Snowflake."], top_k_candidates=3,
+                                collection_name=corpus)
+    assert all(isinstance(m, CandidateMatch) for m in matches)
+    assert len({m.candidate_id for m in matches}) == len(matches) == 3
+    assert matches[0].candidate_id == "alice"
+    assert [m.score for m in matches] == sorted([m.score for m in matches], reverse=True)
+
+
+def test_search_candidates_metadata_filter(corpus):
+    """Vérifie le pré-filtre sur les métadonnées"""
+    matches = search_candidates(["Développeur web"], top_k_candidates=5,
+                                where={"city": "Paris"}, collection_name=corpus)
+    assert {m.candidate_id for m in matches} == {"alice", "chloe"}
+
+
+def test_search_candidates_doc_type_filter():
+    """Vérifie qu'une offre importée dans le corpus est écartée avec doc_type "cv"."""
+    name = "test_candidate_doc_type"
+    add_candidate("alice", ["Data engineer dbt Airflow."], collection_name=name)
+    add_candidate("offre_data", ["Nous recrutons un data engineer dbt Airflow."],
+                  {"type": "job"}, collection_name=name)
+    matches = search_candidates(["Data engineer dbt Airflow."], top_k_candidates=5,
+                                collection_name=name, doc_type="cv")
+    assert [m.candidate_id for m in matches] == ["alice"]
+    assert matches[0].metadata["type"] == "cv"
+
+
+def test_add_candidate_replaces_chunks(corpus):
+    """Vérifie que ré-ajouter un candidat remplace ses anciens chunks"""
+    add_candidate("bob", ["Développeur Python backend."], {"city": "Lyon"}, collection_name=corpus)
+    matches = search_candidates(["Développeur Python backend."], top_k_candidates=3,
+                                where={"city": "Lyon"}, collection_name=corpus)
+    assert matches[0].best_chunk == "Développeur Python backend."
+    assert matches[0].n_matched_chunks == 1
+
+
+def test_add_candidate_invalidates_lexical_index():
+    """Ajouter ou remplacer un CV périme l'index BM25 du corpus"""
+    from unittest.mock import patch
+
+    with patch("src.candidate_search.create_candidate_corpus") as mock_corpus, \
+         patch("src.candidate_search.delete_lexical_index") as mock_delete:
+        add_candidate("alice", ["Data engineer dbt."], collection_name="corpus_bm25",
+                      embeddings=[[0.0, 1.0]])
+        add_candidate("alice", [], collection_name="corpus_bm25")
+
+    assert mock_corpus.return_value.add.call_count == 1
+    assert mock_delete.call_count == 2
+    mock_delete.assert_called_with("corpus_bm25")
+
+
+def test_add_candidate_keeps_corpus_hnsw_params():
+    """Ajouter un candidat ne réinitialise pas les paramètres HNSW du corpus"""
+    from src.candidate_search import create_candidate_corpus
+
+    name = "test_candidate_hnsw"
+    create_candidate_corpus(name, hnsw_m=32, hnsw_ef_search=200)
+    add_candidate("alice", ["Data engineer dbt."], collection_name=name)
+    add_candidate("bob", ["Développeur React."], collection_name=name)
+
+    metadata = create_candidate_corpus(name).metadata
+    assert metadata["hnsw:M"] == 32
+    assert metadata["hnsw:search_ef"] == 200
+
+
+def test_search_candidates_mean_scores_every_chunk():
+    """En agrégation "mean", le score d'un CV ne dépend pas de la taille de la réserve"""
+    name = "test_candidate_rescore"
+    add_candidate("alice", ["Data engineer dbt Airflow Snowflake.", "Passionnée de randonnée."],
+                  collection_name=name)
+    add_candidate("bob", ["Développeur web React et Node.js."], collection_name=name)
+
+    offre = ["Data engineer dbt Airflow Snowflake."]
+    narrow = search_candidates(offre, top_k_candidates=2, aggregation="mean",
+                               chunk_pool=1, collection_name=name)
+    wide = search_candidates(offre, top_k_candidates=2, aggregation="mean",
+                             chunk_pool=10, collection_name=name)
+    assert narrow[0].candidate_id == wide[0].candidate_id == "alice"
+    assert narrow[0].score == pytest.approx(wide[0].score)
+    assert narrow[0].n_matched_chunks == 2
+
+
+def test_rescore_candidates_applies_search_filter():
+    """Le rescoring ne reprend pas les chunks exclus par le filtre de la recherche"""
+    from src.candidate_search import create_candidate_corpus, rescore_candidates
+
+    name = "test_candidate_rescore_filter"
+    add_candidate("alice", ["CV data engineer.", "Note interne."], collection_name=name,
+                  embeddings=[[1.0, 0.0], [0.6, 0.8]])
+    add_candidate("bob", ["Offre data engineer."], {"type": "job"}, collection_name=name,
+                  embeddings=[[1.0, 0.0]])
+    collection = create_candidate_corpus(name)
+    collection.update(ids=["alice_chunk_1"],
+                      metadatas=[{"type": "note", "candidate_id": "alice", "chunk_index": 1}])
+
+    rescored = rescore_candidates(collection, ["alice", "bob"], [[1.0, 0.0]], where={"type": "cv"})
+    assert list(rescored) == ["alice"]
+    assert [doc for _, doc, _ in rescored["alice"]] == ["CV data engineer."]
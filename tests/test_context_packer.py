@@ -0,0 +1,91 @@
+"""
+Tests unitaires pour context_packer.py
+"""
+
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.context_packer import (
+    approx_token_count,
+    pack_context,
+    truncate_to_budget
+)
+
+
+def test_approx_token_count():
+    """Un token par tranche de 4 caractères de mot et par ponctuation"""
+    assert approx_token_count("") == 0
+    assert approx_token_count("Python, Docker.") == 2 + 1 + 2 + 1
+    assert approx_token_count("a b c") == 3
+
+
+def test_pack_context_respects_budget_and_score_order():
+    """Les passages les mieux notés passent en premier, dans le budget"""
+    passages = [
+        {"text": "Cinq ans d'expérience en data engineering.", "score": 0.2},
+        {"text": "Compétences : dbt, Airflow, Snowflake et Python.", "score": 0.9},
+        {"text": "Loisirs : randonnée et photographie. " * 20, "score": 0.1},
+    ]
+    packed = pack_context(passages, 40, count=approx_token_count)
+
+    assert packed.tokens_used <= 40
+    assert packed.text.startswith("[Extrait 1]\nCompétences")
+    assert "Cinq ans" in packed.text
+    assert packed.n_passages + packed.n_dropped == 3
+
+
+def test_pack_context_deduplicates_overlapping_chunks():
+    """Le chevauchement entre deux chunks voisins n'apparaît qu'une fois"""
+    overlap = "déploiement de modèles avec MLflow et Docker"
+    passages = [
+        {"text": f"Data scientist chez Acme, {overlap}", "score": 0.8},
+        {"text": f"{overlap}, monitoring en production.", "score": 0.7},
+        {"text": "Data scientist chez Acme", "score": 0.6},
+    ]
+    packed = pack_context(passages, 500, count=approx_token_count)
+
+    assert packed.text.count(overlap) == 1
+    assert "monitoring en production" in packed.text
+    assert packed.n_passages == 2
+
+
+def test_truncate_to_budget_cuts_at_sentence_end():
+    """Un texte trop long est coupé en fin de phrase, pas au milieu d'un mot"""
+    text = "Première phrase courte. Deuxième phrase un peu plus longue. Troisième phrase."
+    cut = truncate_to_budget(text, 18, count=approx_token_count)
+
+    assert cut == "Première phrase courte. Deuxième phrase un peu plus longue."
+    assert truncate_to_budget(text, 1000, count=approx_token_count) == text
+
+
+def test_pack_context_plain_text():
+    """Un texte brut est simplement coupé au budget"""
+    packed = pack_context("Python. " * 200, 50, count=approx_token_count)
+    assert 0 < packed.tokens_used <= 50
+    assert packed.text.endswith(".")
+
+
+def test_token_counter_loads_tokenizer_only():
+    """Le budget est compté avec le seul tokenizer, sans charger le modèle d'embedding"""
+    from unittest.mock import patch
+    from src.context_packer import CONTEXT_TOKENIZER, count_tokens
+
+    assert CONTEXT_TOKENIZER == "sentence-transformers/all-MiniLM-L6-v2"
+    with patch("src.context_packer._TOKEN_COUNTER", None), \
+         patch("src.ingestion.token_length_function", return_value=lambda text: len(text.split())) as loader, \
+         patch("src.embeddings.get_embedding_model", side_effect=AssertionError("modèle chargé")):
+        assert count_tokens("Python Docker Kubernetes") == 3
+    loader.assert_called_once_with(CONTEXT_TOKENIZER)
+
+
+def test_token_counter_falls_back_to_estimate():
+    """L'estimation n'est utilisée que si aucun tokenizer ne peut être chargé"""
+    from unittest.mock import patch
+    from src.context_packer import get_token_counter
+
+    with patch("src.context_packer._TOKEN_COUNTER", None), \
+         patch("src.ingestion.token_length_function", side_effect=OSError("hors ligne")):
+        assert get_token_counter() is approx_token_count
@@ -0,0 +1,157 @@
+"""
+Tests unitaires pour embedding_cache.py
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache isolé dans un dossier temporaire"""
+    c = EmbeddingCache(path=str(tmp_path), max_entries=3, dtype="float32")
+    yield c
+    c.close()
+
+
+def test_cache_miss_then_hit(cache):
+    """Vérifie qu'un vecteur stocké est retrouvé au second appel"""
+    vectors = np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]], dtype=np.float32)
+    assert cache.get_many("model", ["a", "b"]) == [None, None]
+    cache.put_many("model", ["a", "b"], vectors)
+
+    found = cache.get_many("model", ["b", "a", "c"])
+    assert np.allclose(found[0], vectors[1])
+    assert np.allclose(found[1], vectors[0])
+    assert found[2] is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+    assert stats["entries"] == 2
+
+
+def test_cache_keyed_by_model(cache):
+    """Vérifie que le même texte n'est pas partagé entre deux modèles"""
+    cache.put_many("model_a", ["texte"], np.ones((1, 3)))
+    assert cache.get_many("model_b", ["texte"]) == [None]
+
+
+def test_cache_lru_eviction(cache):
+    """Vérifie que l'entrée la moins récemment utilisée est évincée"""
+    cache.put_many("model", ["a", "b", "c"], np.eye(3))
+    cache.get_many("model", ["a"])  # 'a' redevient récent
+    cache.put_many("model", ["d"], np.ones((1, 3)))
+
+    found = cache.get_many("model", ["a", "b", "c", "d"])
+    assert found[0] is not None
+    assert found[1] is None
+    assert cache.stats()["entries"] == 3
+
+
+def test_cache_persists_on_disk(tmp_path):
+    """Vérifie que le cache survit à la réouverture"""
+    first = EmbeddingCache(path=str(tmp_path), max_entries=10)
+    first.put_many("model", ["persistant"], np.full((1, 4), 0.5))
+    first.close()
+
+    second = EmbeddingCache(path=str(tmp_path), max_entries=10)
+    found = second.get_many("model", ["persistant"])
+    assert np.allclose(found[0], 0.5)
+    second.close()
+
+
+def test_cache_float16_roundtrip(tmp_path):
+    """Vérifie que put_many renvoie les vecteurs tels que stockés"""
+    c = EmbeddingCache(path=str(tmp_path), dtype="float16")
+    vectors = np.array([[0.123456789, 0.987654321]], dtype=np.float32)
+    stored = c.put_many("model", ["x"], vectors)
+    assert np.array_equal(stored[0], c.get_many("model", ["x"])[0])
+    c.close()
+
+
+def test_cache_invalid_dtype(tmp_path):
+    """Vérifie l'erreur sur un dtype non supporté"""
+    with pytest.raises(ValueError):
+        EmbeddingCache(path=str(tmp_path), dtype="int8")
+
+
+def test_cache_invalidated_when_dtype_changes(tmp_path):
+    """Un changement de dtype invalide les entrées au lieu de lire un fichier vide"""
+    first = EmbeddingCache(path=str(tmp_path), dtype="float16")
+    first.put_many("model", ["x"], np.full((1, 4), 0.5))
+    first.close()
+
+    second = EmbeddingCache(path=str(tmp_path), dtype="float32")
+    assert second.get_many("model", ["x"]) == [None]
+    assert second.stats()["misses"] == 1
+
+    second.put_many("model", ["x"], np.full((1, 4), 0.25))
+    assert np.allclose(second.get_many("model", ["x"])[0], 0.25)
+    second.close()
+
+
+def test_cache_shared_between_connections(tmp_path):
+    """Deux instances sur le même dossier (deux process) n'attribuent jamais le même slot"""
+    import threading
+
+    caches = [EmbeddingCache(path=str(tmp_path), max_entries=1000, dtype="float32") for _ in range(2)]
+
+    def writer(index):
+        for batch in range(10):
+            texts = [f"texte {index}-{batch}-{i}" for i in range(5)]
+            vectors = np.array([[index, batch, i] for i in range(5)], dtype=np.float32)
+            caches[index].put_many("model", texts, vectors)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reader = EmbeddingCache(path=str(tmp_path), max_entries=1000, dtype="float32")
+    for index in range(2):
+        for batch in range(10):
+            found = reader.get_many("model", [f"texte {index}-{batch}-{i}" for i in range(5)])
+            assert [list(v) for v in found] == [[index, batch, i] for i in range(5)]
+    for c in [*caches, reader]:
+        c.close()
+
+
+def test_get_many_not_torn_by_concurrent_eviction(tmp_path):
+    """Un slot ne peut pas être évincé et réécrit pendant sa lecture par un autre cache"""
+    import threading
+    import time
+
+    reader = EmbeddingCache(path=str(tmp_path), max_entries=1, dtype="float32")
+    writer = EmbeddingCache(path=str(tmp_path), max_entries=1, dtype="float32")
+    reader.put_many("model", ["a"], np.array([[1.0, 0.0]], dtype=np.float32))
+
+    open_blob = reader._open_blob
+    blob_opened = threading.Event()
+
+    def slow_open_blob(*args, **kwargs):
+        blob = open_blob(*args, **kwargs)
+        blob_opened.set()
+        time.sleep(0.2)  # fenêtre entre la recherche du slot et la lecture du vecteur
+        return blob
+
+    reader._open_blob = slow_open_blob
+    evict = threading.Thread(target=lambda: (
+        blob_opened.wait(5),
+        writer.put_many("model", ["b"], np.array([[0.0, 1.0]], dtype=np.float32))
+    ))
+    evict.start()
+    found = reader.get_many("model", ["a"])
+    evict.join()
+
+    assert np.allclose(found[0], [1.0, 0.0])
+    assert reader.get_many("model", ["a", "b"])[0] is None
+    reader.close()
+    writer.close()
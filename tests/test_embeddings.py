@@ -8,7 +8,19 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.embeddings import get_embedding_model, embed_and_store, list_collections
+from src.embeddings import (
+    get_embedding_model,
+    embed_and_store,
+    list_collections,
+    loaded_models,
+    unload_embedding_model,
+    unload_idle_models,
+    session_collection_name,
+    delete_session_collections,
+    purge_expired_collections,
+    choose_backend
+)
+from src.vector_store import NumpyCollection
 
 
 def test_embedding_model_loads():
@@ -17,6 +29,29 @@ def test_embedding_model_loads():
     assert model is not None
 
 
+def test_embedding_model_is_shared():
+    """Vérifie que le modèle n'est chargé qu'une fois par process"""
+    model_a = get_embedding_model()
+    model_b = get_embedding_model()
+    assert model_a is model_b
+    assert any(m["model_name"] == "all-MiniLM-L6-v2" for m in loaded_models())
+
+
+def test_unload_embedding_model():
+    """Vérifie qu'un modèle déchargé est rechargé au prochain appel"""
+    model_a = get_embedding_model()
+    assert unload_embedding_model() is True
+    assert unload_embedding_model() is False
+    model_b = get_embedding_model()
+    assert model_a is not model_b
+
+
+def test_unload_idle_models_keeps_recent():
+    """Vérifie qu'un modèle récemment utilisé n'est pas déchargé"""
+    get_embedding_model()
+    assert unload_idle_models(idle_seconds=3600) == []
+
+
 def test_embed_single_chunk():
     """Vérifie qu'un texte est bien vectorisé"""
     model = get_embedding_model()
@@ -40,7 +75,138 @@ def test_embed_and_store():
     assert collection.count() == 3
 
 
+def test_embed_and_store_incremental():
+    """Vérifie que le mode incrémental n'ajoute/supprime que les morceaux modifiés"""
+    chunks = [
+        "Compétences Python et machine learning.",
+        "Expérience Docker et déploiement cloud.",
+        "Formation Master en informatique."
+    ]
+    collection = embed_and_store(chunks, "test_incremental", incremental=True)
+    ids_before = set(collection.get()["ids"])
+
+    edited = [chunks[0], chunks[2], "Certification AWS Solutions Architect."]
+    collection = embed_and_store(edited, "test_incremental", incremental=True)
+    stored = collection.get(include=["documents", "metadatas"])
+
+    assert collection.count() == 3
+    assert sorted(stored["documents"]) == sorted(edited)
+    assert len(ids_before & set(stored["ids"])) == 2
+    indexes = {doc: m["chunk_index"] for doc, m in zip(stored["documents"], stored["metadatas"])}
+    assert indexes[chunks[2]] == 1
+
+
 def test_list_collections():
     """Vérifie que les collections sont listables"""
     collections = list_collections()
-    assert isinstance(collections, list)
\ No newline at end of file
+    assert isinstance(collections, list)
+
+
+def test_session_collection_name():
+    """Vérifie que deux sessions n'écrivent pas dans la même collection"""
+    name_a = session_collection_name("cv_current", "session-a")
+    name_b = session_collection_name("cv_current", "session_b")
+    assert name_a != name_b
+    assert name_a == "cv_current_session-a"
+
+
+@pytest.mark.parametrize("session_id", ["session b/!", "", "-abc", "abc_", "x" * 33])
+def test_session_collection_name_rejects_invalid_ids(session_id):
+    """Un identifiant invalide est refusé plutôt que réécrit (pas de collision possible)"""
+    with pytest.raises(ValueError):
+        session_collection_name("cv_current", session_id)
+
+
+def test_purge_is_throttled():
+    """La purge n'est exécutée qu'une fois par intervalle"""
+    from unittest.mock import patch
+    from src import embeddings
+
+    with patch.object(embeddings, "purge_expired_collections", return_value=["x"]) as mock_purge, \
+         patch.object(embeddings, "_LAST_PURGE", 0.0):
+        assert embeddings.maybe_purge_expired_collections(interval_seconds=60) == ["x"]
+        assert embeddings.maybe_purge_expired_collections(interval_seconds=60) == []
+    assert mock_purge.call_count == 1
+
+
+def test_session_collections_cleanup():
+    """Vérifie la suppression et l'expiration des collections de session"""
+    embed_and_store(["Texte de session."], "cv_current", session_id="unit-a")
+    embed_and_store(["Texte de session."], "cv_current", session_id="unit-b")
+    assert session_collection_name("cv_current", "unit-a") in list_collections()
+
+    delete_session_collections("unit-a", ["cv_current"])
+    assert session_collection_name("cv_current", "unit-a") not in list_collections()
+
+    purged = purge_expired_collections(ttl_seconds=0)
+    assert session_collection_name("cv_current", "unit-b") in purged
+    assert "test_unit" in list_collections()
+
+
+def test_choose_backend_auto():
+    """Vérifie que seuls les petits documents de session restent en mémoire"""
+    assert choose_backend(10, session_id="abc") == "numpy"
+    assert choose_backend(10_000, session_id="abc") == "chroma"
+    assert choose_backend(10, session_id=None) == "chroma"
+
+
+def test_embed_and_store_numpy_backend():
+    """Vérifie le stockage et la recherche dans le backend en mémoire"""
+    from src.retriever import retrieve
+
+    chunks = ["Compétences Python.", "Expérience Docker.", "Formation Master."]
+    collection = embed_and_store(chunks, "cv_current", session_id="unit-numpy", backend="numpy")
+    assert isinstance(collection, NumpyCollection)
+    assert collection.count() == 3
+
+    results = retrieve("Python", "cv_current", n_results=2, session_id="unit-numpy")
+    assert len(results) == 2
+    delete_session_collections("unit-numpy", ["cv_current"])
+
+
+def test_lexical_index_rebuilt_lazily_after_store():
+    """Une écriture invalide l'index BM25, reconstruit une seule fois à la recherche"""
+    from unittest.mock import patch
+    from src.lexical_index import get_lexical_index
+    from src.retriever import retrieve
+
+    name = session_collection_name("cv_current", "unit-lexical")
+    fake_vectors = lambda chunks: [[float(i), 1.0] for i in range(len(chunks))]
+    with patch("src.embeddings.encode_chunks", side_effect=fake_vectors):
+        embed_and_store(["Déploiement Kubernetes."], "cv_current",
+                        session_id="unit-lexical", backend="numpy")
+        assert retrieve("Kubernetes", "cv_current", mode="lexical", session_id="unit-lexical")
+
+        embed_and_store(["Déploiement Kubernetes.", "Pipelines dbt."], "cv_current",
+                        incremental=True, session_id="unit-lexical", backend="numpy")
+        assert get_lexical_index(name) is None
+
+    results = retrieve("dbt", "cv_current", mode="lexical", session_id="unit-lexical")
+    assert results[0]["text"] == "Pipelines dbt."
+    assert len(get_lexical_index(name)) == 2
+    delete_session_collections("unit-lexical", ["cv_current"])
+
+
+def test_backend_switch_and_cleanup_cover_both_stores():
+    """Changer de backend supprime l'autre copie ; la fin de session vide les deux stores"""
+    from unittest.mock import patch
+    from src.embeddings import get_chroma_client, get_numpy_store
+
+    name = session_collection_name("cv_current", "unit-switch")
+    chroma_names = lambda: [c.name for c in get_chroma_client().list_collections()]
+    fake_vectors = lambda chunks: [[float(i), 1.0] for i in range(len(chunks))]
+    with patch("src.embeddings.encode_chunks", side_effect=fake_vectors):
+        embed_and_store(["Texte."], "cv_current", session_id="unit-switch", backend="chroma")
+        embed_and_store(["Texte."], "cv_current", session_id="unit-switch", backend="numpy")
+        assert get_numpy_store().has_collection(name)
+        assert name not in chroma_names()
+
+        embed_and_store(["Texte."], "cv_current", session_id="unit-switch", backend="chroma")
+        assert not get_numpy_store().has_collection(name)
+        assert name in chroma_names()
+
+        # Deux copies (ex: écriture concurrente) : la fin de session supprime les deux
+        get_numpy_store().create_collection(name)
+        delete_session_collections("unit-switch", ["cv_current"])
+    assert not get_numpy_store().has_collection(name)
+    assert name not in chroma_names()
@@ -47,4 +47,506 @@ def test_generate_connection_error():
 
     with patch("src.generator.OLLAMA_HOST", "http://localhost:99999"):
         with pytest.raises((ConnectionError, RuntimeError, TimeoutError)):
-            generate("test", "contexte test")
\ No newline at end of file
+            generate("test", "contexte test")
+
+def _response(status, headers=None, body=None):
+    from unittest.mock import MagicMock
+    import requests
+
+    response = MagicMock(status_code=status, headers=headers or {})
+    response.json.return_value = body or {}
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status}")
+    return response
+
+
+def test_post_with_retry_honours_retry_after():
+    """Un 429 est retenté après le délai Retry-After, puis la réponse est renvoyée"""
+    from unittest.mock import patch, MagicMock
+    from src.generator import post_with_retry
+
+    session = MagicMock()
+    session.post.side_effect = [_response(429, {"Retry-After": "2"}), _response(200)]
+    with patch("src.generator.get_http_session", return_value=session), \
+         patch("src.generator.time.sleep") as mock_sleep:
+        response = post_with_retry("http://llm", json={})
+
+    assert response.status_code == 200
+    assert session.post.call_count == 2
+    mock_sleep.assert_called_once_with(2.0)
+
+
+def test_call_mistral_api_releases_slot_during_backoff():
+    """Le limiteur de débit n'est pas occupé pendant l'attente entre deux tentatives"""
+    from unittest.mock import patch, MagicMock
+    from src.generator import call_mistral_api
+    from src.rate_limiter import RateLimiter
+
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**9, max_in_flight=1)
+    session = MagicMock()
+    session.post.side_effect = [
+        _response(503), _response(200, body={"choices": [{"message": {"content": "réponse"}}]})
+    ]
+    in_flight_while_sleeping = []
+    with patch("src.generator.get_http_session", return_value=session), \
+         patch("src.generator.get_rate_limiter", return_value=limiter), \
+         patch("src.generator.time.sleep",
+               side_effect=lambda _: in_flight_while_sleeping.append(limiter.stats()["in_flight"])):
+        assert call_mistral_api("p", max_tokens=10) == "réponse"
+
+    assert in_flight_while_sleeping == [0]
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.stats()["admitted"] == 2
+
+
+def test_post_with_retry_gives_up():
+    """Après max_retries, l'erreur HTTP remonte ; un 400 n'est jamais retenté"""
+    from unittest.mock import patch, MagicMock
+    import requests
+    from src.generator import post_with_retry
+
+    session = MagicMock()
+    session.post.side_effect = [_response(503) for _ in range(3)]
+    with patch("src.generator.get_http_session", return_value=session), \
+         patch("src.generator.time.sleep"):
+        with pytest.raises(requests.exceptions.HTTPError):
+            post_with_retry("http://llm", max_retries=2)
+    assert session.post.call_count == 3
+
+    session.post.side_effect = [_response(400)]
+    session.post.call_count = 0
+    with patch("src.generator.get_http_session", return_value=session):
+        with pytest.raises(requests.exceptions.HTTPError):
+            post_with_retry("http://llm")
+    assert session.post.call_count == 1
+
+
+def test_backoff_delay_is_bounded():
+    """Le backoff exponentiel avec jitter reste sous le plafond"""
+    from src.generator import backoff_delay, parse_retry_after, LLM_BACKOFF_BASE
+
+    assert all(0 <= backoff_delay(1) <= LLM_BACKOFF_BASE * 2 for _ in range(50))
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after(None) is None
+
+
+def test_stream_mistral_api_parses_sse():
+    """Les deltas SSE de Mistral sont produits un à un, jusqu'à [DONE]"""
+    from unittest.mock import patch, MagicMock
+    import json
+    from src.generator import stream_mistral_api
+
+    events = [
+        "data: " + json.dumps({"choices": [{"delta": {"role": "assistant", "content": ""}}]}),
+        "",
+        "data: " + json.dumps({"choices": [{"delta": {"content": "## Score"}}]}),
+        "data: " + json.dumps({"choices": [{"delta": {"content": " : 8/10"}}]}),
+        "data: [DONE]",
+    ]
+    response = MagicMock()
+    response.iter_lines.return_value = iter(events)
+    with patch("src.generator.post_with_retry", return_value=response):
+        assert list(stream_mistral_api("prompt")) == ["## Score", " : 8/10"]
+    response.close.assert_called_once()
+
+
+def test_stream_ollama_parses_ndjson():
+    """Les lignes NDJSON d'Ollama sont produites une à une, jusqu'à done"""
+    from unittest.mock import patch, MagicMock
+    import json
+    from src.generator import stream_ollama, call_ollama
+
+    lines = [json.dumps({"response": "Bon ", "done": False}).encode(),
+             json.dumps({"response": "profil", "done": False}).encode(),
+             json.dumps({"response": "", "done": True}).encode()]
+    response = MagicMock()
+    response.iter_lines.side_effect = lambda: iter(lines)
+    with patch("src.generator.post_with_retry", return_value=response):
+        assert list(stream_ollama("prompt")) == ["Bon ", "profil"]
+        assert call_ollama("prompt") == "Bon profil"
+
+
+def test_stream_llm_caches_complete_generation(tmp_path):
+    """Une génération streamée complète est mise en cache, puis resservie d'un bloc"""
+    from unittest.mock import patch
+    from src.llm_cache import LLMCache
+    from src.generator import stream_llm
+
+    cache = LLMCache(path=str(tmp_path))
+    with patch("src.generator.get_llm_cache", return_value=cache), \
+         patch("src.generator.USE_API", False), \
+         patch("src.generator.stream_ollama", return_value=iter(["Bon ", "profil"])) as mock_stream:
+        assert list(stream_llm("prompt")) == ["Bon ", "profil"]
+        assert list(stream_llm("prompt")) == ["Bon profil"]
+        assert mock_stream.call_count == 1
+    cache.close()
+
+
+def test_agenerate_matching_reports_concurrently():
+    """Les rapports sont générés en parallèle, sans dépasser LLM_MAX_CONCURRENCY"""
+    import asyncio
+    import json
+    import httpx
+    from unittest.mock import patch
+    from src.generator import generate_matching_reports
+
+    in_flight, peak = 0, 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        prompt = json.loads(request.content)["prompt"]
+        return httpx.Response(200, json={"response": f"rapport {prompt.count('dbt')}"})
+
+    clients = {}
+
+    def mock_client():
+        loop = asyncio.get_running_loop()
+        if loop not in clients:
+            clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return clients[loop]
+
+    pairs = [("dbt " * i, "Offre data engineer") for i in range(6)]
+    with patch("src.generator.get_async_client", side_effect=mock_client), \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False), \
+         patch("src.generator.LLM_MAX_CONCURRENCY", 3):
+        reports = generate_matching_reports(pairs)
+
+    assert reports == [f"rapport {i}" for i in range(6)]
+    assert 1 < peak <= 3
+
+
+def test_apost_with_retry_retries_server_errors():
+    """Le client asynchrone retente les 503 comme le client synchrone"""
+    import asyncio
+    import httpx
+    from unittest.mock import patch
+    from src.generator import apost_with_retry
+
+    statuses = iter([503, 200])
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(next(statuses))))
+        with patch("src.generator.get_async_client", return_value=client), \
+             patch("src.generator.asyncio.sleep") as mock_sleep:
+            response = await apost_with_retry("http://llm", json={})
+        await client.aclose()
+        return response, mock_sleep
+
+    response, mock_sleep = asyncio.run(run())
+    assert response.status_code == 200
+    assert mock_sleep.call_count == 1
+
+
+def test_call_llm_coalesces_identical_concurrent_calls():
+    """Des appels identiques simultanés ne déclenchent qu'un appel au backend"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest.mock import patch
+    from src.generator import call_llm
+
+    calls = []
+
+    def slow_ollama(prompt, max_tokens=500, json_mode=False):
+        calls.append(prompt)
+        time.sleep(0.2)
+        return "rapport partagé"
+
+    with patch("src.generator.call_ollama", side_effect=slow_ollama), \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False):
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(lambda _: call_llm("même prompt"), range(5)))
+        other = call_llm("autre prompt")
+
+    assert results == ["rapport partagé"] * 5
+    assert other == "rapport partagé"
+    assert calls == ["même prompt", "autre prompt"]
+
+
+def test_json_mode_requests_are_not_coalesced_with_plain_ones():
+    """Un appel en mode JSON ne partage pas le résultat d'un appel texte de même prompt"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest.mock import patch
+    from src.generator import call_llm
+
+    def slow_ollama(prompt, max_tokens=500, json_mode=False):
+        time.sleep(0.2)
+        return '{"score": 8}' if json_mode else "## Score : 8/10"
+
+    with patch("src.generator.call_ollama", side_effect=slow_ollama) as mock_ollama, \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            plain = pool.submit(call_llm, "même prompt")
+            structured = pool.submit(call_llm, "même prompt", json_mode=True)
+            assert plain.result() == "## Score : 8/10"
+            assert structured.result() == '{"score": 8}'
+
+    assert mock_ollama.call_count == 2
+
+
+def test_call_llm_coalesced_error_reaches_all_waiters():
+    """Une erreur du backend est relevée chez tous les appelants en attente"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest.mock import patch
+    from src.generator import call_llm, singleflight_stats
+
+    def failing_ollama(prompt, max_tokens=500, json_mode=False):
+        time.sleep(0.2)
+        raise RuntimeError("Ollama indisponible")
+
+    def call(_):
+        try:
+            call_llm("prompt en échec")
+        except RuntimeError as e:
+            return str(e)
+
+    with patch("src.generator.call_ollama", side_effect=failing_ollama) as mock_ollama, \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            errors = list(pool.map(call, range(4)))
+
+    assert errors == ["Ollama indisponible"] * 4
+    assert mock_ollama.call_count == 1
+    assert singleflight_stats()["in_flight"] == 0
+
+
+def test_coalesced_waiters_outlast_backend_read_timeout():
+    """Un suiveur attend le meneur au-delà du timeout de lecture (file d'attente, retries)"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest.mock import patch
+    from src.generator import call_llm
+
+    def queued_ollama(prompt, max_tokens=500, json_mode=False):
+        time.sleep(0.3)  # attente du limiteur + une nouvelle tentative
+        return "rapport partagé"
+
+    with patch("src.generator.call_ollama", side_effect=queued_ollama) as mock_ollama, \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False), \
+         patch("src.generator.LLM_CONNECT_TIMEOUT", 0.05), \
+         patch("src.generator.OLLAMA_READ_TIMEOUT", 0.05):
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(lambda _: call_llm("prompt lent"), range(3)))
+
+    assert results == ["rapport partagé"] * 3
+    assert mock_ollama.call_count == 1
+
+
+def test_stream_llm_follower_survives_leader_abandon():
+    """Le consommateur du meneur s'arrête au premier token : le suiveur reçoit la réponse complète"""
+    import time
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest.mock import patch
+    from src.generator import stream_llm, singleflight_stats
+
+    follower_joined = threading.Event()
+
+    def slow_stream(prompt, max_tokens=500):
+        yield "Bon "
+        follower_joined.wait(5)
+        yield "profil"
+
+    def follow():
+        tokens = stream_llm("prompt partagé")
+        first = next(tokens)  # rejoint l'appel en vol
+        return first + "".join(tokens)
+
+    with patch("src.generator.stream_ollama", side_effect=slow_stream) as mock_stream, \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False):
+        leader = stream_llm("prompt partagé")
+        assert next(leader) == "Bon "
+        leader.close()
+        coalesced = singleflight_stats()["coalesced"]
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(follow)
+            while singleflight_stats()["coalesced"] == coalesced:
+                time.sleep(0.01)
+            follower_joined.set()
+            assert future.result(timeout=5) == "Bon profil"
+
+    assert mock_stream.call_count == 1
+
+
+def test_follower_calls_backend_when_leader_never_lands():
+    """Un meneur qui ne publie jamais rien ne bloque pas ses suiveurs au-delà de LLM_FLIGHT_WAIT"""
+    from unittest.mock import patch
+    from src.generator import call_llm, _join_flight, _request_key, _land_flight
+
+    with patch("src.generator.call_ollama", return_value="rapport") as mock_ollama, \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False), \
+         patch("src.generator.LLM_FLIGHT_WAIT", 0.05):
+        key = _request_key("prompt abandonné", 500)
+        flight, leader = _join_flight(key)
+        assert leader
+        try:
+            assert call_llm("prompt abandonné") == "rapport"
+        finally:
+            _land_flight(key, flight, error=RuntimeError("abandon"))
+
+    assert mock_ollama.call_count == 1
+
+
+def test_acall_llm_coalesces_identical_calls():
+    """Le client asynchrone coalesce aussi les prompts identiques"""
+    import asyncio
+    from unittest.mock import patch
+    from src.generator import acall_llm
+
+    calls = []
+
+    async def slow_ollama(prompt, max_tokens=500, json_mode=False):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"réponse à {prompt}"
+
+    async def run():
+        return await asyncio.gather(*(acall_llm(p) for p in ["a", "a", "b", "a"]))
+
+    with patch("src.generator.acall_ollama", side_effect=slow_ollama), \
+         patch("src.generator.get_llm_cache", return_value=None), \
+         patch("src.generator.USE_API", False):
+        results = asyncio.run(run())
+
+    assert results == ["réponse à a", "réponse à a", "réponse à b", "réponse à a"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_call_mistral_api_goes_through_rate_limiter():
+    """Les appels Mistral réservent une place et déclarent l'usage réel"""
+    from unittest.mock import MagicMock, patch
+    from src.generator import call_mistral_api
+    from src.rate_limiter import RateLimiter
+
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**6, max_in_flight=1)
+    response = MagicMock()
+    response.json.return_value = {
+        "choices": [{"message": {"content": " rapport "}}],
+        "usage": {"total_tokens": 42}
+    }
+    with patch("src.generator.get_rate_limiter", return_value=limiter), \
+         patch("src.generator._mistral_request", return_value=response):
+        assert call_mistral_api("prompt", max_tokens=100) == "rapport"
+
+    stats = limiter.stats()
+    assert stats["admitted"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_prompts_share_a_stable_prefix():
+    """Tous les modes commencent par le même préfixe : Ollama réutilise son cache KV"""
+    from src.generator import build_matching_prompt, build_matching_json_prompt, PROMPT_HEAD
+
+    prompts = [build_prompt("Question ?", f"Contexte {mode}", mode=mode)
+               for mode in ("general", "matching", "bias")]
+    prompts.append(build_matching_json_prompt("CV data engineer", "Offre data engineer"))
+    prompts.append(build_matching_prompt("CV data engineer", "Offre data engineer"))
+
+    assert all(prompt.startswith(PROMPT_HEAD) for prompt in prompts)
+    assert all(prompt.endswith("[/INST]") for prompt in prompts)
+    assert "expert en diversité et inclusion" in prompts[2]
+    # La partie variable arrive après les consignes de format
+    matching = prompts[-1]
+    assert matching.index("## Score") < matching.index("CV data engineer")
+
+
+def test_warmup_ollama_loads_model_with_keep_alive():
+    """Le préchargement envoie le préfixe commun avec keep_alive, et ne fait rien avec l'API"""
+    from unittest.mock import patch
+    from src.generator import warmup_ollama, PROMPT_HEAD
+
+    with patch("src.generator.post_with_retry") as mock_post, \
+         patch("src.generator.USE_API", False), \
+         patch("src.generator.OLLAMA_KEEP_ALIVE", "1h"):
+        assert warmup_ollama() is True
+    payload = mock_post.call_args.kwargs["json"]
+    assert payload["keep_alive"] == "1h"
+    assert payload["prompt"] == PROMPT_HEAD
+
+    with patch("src.generator.post_with_retry") as mock_post, \
+         patch("src.generator.USE_API", True):
+        assert warmup_ollama() is False
+    mock_post.assert_not_called()
+
+    import requests
+    with patch("src.generator.post_with_retry", side_effect=requests.exceptions.ConnectionError()), \
+         patch("src.generator.USE_API", False):
+        assert warmup_ollama() is False
+
+
+def test_structured_matching_report_regenerates_invalid_json():
+    """Le mode structuré demande du JSON au backend et régénère une réponse non conforme"""
+    from unittest.mock import patch
+    from src.generator import generate_structured_matching_report
+    from src.matching_report import MATCHING_JSON_MAX_TOKENS
+
+    answers = iter([
+        "Score : 8/10, bon profil",
+        '{"score": 8, "strengths": ["Python"], "gaps": ["Spark"], "recommendation": "Oui."}',
+    ])
+    with patch("src.generator.call_llm", side_effect=lambda *a, **k: next(answers)) as mock_llm:
+        report = generate_structured_matching_report("CV data engineer", "Offre data engineer")
+
+    assert report.score == 8
+    assert mock_llm.call_count == 2
+    first, retry = mock_llm.call_args_list
+    assert first.kwargs == {"max_tokens": MATCHING_JSON_MAX_TOKENS, "use_cache": True, "json_mode": True}
+    assert retry.kwargs["use_cache"] is False
+
+
+def test_json_mode_reaches_backend_payloads():
+    """json_mode active le format JSON d'Ollama et le response_format de Mistral"""
+    from unittest.mock import patch, MagicMock
+    from src.generator import _ollama_payload, call_mistral_api
+    from src.rate_limiter import RateLimiter
+
+    assert _ollama_payload("p", 10, stream=False, json_mode=True)["format"] == "json"
+    assert "format" not in _ollama_payload("p", 10, stream=False)
+
+    response = MagicMock()
+    response.json.return_value = {"choices": [{"message": {"content": "{}"}}]}
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**6)
+    with patch("src.generator.post_with_retry", return_value=response) as mock_post, \
+         patch("src.generator.get_rate_limiter", return_value=limiter):
+        call_mistral_api("p", max_tokens=10, json_mode=True)
+    assert mock_post.call_args.kwargs["json"]["response_format"] == {"type": "json_object"}
+
+
+def test_asingleflight_error_after_callers_cancelled_is_not_reported():
+    """Si tous les appelants sont annulés, l'échec de l'appel partagé n'est pas signalé comme ignoré"""
+    import asyncio
+    import gc
+    from src.generator import asingleflight
+
+    reported = []
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ConnectionError("backend indisponible")
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda _, context: reported.append(context))
+        callers = [asyncio.ensure_future(asingleflight(("cle-annulee",), failing)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.1)  # l'appel partagé échoue sans personne pour l'attendre
+        gc.collect()
+
+    asyncio.run(run())
+    assert not [c for c in reported if "never retrieved" in c.get("message", "")]
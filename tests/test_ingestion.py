@@ -8,7 +8,30 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.ingestion import load_pdf, split_text, load_and_split
+from src.ingestion import (
+    load_pdf,
+    split_text,
+    load_and_split,
+    iter_pdf_pages,
+    iter_chunks,
+    load_pdfs_parallel,
+    detect_content_type
+)
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    """PDF de 3 pages généré à la volée"""
+    import fitz
+
+    path = tmp_path / "cv_test.pdf"
+    doc = fitz.open()
+    for i in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Expérience {i} : Python, Docker et AWS.")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
 
 
 def test_split_text_basic():
@@ -35,4 +58,157 @@ def test_load_pdf_file_not_found():
 def test_load_pdf_wrong_extension():
     """Vérifie que l'erreur est levée si ce n'est pas un PDF"""
     with pytest.raises(ValueError):
-        load_pdf("document.txt")
\ No newline at end of file
+        load_pdf("document.txt")
+
+
+def test_iter_pdf_pages(sample_pdf):
+    """Vérifie que le PDF est lu page par page"""
+    pages = list(iter_pdf_pages(sample_pdf))
+    assert len(pages) == 3
+    assert "--- Page 2 ---" in pages[1]
+    assert load_pdf(sample_pdf) == "".join(pages)
+
+
+def test_iter_chunks_is_lazy():
+    """Vérifie que les premiers morceaux sortent avant la fin du flux"""
+    consumed = []
+
+    def pages():
+        for i in range(100):
+            consumed.append(i)
+            yield f"Page {i}. " + "Python Docker AWS. " * 40
+
+    stream = iter_chunks(pages(), chunk_size=200, chunk_overlap=20)
+    first = next(stream)
+    assert len(first) <= 200
+    assert len(consumed) < 100
+
+
+def test_iter_chunks_matches_split_text():
+    """Le découpage en flux donne exactement les morceaux de split_text sur le texte complet"""
+    pages = [
+        f"\n--- Page {i + 1} ---\n" + f"Paragraphe {i}. " + "Compétences en machine learning. " * 20
+        + ("\n\n" if i == 3 else "")
+        for i in range(5)
+    ]
+    streamed = list(iter_chunks(pages, chunk_size=150, chunk_overlap=40))
+    assert streamed == split_text("".join(pages), chunk_size=150, chunk_overlap=40)
+    assert sum("--- Page 2 ---" in c for c in streamed) == 1
+
+
+def test_iter_chunks_matches_split_text_fuzz():
+    """Flux et texte complet coïncident quel que soit le découpage en pages"""
+    import random
+
+    rng = random.Random(0)
+    tokens = ["Python", "dbt", " ", ".", "\n", "\n\n", "\n--- Page 2 ---\n"]
+    for _ in range(300):
+        text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 200)))
+        cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, 8)))
+        pages = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        chunk_size = rng.randint(10, 80)
+        chunk_overlap = rng.randint(0, chunk_size // 2)
+        assert list(iter_chunks(pages, chunk_size, chunk_overlap)) == \
+            split_text(text, chunk_size, chunk_overlap)
+
+
+def test_load_and_split_pdf(sample_pdf):
+    """Vérifie le pipeline complet sur un vrai PDF"""
+    chunks = load_and_split(sample_pdf, chunk_size=100, chunk_overlap=10)
+    assert len(chunks) >= 1
+    assert any("Docker" in c for c in chunks)
+
+
+def test_load_pdfs_parallel_preserves_order(sample_pdf, tmp_path):
+    """Vérifie que l'extraction parallèle rend le même texte, dans l'ordre"""
+    import fitz
+
+    other = tmp_path / "offre_test.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Offre Data Engineer.")
+    doc.save(str(other))
+    doc.close()
+
+    texts = load_pdfs_parallel([sample_pdf, str(other)], max_workers=2, pages_per_task=1)
+    assert texts[0] == load_pdf(sample_pdf)
+    assert "Offre Data Engineer" in texts[1]
+
+
+def test_load_pdfs_parallel_return_exceptions(sample_pdf):
+    """Vérifie qu'un fichier manquant n'interrompt pas tout le lot"""
+    texts = load_pdfs_parallel([sample_pdf, "absent.pdf"], max_workers=1, return_exceptions=True)
+    assert isinstance(texts[0], str)
+    assert isinstance(texts[1], FileNotFoundError)
+
+    with pytest.raises(FileNotFoundError):
+        load_pdfs_parallel(["absent.pdf"], max_workers=1)
+
+
+def test_load_and_split_from_bytes(sample_pdf):
+    """Un PDF en mémoire (bytes, memoryview, BytesIO) donne les mêmes chunks que son chemin"""
+    import io
+
+    with open(sample_pdf, "rb") as f:
+        data = f.read()
+
+    expected = load_and_split(sample_pdf)
+    assert load_and_split(data) == expected
+    assert load_and_split(memoryview(data)) == expected
+    assert load_and_split(io.BytesIO(data)) == expected
+
+
+def test_load_and_split_dispatches_on_content(sample_pdf, tmp_path):
+    """Le format est détecté d'après le contenu, pas d'après l'extension"""
+    import io
+
+    renamed = tmp_path / "upload.bin"
+    renamed.write_bytes(open(sample_pdf, "rb").read())
+    assert detect_content_type(renamed.read_bytes()) == "pdf"
+    assert "Docker" in " ".join(load_and_split(str(renamed)))
+
+    pasted = "Nous recherchons un data engineer maîtrisant dbt et Airflow."
+    assert detect_content_type(pasted.encode("utf-8")) == "text"
+    assert load_and_split(io.StringIO(pasted)) == [pasted]
+    assert load_and_split(pasted.encode("utf-8")) == [pasted]
+
+
+def test_load_and_split_unsupported_bytes():
+    """Des octets qui ne sont ni un PDF ni du texte UTF-8 sont refusés"""
+    with pytest.raises(ValueError):
+        load_and_split(b"\xff\xfe\x00\x81binaire")
+
+
+def _langchain_split(text, chunk_size, chunk_overlap, length_function=len):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from src.ingestion import SEPARATORS
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS,
+        length_function=length_function
+    ).split_text(text)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(512, 50), (100, 20), (40, 0), (25, 24)])
+def test_split_text_matches_langchain(chunk_size, chunk_overlap):
+    """Le découpage natif produit exactement les chunks de LangChain"""
+    import random
+
+    rng = random.Random(chunk_size * 1000 + chunk_overlap)
+    words = ["Python", "Docker", "AWS", "CI/CD", "machine", "learning", "équipe",
+             "data-engineer", "x" * 60, "", "Paris."]
+    glue = [" ", " ", " ", "  ", ".", ". ", "\n", "\n\n", "\n \n"]
+    for _ in range(30):
+        text = "".join(rng.choice(words) + rng.choice(glue) for _ in range(rng.randint(0, 300)))
+        assert split_text(text, chunk_size, chunk_overlap) == _langchain_split(text, chunk_size, chunk_overlap)
+
+
+def test_split_text_token_length_matches_langchain():
+    """Avec une fonction de longueur en tokens, le chunk_size est compté en tokens"""
+    text = "Data engineer. " * 40 + "\n\n" + "Airflow dbt Snowflake " * 60
+    n_words = lambda s: len(s.split())
+
+    chunks = split_text(text, 30, 5, length_function=n_words)
+    assert chunks == _langchain_split(text, 30, 5, n_words)
+    assert all(n_words(c) <= 30 for c in chunks)
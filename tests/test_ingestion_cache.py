@@ -0,0 +1,113 @@
+"""
+Tests unitaires pour ingestion_cache.py
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ingestion_cache import IngestionCache, ParsedDocument, document_hash
+from src.ingestion import ingest_document
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache isolé dans un dossier temporaire"""
+    c = IngestionCache(path=str(tmp_path))
+    yield c
+    c.close()
+
+
+def test_cache_miss_then_hit(cache):
+    """Vérifie qu'un document stocké est retrouvé avec ses chunks"""
+    doc = ParsedDocument(document_hash(b"cv"), "Python et Docker", 1, ["Python", "Docker"])
+    assert cache.get(doc.doc_hash, 512, 50) is None
+    cache.put(doc, 512, 50)
+
+    found = cache.get(doc.doc_hash, 512, 50)
+    assert found.chunks == ["Python", "Docker"]
+    assert found.n_pages == 1
+    assert found.from_cache
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["documents"] == 1
+
+
+def test_cache_keyed_by_chunking_params(cache):
+    """Le même document découpé autrement est une autre entrée"""
+    doc = ParsedDocument(document_hash(b"cv"), "texte", 1, ["texte"])
+    cache.put(doc, 512, 50)
+    assert cache.get(doc.doc_hash, 256, 50) is None
+    assert cache.get(doc.doc_hash, 512, 0) is None
+
+
+def test_cache_evicts_least_recent(tmp_path):
+    """Au-delà du plafond, le document le moins récemment lu est évincé"""
+    cache = IngestionCache(path=str(tmp_path), max_mb=2500 / (1024 * 1024))
+    docs = [ParsedDocument(f"h{i}", "x" * 500, 1, ["x" * 500]) for i in range(3)]
+    cache.put(docs[0], 512, 50)
+    cache.put(docs[1], 512, 50)
+    cache.get("h0", 512, 50)
+    cache.put(docs[2], 512, 50)
+
+    assert cache.get("h0", 512, 50) is not None
+    assert cache.get("h1", 512, 50) is None
+    assert cache.get("h2", 512, 50) is not None
+    cache.close()
+
+
+def test_ingest_document_reuses_parsed_result(cache):
+    """Un document déjà vu n'est ni relu ni redécoupé"""
+    data = "Nous recherchons un data engineer maîtrisant dbt et Airflow.".encode("utf-8")
+    with patch("src.ingestion.get_ingestion_cache", return_value=cache):
+        first = ingest_document(data)
+        with patch("src.ingestion.iter_chunks") as mock_chunks:
+            second = ingest_document(bytearray(data))
+            mock_chunks.assert_not_called()
+
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.chunks == first.chunks
+    assert second.doc_hash == document_hash(data)
+
+
+def test_ingest_document_streams_files_from_disk(cache, tmp_path):
+    """Un fichier est haché par blocs et lu page par page, sans être chargé en entier"""
+    from pathlib import Path
+    from src.ingestion_cache import file_hash
+
+    path = tmp_path / "offre.txt"
+    text = "Poste de data engineer à Paris. " * 200
+    path.write_text(text, encoding="utf-8")
+    assert file_hash(path, block_size=64) == document_hash(text.encode("utf-8"))
+
+    with patch("src.ingestion.get_ingestion_cache", return_value=cache), \
+         patch.object(Path, "read_bytes", side_effect=AssertionError("lecture complète")):
+        first = ingest_document(str(path))
+        second = ingest_document(str(path))
+
+    assert first.text == text
+    assert first.n_pages == 1
+    assert second.from_cache
+    assert second.doc_hash == first.doc_hash
+
+
+def test_ingest_document_drops_text_of_large_documents(cache):
+    """Au-delà du seuil, le texte brut n'est pas conservé mais les chunks le sont"""
+    data = ("Expérience en Python et SQL. " * 50).encode("utf-8")
+
+    with patch("src.ingestion.get_ingestion_cache", return_value=cache), \
+         patch("src.ingestion.INGESTION_TEXT_MAX_CHARS", 100):
+        first = ingest_document(data)
+        second = ingest_document(data)
+
+    assert first.text == ""
+    assert first.n_pages == 1
+    assert first.chunks
+    assert second.from_cache
+    assert second.chunks == first.chunks
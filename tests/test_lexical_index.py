@@ -0,0 +1,120 @@
+"""
+Tests unitaires pour lexical_index.py
+"""
+
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexical_index import (
+    tokenize,
+    BM25Index,
+    reciprocal_rank_fusion,
+    build_lexical_index,
+    get_lexical_index,
+    delete_lexical_index
+)
+from src.vector_store import NumpyCollection
+
+
+def test_tokenize_keeps_technical_terms():
+    """Vérifie que les termes techniques composés restent entiers"""
+    tokens = tokenize("Pipelines CI/CD, scikit-learn et C++ sur SageMaker.")
+    assert "ci/cd" in tokens
+    assert "scikit-learn" in tokens
+    assert "c++" in tokens
+    assert "sagemaker" in tokens
+
+
+def test_bm25_exact_term_first():
+    """Vérifie qu'un terme rare et exact remonte le bon document"""
+    index = BM25Index(
+        ids=["a", "b", "c"],
+        documents=[
+            "Expérience en data engineering avec dbt et Snowflake.",
+            "Expérience en data science avec Python.",
+            "Expérience en développement web.",
+        ]
+    )
+    results = index.search("dbt", n_results=3)
+    assert len(results) == 1
+    assert index.ids[results[0][0]] == "a"
+
+
+def test_bm25_no_match():
+    """Vérifie qu'une question sans terme connu ne renvoie rien"""
+    index = BM25Index(ids=["a"], documents=["Python et Docker."])
+    assert index.search("kubernetes") == []
+
+
+def test_reciprocal_rank_fusion():
+    """Vérifie qu'un document bien classé par les deux moteurs passe devant"""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a", "d"]])
+    ids = [id_ for id_, _ in fused]
+    assert set(ids[:2]) == {"a", "b"}
+    assert ids.index("c") > 1 and ids.index("d") > 1
+
+
+def test_build_and_delete_index():
+    """Vérifie la construction d'un index depuis une collection en mémoire"""
+    collection = NumpyCollection("test_lexical_numpy")
+    collection.add(
+        ids=["x"], embeddings=[[0.0, 1.0]], documents=["Déploiement sur Kubernetes."]
+    )
+    build_lexical_index(collection, persist=False)
+    assert len(get_lexical_index("test_lexical_numpy")) == 1
+
+    delete_lexical_index("test_lexical_numpy")
+    assert get_lexical_index("test_lexical_numpy") is None
+
+
+def test_index_rejected_after_write_elsewhere(tmp_path):
+    """Un index dont le jeton d'écriture ou le nombre de documents a changé est reconstruit"""
+    from unittest.mock import patch
+
+    collection = NumpyCollection("test_lexical_fingerprint")
+    collection.add(ids=["x"], embeddings=[[0.0, 1.0]], documents=["Python et Docker."])
+    with patch("src.lexical_index.LEXICAL_INDEX_PATH", str(tmp_path)):
+        delete_lexical_index(collection.name)
+        build_lexical_index(collection, persist=True)
+        assert get_lexical_index(collection.name, collection) is not None
+
+        # Écriture sans invalidation : le nombre de documents ne correspond plus
+        collection.add(ids=["y"], embeddings=[[1.0, 0.0]], documents=["Kubernetes."])
+        assert get_lexical_index(collection.name, collection) is None
+
+        # Écriture par un autre process : nouveau jeton, index disque périmé
+        build_lexical_index(collection, persist=True)
+        (tmp_path / f"{collection.name}.generation").write_text("autre", encoding="utf-8")
+        assert get_lexical_index(collection.name) is None
+
+        delete_lexical_index(collection.name, dropped=True)
+        assert not list(tmp_path.iterdir())
+
+
+def test_build_during_write_is_not_published(tmp_path):
+    """Un index construit pendant une écriture n'écrase pas le corpus plus récent"""
+    from unittest.mock import patch
+
+    collection = NumpyCollection("test_lexical_race")
+    collection.add(ids=["x"], embeddings=[[0.0, 1.0]], documents=["Python et Docker."])
+    read = collection.get
+
+    def get_then_write(**kwargs):
+        stored = read(**kwargs)
+        collection.add(ids=["y"], embeddings=[[1.0, 0.0]], documents=["Kubernetes."])
+        delete_lexical_index(collection.name)
+        return stored
+
+    with patch("src.lexical_index.LEXICAL_INDEX_PATH", str(tmp_path)), \
+         patch.object(collection, "get", side_effect=get_then_write):
+        index = build_lexical_index(collection, persist=True)
+
+    with patch("src.lexical_index.LEXICAL_INDEX_PATH", str(tmp_path)):
+        assert len(index) == 1
+        assert get_lexical_index(collection.name, collection) is None
+        assert not (tmp_path / f"{collection.name}.json").exists()
+        assert len(build_lexical_index(collection, persist=False)) == 2
+        delete_lexical_index(collection.name, dropped=True)
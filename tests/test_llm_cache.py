@@ -0,0 +1,113 @@
+"""
+Tests unitaires pour llm_cache.py
+"""
+
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.llm_cache import LLMCache
+from src.generator import call_llm
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache isolé dans un dossier temporaire"""
+    c = LLMCache(path=str(tmp_path))
+    yield c
+    c.close()
+
+
+def test_cache_miss_then_hit(cache):
+    """Vérifie qu'une réponse stockée est resservie, avec les métriques"""
+    assert cache.get("ollama", "mistral", "prompt", 500, 0.1) is None
+    cache.put("ollama", "mistral", "prompt", 500, 0.1, "## Score : 8/10", generation_seconds=12.0)
+
+    assert cache.get("ollama", "mistral", "prompt", 500, 0.1) == "## Score : 8/10"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["seconds_saved"] == 12.0
+
+
+def test_cache_keyed_by_parameters(cache):
+    """Backend, modèle, max_tokens et température font partie de la clé"""
+    cache.put("ollama", "mistral", "prompt", 500, 0.1, "réponse")
+    assert cache.get("mistral", "mistral", "prompt", 500, 0.1) is None
+    assert cache.get("ollama", "llama3", "prompt", 500, 0.1) is None
+    assert cache.get("ollama", "mistral", "prompt", 600, 0.1) is None
+    assert cache.get("ollama", "mistral", "prompt", 500, 0.7) is None
+    assert cache.get("ollama", "mistral", "autre prompt", 500, 0.1) is None
+    assert cache.get("ollama", "mistral", "prompt", 500, 0.1, json_mode=True) is None
+
+
+def test_cache_drops_responses_keyed_without_json_mode(tmp_path):
+    """Un cache d'une version précédente (clé sans mode JSON) est vidé à l'ouverture"""
+    import sqlite3
+
+    conn = sqlite3.connect(str(tmp_path / "responses.sqlite"))
+    conn.execute("""
+        CREATE TABLE responses (
+            backend TEXT NOT NULL, model TEXT NOT NULL, prompt_hash TEXT NOT NULL,
+            max_tokens INTEGER NOT NULL, temperature REAL NOT NULL,
+            response TEXT NOT NULL, size_bytes INTEGER NOT NULL,
+            generation_seconds REAL NOT NULL, created_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (backend, model, prompt_hash, max_tokens, temperature)
+        )
+    """)
+    conn.execute(
+        "INSERT INTO responses VALUES ('ollama', 'm', 'h', 500, 0.1, '{}', 2, 1.0, 0, 0)"
+    )
+    conn.commit()
+    conn.close()
+
+    cache = LLMCache(path=str(tmp_path))
+    assert cache.stats()["responses"] == 0
+    cache.put("ollama", "m", "p", 500, 0.1, '{"score": 8}', json_mode=True)
+    assert cache.get("ollama", "m", "p", 500, 0.1, json_mode=True) == '{"score": 8}'
+    assert cache.get("ollama", "m", "p", 500, 0.1) is None
+    cache.close()
+
+
+def test_cache_ttl_and_size_eviction(tmp_path):
+    """Les réponses expirées ne sont plus servies ; le plafond évince les plus anciennes"""
+    expired = LLMCache(path=str(tmp_path / "ttl"), ttl_seconds=0)
+    expired.put("ollama", "m", "p", 500, 0.1, "réponse")
+    assert expired.get("ollama", "m", "p", 500, 0.1) is None
+    expired.close()
+
+    small = LLMCache(path=str(tmp_path / "size"), max_mb=250 / (1024 * 1024))
+    for i in range(3):
+        small.put("ollama", "m", f"p{i}", 500, 0.1, "x" * 100)
+    assert small.get("ollama", "m", "p0", 500, 0.1) is None
+    assert small.get("ollama", "m", "p2", 500, 0.1) == "x" * 100
+    small.close()
+
+
+def test_call_llm_uses_cache_and_bypass(cache):
+    """Un prompt déjà vu n'appelle plus le LLM, sauf avec use_cache=False"""
+    with patch("src.generator.get_llm_cache", return_value=cache), \
+         patch("src.generator.USE_API", False), \
+         patch("src.generator.call_ollama", return_value="rapport") as mock_ollama:
+        assert call_llm("prompt") == "rapport"
+        assert call_llm("prompt") == "rapport"
+        assert mock_ollama.call_count == 1
+
+        call_llm("prompt", use_cache=False)
+        assert mock_ollama.call_count == 2
+
+
+def test_call_llm_caches_json_mode_separately(cache):
+    """Une réponse texte n'est pas resservie à un appel en mode JSON (et inversement)"""
+    with patch("src.generator.get_llm_cache", return_value=cache), \
+         patch("src.generator.USE_API", False), \
+         patch("src.generator.call_ollama", side_effect=["rapport", '{"score": 8}']) as mock_ollama:
+        assert call_llm("prompt") == "rapport"
+        assert call_llm("prompt", json_mode=True) == '{"score": 8}'
+        assert call_llm("prompt", json_mode=True) == '{"score": 8}'
+        assert call_llm("prompt") == "rapport"
+        assert mock_ollama.call_count == 2
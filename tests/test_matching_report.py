@@ -0,0 +1,64 @@
+"""
+Tests unitaires pour matching_report.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.matching_report import (
+    MatchingReport,
+    parse_matching_report,
+    format_matching_report,
+    MAX_STRENGTHS
+)
+
+
+def test_parse_valid_report():
+    """Un JSON conforme donne un MatchingReport"""
+    raw = ('{"score": 7, "strengths": ["Python", "dbt"], "gaps": ["Spark"], '
+           '"recommendation": "Profil à rencontrer."}')
+    report = parse_matching_report(raw)
+    assert report == MatchingReport(7, ["Python", "dbt"], ["Spark"], "Profil à rencontrer.")
+
+
+def test_parse_tolerates_fences_and_loose_values():
+    """Bloc ```json, score en texte ou hors bornes, liste réduite à une chaîne"""
+    raw = ('```json\n{"score": "12/10", "strengths": ["a", "b", "c", "d", " "], '
+           '"gaps": "Anglais", "recommendation": " Oui. "}\n```')
+    report = parse_matching_report(raw)
+    assert report.score == 10
+    assert report.strengths == ["a", "b", "c", "d"][:MAX_STRENGTHS]
+    assert report.gaps == ["Anglais"]
+    assert report.recommendation == "Oui."
+
+
+@pytest.mark.parametrize("raw", [
+    "Le candidat correspond bien.",
+    '{"score": 7, "strengths": [',
+    '{"score": 7, "strengths": [], "gaps": []}',
+    '{"score": "excellent", "strengths": [], "gaps": [], "recommendation": ""}',
+    '[1, 2, 3]',
+    '{"score": Infinity, "strengths": [], "gaps": [], "recommendation": ""}',
+    '{"score": 1e999, "strengths": [], "gaps": [], "recommendation": ""}',
+    '{"score": NaN, "strengths": [], "gaps": [], "recommendation": ""}',
+    '{"score": "inf", "strengths": [], "gaps": [], "recommendation": ""}',
+])
+def test_parse_rejects_invalid_reports(raw):
+    """Texte libre, JSON tronqué, champ manquant ou score illisible / non fini : ValueError"""
+    with pytest.raises(ValueError):
+        parse_matching_report(raw)
+
+
+def test_format_matching_report_markdown():
+    """Le markdown reprend le format du rapport libre"""
+    markdown = format_matching_report(
+        MatchingReport(6, ["SQL"], ["Airflow", "Docker"], "À revoir après formation.")
+    )
+    assert markdown.startswith("## Score : 6/10")
+    assert "## ✅ Points forts\n- SQL" in markdown
+    assert "- Airflow\n- Docker" in markdown
+    assert markdown.endswith("## 📋 Recommandation\nÀ revoir après formation.")
@@ -0,0 +1,149 @@
+"""
+Tests unitaires pour rate_limiter.py
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rate_limiter import RateLimiter, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+
+def test_interactive_requests_go_before_batch():
+    """À priorité égale l'ordre d'arrivée est respecté, l'interactif passe devant les lots"""
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**9, max_in_flight=1)
+    limiter.acquire()
+    order = []
+
+    def worker(name, priority):
+        limiter.acquire(priority=priority)
+        order.append(name)
+        limiter.release()
+
+    threads = []
+    for name, priority in [("lot-1", PRIORITY_BATCH), ("lot-2", PRIORITY_BATCH),
+                           ("ui-1", PRIORITY_INTERACTIVE), ("ui-2", PRIORITY_INTERACTIVE)]:
+        thread = threading.Thread(target=worker, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+
+    assert limiter.stats()["queue_depth"] == 4
+    limiter.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ["ui-1", "ui-2", "lot-1", "lot-2"]
+
+
+def test_requests_per_second_are_limited():
+    """Au-delà de la rafale autorisée, les requêtes sont espacées de 1/rps"""
+    limiter = RateLimiter(requests_per_second=20, tokens_per_minute=10**9, max_in_flight=100)
+    start = time.monotonic()
+    for _ in range(25):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.2
+
+
+def test_tokens_per_minute_with_usage_correction():
+    """La réservation de tokens est corrigée par l'usage réel à la libération"""
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=6000, max_in_flight=10)
+
+    with limiter.slot(tokens=6000) as usage:
+        usage["tokens"] = 1000
+    start = time.monotonic()
+    limiter.acquire(tokens=4000)
+    assert time.monotonic() - start < 0.1
+
+    # 1000 tokens restants, 100 tokens/s : 40 tokens manquants = 0,4 s
+    start = time.monotonic()
+    limiter.acquire(tokens=1040)
+    assert time.monotonic() - start >= 0.3
+
+
+def test_acquire_timeout_leaves_queue():
+    """Une attente expirée lève TimeoutError et quitte la file"""
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**9, max_in_flight=1)
+    limiter.acquire()
+
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.1)
+
+    stats = limiter.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 1
+
+
+def test_async_slot_limits_in_flight():
+    """La version asynchrone respecte le plafond d'appels en vol"""
+    import asyncio
+
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**9, max_in_flight=2)
+    in_flight, peak = 0, 0
+
+    async def call():
+        nonlocal in_flight, peak
+        async with limiter.aslot(priority=PRIORITY_BATCH):
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert limiter.stats()["admitted"] == 6
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_paused_slot_frees_place_during_backoff():
+    """Pendant une pause (backoff), la place est rendue puis reprise ; une erreur ne libère pas deux fois"""
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**9, max_in_flight=1)
+
+    with limiter.slot() as usage:
+        with limiter.paused(usage):
+            assert limiter.stats()["in_flight"] == 0
+            limiter.acquire(timeout=0.5)  # un autre appel passe pendant l'attente
+            limiter.release()
+        assert limiter.stats()["in_flight"] == 1
+    assert limiter.stats()["in_flight"] == 0
+
+    with pytest.raises(RuntimeError):
+        with limiter.slot() as usage:
+            with limiter.paused(usage):
+                raise RuntimeError("interrompu pendant l'attente")
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_async_paused_slot_frees_place_during_backoff():
+    """Version asynchrone : un appel en attente passe pendant la pause de l'autre"""
+    import asyncio
+
+    limiter = RateLimiter(requests_per_second=1000, tokens_per_minute=10**9, max_in_flight=1)
+    order = []
+
+    async def retried():
+        async with limiter.aslot() as usage:
+            order.append("tentative 1")
+            async with limiter.apaused(usage):
+                await asyncio.sleep(0.1)
+            order.append("tentative 2")
+
+    async def other():
+        await asyncio.sleep(0.02)
+        async with limiter.aslot():
+            order.append("autre")
+
+    async def run():
+        await asyncio.gather(retried(), other())
+
+    asyncio.run(run())
+    assert order == ["tentative 1", "autre", "tentative 2"]
+    assert limiter.stats()["in_flight"] == 0
@@ -9,7 +9,16 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.embeddings import embed_and_store
-from src.retriever import retrieve, format_context
+from src.retriever import (
+    retrieve,
+    retrieve_many,
+    format_context,
+    encode_queries,
+    precompute_query_embeddings,
+    query_cache_stats,
+    clear_query_cache,
+    PIPELINE_QUERIES
+)
 
 
 @pytest.fixture(scope="module")
@@ -58,4 +67,86 @@ def test_format_context(setup_collection):
 def test_retrieve_unknown_collection():
     """Vérifie l'erreur si la collection n'existe pas"""
     with pytest.raises(ValueError):
-        retrieve("test", "collection_inexistante")
\ No newline at end of file
+        retrieve("test", "collection_inexistante")
+
+
+def test_retrieve_many_grouped_per_query(setup_collection):
+    """Vérifie que les résultats sont regroupés par question, dans l'ordre"""
+    queries = ["compétences Python", "formation"]
+    grouped = retrieve_many(queries, setup_collection, n_results=2)
+    assert len(grouped) == 2
+    assert all(len(passages) == 2 for passages in grouped)
+    assert grouped[0] == retrieve("compétences Python", setup_collection, n_results=2)
+
+
+def test_retrieve_many_mismatched_collections(setup_collection):
+    """Vérifie l'erreur si le nombre de collections ne correspond pas"""
+    with pytest.raises(ValueError):
+        retrieve_many(["a", "b"], [setup_collection])
+
+
+def test_query_embedding_cache():
+    """Vérifie qu'une question déjà vue n'est pas revectorisée"""
+    clear_query_cache()
+    first = encode_queries(["question répétée"])
+    second = encode_queries(["question répétée"])
+    assert first == second
+    stats = query_cache_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_precomputed_pipeline_queries():
+    """Vérifie que les questions du pipeline sont servies sans le modèle"""
+    from unittest.mock import patch
+
+    clear_query_cache()
+    precompute_query_embeddings()
+    with patch("src.retriever.get_embedding_model") as mock_model:
+        vectors = encode_queries(PIPELINE_QUERIES)
+        mock_model.assert_not_called()
+    assert len(vectors) == len(PIPELINE_QUERIES)
+    assert query_cache_stats()["pinned"] == len(PIPELINE_QUERIES)
+
+
+def test_retrieve_does_not_list_collections(setup_collection):
+    """Vérifie que la recherche ne liste pas toutes les collections"""
+    from unittest.mock import patch
+
+    retrieve("Python", setup_collection)  # met le handle en cache
+    with patch("chromadb.api.client.Client.list_collections") as mock_list:
+        retrieve("Python", setup_collection)
+        mock_list.assert_not_called()
+
+
+def test_retrieve_after_rewrite():
+    """Vérifie que le handle en cache est invalidé quand la collection est recréée"""
+    embed_and_store(["Ancien texte sur Java."], collection_name="test_retriever_rewrite")
+    retrieve("Java", "test_retriever_rewrite", n_results=1)
+
+    embed_and_store(["Nouveau texte sur Python."], collection_name="test_retriever_rewrite")
+    results = retrieve("Python", "test_retriever_rewrite", n_results=1)
+    assert results[0]["text"] == "Nouveau texte sur Python."
+
+
+def test_retrieve_lexical_mode(setup_collection):
+    """Vérifie la recherche BM25 seule, sans le modèle d'embedding"""
+    from unittest.mock import patch
+
+    with patch("src.retriever.get_embedding_model") as mock_model:
+        results = retrieve("MLflow", setup_collection, mode="lexical")
+        mock_model.assert_not_called()
+    assert results[0]["text"] == "Expérience en machine learning et MLflow."
+
+
+def test_retrieve_hybrid_mode(setup_collection):
+    """Vérifie que le mode hybride remonte le terme exact"""
+    results = retrieve("Docker", setup_collection, n_results=2, mode="hybrid")
+    assert len(results) == 2
+    assert any("Docker" in r["text"] for r in results)
+
+
+def test_retrieve_unknown_mode(setup_collection):
+    """Vérifie l'erreur sur un mode inconnu"""
+    with pytest.raises(ValueError):
+        retrieve("Docker", setup_collection, mode="fuzzy")
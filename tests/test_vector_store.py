@@ -0,0 +1,73 @@
+"""
+Tests unitaires pour vector_store.py
+"""
+
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.vector_store import NumpyCollection, NumpyVectorStore
+
+
+@pytest.fixture
+def collection():
+    """Petite collection en mémoire avec des vecteurs orthogonaux"""
+    col = NumpyCollection("test_numpy")
+    col.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+        documents=["Python", "Docker", "AWS"],
+        metadatas=[{"chunk_index": 0}, {"chunk_index": 1}, {"chunk_index": 2}]
+    )
+    return col
+
+
+def test_query_returns_nearest(collection):
+    """Vérifie que le plus proche voisin arrive en premier"""
+    results = collection.query(query_embeddings=[[0.1, 0.9, 0.0]], n_results=2)
+    assert results["documents"][0] == ["Docker", "Python"]
+    assert results["distances"][0][0] < results["distances"][0][1]
+
+
+def test_query_distance_is_squared_l2(collection):
+    """Vérifie que la distance est la L2 au carré, comme ChromaDB par défaut"""
+    results = collection.query(query_embeddings=[[1.0, 0.0, 0.0]], n_results=3)
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-6)
+    assert results["distances"][0][1] == pytest.approx(2.0)
+
+
+def test_query_multiple_vectors(collection):
+    """Vérifie une requête avec plusieurs vecteurs"""
+    results = collection.query(query_embeddings=[[1, 0, 0], [0, 0, 1]], n_results=1)
+    assert results["documents"] == [["Python"], ["AWS"]]
+
+
+def test_delete_and_update(collection):
+    """Vérifie la suppression et la mise à jour des métadonnées"""
+    collection.delete(ids=["b"])
+    collection.update(ids=["c"], metadatas=[{"chunk_index": 1}])
+    stored = collection.get()
+    assert collection.count() == 2
+    assert stored["ids"] == ["a", "c"]
+    assert stored["metadatas"][1] == {"chunk_index": 1}
+
+
+def test_add_duplicate_id(collection):
+    """Vérifie qu'un identifiant ne peut pas être ajouté deux fois"""
+    with pytest.raises(ValueError):
+        collection.add(ids=["a"], embeddings=[[0, 0, 0]], documents=["x"])
+
+
+def test_store_collections():
+    """Vérifie la création, la lecture et la suppression de collections"""
+    store = NumpyVectorStore()
+    store.create_collection("cv_session", metadata={"session_id": "x"})
+    assert store.has_collection("cv_session")
+    assert store.get_or_create_collection("cv_session").metadata == {"session_id": "x"}
+
+    store.delete_collection("cv_session")
+    assert not store.has_collection("cv_session")
+    with pytest.raises(ValueError):
+        store.get_collection("cv_session")